@@ -0,0 +1,38 @@
+"""Add price elasticity
+
+Revision ID: 5b8e2f7a1c3d
+Revises: c4d2c52d50a8
+Create Date: 2026-10-19 09:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e2f7a1c3d'
+down_revision = 'c4d2c52d50a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('price_elasticity',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('asin', sa.String(length=20), nullable=False),
+    sa.Column('elasticity', sa.Float(), nullable=True),
+    sa.Column('r_squared', sa.Float(), nullable=True),
+    sa.Column('observations', sa.Integer(), nullable=True),
+    sa.Column('lagged_correlations', sa.JSON(), nullable=True),
+    sa.Column('data_through', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_price_elasticity_asin'), 'price_elasticity', ['asin'], unique=True)
+    op.create_index(op.f('ix_price_elasticity_id'), 'price_elasticity', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_price_elasticity_id'), table_name='price_elasticity')
+    op.drop_index(op.f('ix_price_elasticity_asin'), table_name='price_elasticity')
+    op.drop_table('price_elasticity')
@@ -0,0 +1,36 @@
+"""Add distribution sketches
+
+Revision ID: 8d1f4a6b9e20
+Revises: 5b8e2f7a1c3d
+Create Date: 2026-10-19 09:30:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d1f4a6b9e20'
+down_revision = '5b8e2f7a1c3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('distribution_sketches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('dimension', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('metric', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=True),
+    sa.Column('sketch', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('dimension', 'key', 'metric', name='uq_distribution_sketch')
+    )
+    op.create_index(op.f('ix_distribution_sketches_id'), 'distribution_sketches', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_distribution_sketches_id'), table_name='distribution_sketches')
+    op.drop_table('distribution_sketches')
@@ -0,0 +1,24 @@
+"""Add product content hash
+
+Revision ID: a3c9e1d7f250
+Revises: 8d1f4a6b9e20
+Create Date: 2026-10-19 10:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1d7f250'
+down_revision = '8d1f4a6b9e20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'content_hash')
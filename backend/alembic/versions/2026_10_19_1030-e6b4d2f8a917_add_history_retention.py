@@ -0,0 +1,129 @@
+"""Add history retention rollups
+
+Revision ID: e6b4d2f8a917
+Revises: a3c9e1d7f250
+Create Date: 2026-10-19 10:30:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b4d2f8a917'
+down_revision = 'a3c9e1d7f250'
+branch_labels = None
+depends_on = None
+
+HYPERTABLES = [
+    # (table, time column, primary key columns)
+    ('price_history', 'timestamp', ['id', 'timestamp']),
+    ('product_analytics', 'date', ['id', 'date']),
+    ('price_history_hourly', 'bucket', None),
+    ('price_history_daily', 'bucket', None),
+    ('product_analytics_daily', 'date', None),
+]
+
+
+def _rollup_columns():
+    return [
+        sa.Column('open', sa.Float(), nullable=False),
+        sa.Column('high', sa.Float(), nullable=False),
+        sa.Column('low', sa.Float(), nullable=False),
+        sa.Column('close', sa.Float(), nullable=False),
+        sa.Column('avg', sa.Float(), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    for table in ('price_history_hourly', 'price_history_daily'):
+        op.create_table(table,
+        sa.Column('asin', sa.String(length=20), nullable=False),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        *_rollup_columns(),
+        sa.PrimaryKeyConstraint('asin', 'bucket')
+        )
+        op.create_index(op.f(f'ix_{table}_bucket'), table, ['bucket'], unique=False)
+    op.create_table('product_analytics_daily',
+    sa.Column('asin', sa.String(length=20), nullable=False),
+    sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=True),
+    sa.Column('conversions', sa.Integer(), nullable=True),
+    sa.Column('revenue', sa.Float(), nullable=True),
+    sa.Column('bounce_rate', sa.Float(), nullable=True),
+    sa.Column('avg_session_duration', sa.Float(), nullable=True),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('asin', 'date')
+    )
+    op.create_index(op.f('ix_product_analytics_daily_date'), 'product_analytics_daily', ['date'], unique=False)
+    op.create_table('retention_watermarks',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('through', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+    connection = op.get_bind()
+    has_timescale = connection.execute(
+        sa.text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")
+    ).scalar()
+    if not has_timescale:
+        return
+
+    for table, column, primary_key in HYPERTABLES:
+        if primary_key:
+            # Hypertable unique constraints must include the time column
+            op.execute(f'UPDATE {table} SET "{column}" = now() WHERE "{column}" IS NULL')
+            op.alter_column(table, column, nullable=False)
+            op.drop_constraint(f'{table}_pkey', table, type_='primary')
+            op.create_primary_key(f'{table}_pkey', table, primary_key)
+        op.execute(
+            f"SELECT create_hypertable('{table}', '{column}', migrate_data => true, if_not_exists => true)"
+        )
+        op.execute(
+            f"ALTER TABLE {table} SET (timescaledb.compress, "
+            f"timescaledb.compress_segmentby = 'asin', timescaledb.compress_orderby = '\"{column}\" DESC')"
+        )
+
+
+def _restore_plain_table(table: str, column: str, indexes: list) -> None:
+    """Turn a hypertable back into the plain table the initial migration created
+
+    TimescaleDB cannot convert a hypertable back in place, so the rows are
+    copied into a new plain table (reading compressed chunks transparently)
+    that replaces it, with the id primary key and indexes restored. The id
+    sequence is detached first so dropping the hypertable keeps it.
+    """
+    op.execute(f'CREATE TABLE {table}_plain (LIKE {table} INCLUDING DEFAULTS)')
+    op.execute(f'INSERT INTO {table}_plain SELECT * FROM {table}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+    op.drop_table(table)
+    op.rename_table(f'{table}_plain', table)
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.create_primary_key(f'{table}_pkey', table, ['id'])
+    op.alter_column(table, column, nullable=True)
+    for indexed in indexes:
+        op.create_index(op.f(f'ix_{table}_{indexed}'), table, [indexed], unique=False)
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    has_timescale = connection.execute(
+        sa.text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")
+    ).scalar()
+    if has_timescale:
+        hypertables = set(connection.execute(
+            sa.text("SELECT hypertable_name FROM timescaledb_information.hypertables")
+        ).scalars())
+        if 'price_history' in hypertables:
+            _restore_plain_table('price_history', 'timestamp', ['asin', 'id', 'timestamp'])
+        if 'product_analytics' in hypertables:
+            _restore_plain_table('product_analytics', 'date', ['asin', 'date', 'id'])
+
+    op.drop_table('retention_watermarks')
+    op.drop_index(op.f('ix_product_analytics_daily_date'), table_name='product_analytics_daily')
+    op.drop_table('product_analytics_daily')
+    for table in ('price_history_daily', 'price_history_hourly'):
+        op.drop_index(op.f(f'ix_{table}_bucket'), table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,43 @@
+"""Add forecast models
+
+Revision ID: b7d3e5f1c264
+Revises: f1a7c3e9b482
+Create Date: 2026-10-19 11:30:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e5f1c264'
+down_revision = 'f1a7c3e9b482'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('forecast_models',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('scope', sa.String(length=16), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('metric', sa.String(length=20), nullable=False),
+    sa.Column('method', sa.String(length=20), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=True),
+    sa.Column('level', sa.Float(), nullable=True),
+    sa.Column('trend', sa.Float(), nullable=True),
+    sa.Column('season', sa.JSON(), nullable=True),
+    sa.Column('rmse', sa.Float(), nullable=True),
+    sa.Column('observations', sa.Integer(), nullable=True),
+    sa.Column('data_through', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('fitted_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('scope', 'key', 'metric', name='uq_forecast_models_series')
+    )
+    op.create_index(op.f('ix_forecast_models_id'), 'forecast_models', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_forecast_models_id'), table_name='forecast_models')
+    op.drop_table('forecast_models')
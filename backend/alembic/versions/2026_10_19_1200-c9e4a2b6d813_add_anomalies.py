@@ -0,0 +1,43 @@
+"""Add anomalies
+
+Revision ID: c9e4a2b6d813
+Revises: b7d3e5f1c264
+Create Date: 2026-10-19 12:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e4a2b6d813'
+down_revision = 'b7d3e5f1c264'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('anomalies',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('asin', sa.String(length=20), nullable=False),
+    sa.Column('metric', sa.String(length=20), nullable=False),
+    sa.Column('direction', sa.String(length=8), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('expected', sa.Float(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('analytics_id', sa.Integer(), nullable=True),
+    sa.Column('observed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('detected_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('asin', 'metric', 'observed_at', name='uq_anomalies_observation')
+    )
+    op.create_index(op.f('ix_anomalies_id'), 'anomalies', ['id'], unique=False)
+    op.create_index(op.f('ix_anomalies_asin'), 'anomalies', ['asin'], unique=False)
+    op.create_index(op.f('ix_anomalies_observed_at'), 'anomalies', ['observed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_anomalies_observed_at'), table_name='anomalies')
+    op.drop_index(op.f('ix_anomalies_asin'), table_name='anomalies')
+    op.drop_index(op.f('ix_anomalies_id'), table_name='anomalies')
+    op.drop_table('anomalies')
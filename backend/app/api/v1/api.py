@@ -1,7 +1,12 @@
-from fastapi import APIRouter
-from app.api.v1.endpoints import products, analytics, ai
+from fastapi import APIRouter, Depends
+from app.api.v1.endpoints import products, analytics, ai, jobs, live
+from app.core.ratelimit import rate_limiter
 
 api_router = APIRouter()
-api_router.include_router(products.router, prefix="/products", tags=["products"])
-api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
-api_router.include_router(ai.router, prefix="/ai", tags=["ai"])
\ No newline at end of file
+# Live connections are long-lived and bounded by LIVE_MAX_TOPICS_PER_CONNECTION instead
+rate_limited = [Depends(rate_limiter.enforce)]
+api_router.include_router(products.router, prefix="/products", tags=["products"], dependencies=rate_limited)
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"], dependencies=rate_limited)
+api_router.include_router(ai.router, prefix="/ai", tags=["ai"], dependencies=rate_limited)
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"], dependencies=rate_limited)
+api_router.include_router(live.router, prefix="/live", tags=["live"])
\ No newline at end of file
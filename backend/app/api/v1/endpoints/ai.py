@@ -1,8 +1,13 @@
-from typing import Dict, Any
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_db
 from app.services.ai_service import AIService
+from app.services.context_builder import context_builder, estimate_tokens
 from app.core.config import settings
+from app.core.recording import upstream_recorder
+from app.core.ratelimit import rate_limiter
 
 router = APIRouter()
 
@@ -18,9 +23,10 @@ class InsightRequest(BaseModel):
 
 
 @router.post("/analyze-product")
-async def analyze_product(request: AnalysisRequest):
+@rate_limiter.cost(20, queue="ai")
+async def analyze_product(request: AnalysisRequest, db: AsyncSession = Depends(get_db)):
     """Analyze a product using AI"""
-    if not settings.OPENAI_API_KEY and not settings.ANTHROPIC_API_KEY:
+    if not settings.OPENAI_API_KEY and not settings.ANTHROPIC_API_KEY and not upstream_recorder.replaying:
         raise HTTPException(
             status_code=503, 
             detail="AI service not configured. Please set API keys."
@@ -28,9 +34,11 @@ async def analyze_product(request: AnalysisRequest):
     
     ai_service = AIService()
     try:
+        context = await context_builder.build(db, request.asin)
         analysis = await ai_service.analyze_product(
             request.asin, 
-            request.analysis_type
+            request.analysis_type,
+            context
         )
         return {"analysis": analysis}
     except Exception as e:
@@ -38,9 +46,10 @@ async def analyze_product(request: AnalysisRequest):
 
 
 @router.post("/generate-insights")
+@rate_limiter.cost(20, queue="ai")
 async def generate_insights(request: InsightRequest):
     """Generate insights from analytics data using AI"""
-    if not settings.OPENAI_API_KEY and not settings.ANTHROPIC_API_KEY:
+    if not settings.OPENAI_API_KEY and not settings.ANTHROPIC_API_KEY and not upstream_recorder.replaying:
         raise HTTPException(
             status_code=503, 
             detail="AI service not configured. Please set API keys."
@@ -57,6 +66,25 @@ async def generate_insights(request: InsightRequest):
         raise HTTPException(status_code=500, detail=f"Insight generation failed: {str(e)}")
 
 
+@router.get("/context/{asin}")
+@rate_limiter.cost(2)
+async def get_product_context(
+    asin: str,
+    max_tokens: Optional[int] = Query(None, ge=20, le=4000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Preview the product context that analysis prompts include"""
+    context = await context_builder.build(db, asin, max_tokens)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return {
+        "asin": asin,
+        "context": context,
+        "estimated_tokens": estimate_tokens(context),
+        "cache": context_builder.stats
+    }
+
+
 @router.get("/health")
 async def ai_health_check():
     """Check AI service availability"""
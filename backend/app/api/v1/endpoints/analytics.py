@@ -1,19 +1,55 @@
-from typing import List, Optional
+import json
+import time
+from typing import List, Optional, Dict, Any, AsyncIterator
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
+from app.core.config import settings
 from app.db.database import get_db
-from app.models.product import Product, ProductAnalytics
-from app.schemas.analytics import AnalyticsResponse, TopProductsResponse
+from app.core.cache import query_cache
+from app.core.ratelimit import rate_limiter
+from app.models.product import Product
+from app.models.elasticity import PriceElasticity
+from app.models.anomaly import Anomaly
+from app.schemas.analytics import (
+    AnalyticsResponse, TopProductsResponse, CubeQuery, PriceElasticityResponse, ForecastResponse,
+    AnomalyResponse
+)
+from app.services.cube_service import cube_service
+from app.services.benchmark_service import benchmark_service
+from app.services.retention_service import retention_service
 
 router = APIRouter()
 
+SOURCE_PATTERN = "^(sql|snapshot)$"
+
+
+async def _get_snapshot(source: Optional[str], db: AsyncSession, days: int):
+    """Return the fresh in-memory snapshot when it should answer this query"""
+    if (source or settings.ANALYTICS_BACKEND) != "snapshot":
+        return None
+    
+    # Imported lazily so NumPy is only loaded when the snapshot is in use
+    from app.services.analytics_snapshot import analytics_snapshot
+    await analytics_snapshot.ensure_fresh(db)
+    return analytics_snapshot if analytics_snapshot.covers(days) else None
+
 
 @router.get("/overview")
-async def get_analytics_overview(db: AsyncSession = Depends(get_db)):
+@query_cache.cached(tables=["products", "product_analytics"])
+async def get_analytics_overview(
+    source: Optional[str] = Query(None, regex=SOURCE_PATTERN),
+    db: AsyncSession = Depends(get_db)
+):
     """Get analytics overview with key metrics"""
     
+    snapshot = await _get_snapshot(source, db, 30)
+    if snapshot:
+        return snapshot.overview()
+    
     # Total products
     total_products_result = await db.execute(select(func.count(Product.id)))
     total_products = total_products_result.scalar()
@@ -24,10 +60,8 @@ async def get_analytics_overview(db: AsyncSession = Depends(get_db)):
     
     # Total revenue (last 30 days)
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    revenue_result = await db.execute(
-        select(func.sum(ProductAnalytics.revenue))
-        .where(ProductAnalytics.date >= thirty_days_ago)
-    )
+    analytics = await retention_service.analytics_rows(db, thirty_days_ago)
+    revenue_result = await db.execute(select(func.sum(analytics.c.revenue)))
     total_revenue = revenue_result.scalar() or 0
     
     # Average rating
@@ -43,25 +77,32 @@ async def get_analytics_overview(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/top-products", response_model=List[TopProductsResponse])
+@query_cache.cached(tables=["products", "product_analytics"])
 async def get_top_products(
     metric: str = Query("revenue", regex="^(revenue|views|conversions)$"),
     limit: int = Query(10, ge=1, le=50),
     days: int = Query(30, ge=1, le=365),
+    source: Optional[str] = Query(None, regex=SOURCE_PATTERN),
     db: AsyncSession = Depends(get_db)
 ):
     """Get top products by specified metric"""
     
+    snapshot = await _get_snapshot(source, db, days)
+    if snapshot:
+        return snapshot.top_products(metric, limit, days)
+    
     date_filter = datetime.utcnow() - timedelta(days=days)
+    analytics = await retention_service.analytics_rows(db, date_filter)
     
     if metric == "revenue":
-        order_by = func.sum(ProductAnalytics.revenue).desc()
-        metric_sum = func.sum(ProductAnalytics.revenue)
+        order_by = func.sum(analytics.c.revenue).desc()
+        metric_sum = func.sum(analytics.c.revenue)
     elif metric == "views":
-        order_by = func.sum(ProductAnalytics.views).desc()
-        metric_sum = func.sum(ProductAnalytics.views)
+        order_by = func.sum(analytics.c.views).desc()
+        metric_sum = func.sum(analytics.c.views)
     else:  # conversions
-        order_by = func.sum(ProductAnalytics.conversions).desc()
-        metric_sum = func.sum(ProductAnalytics.conversions)
+        order_by = func.sum(analytics.c.conversions).desc()
+        metric_sum = func.sum(analytics.c.conversions)
     
     query = (
         select(
@@ -71,8 +112,7 @@ async def get_top_products(
             Product.rating,
             metric_sum.label("metric_value")
         )
-        .join(ProductAnalytics, Product.asin == ProductAnalytics.asin)
-        .where(ProductAnalytics.date >= date_filter)
+        .join(analytics, Product.asin == analytics.c.asin)
         .group_by(Product.asin, Product.title, Product.price, Product.rating)
         .order_by(order_by)
         .limit(limit)
@@ -94,24 +134,30 @@ async def get_top_products(
 
 
 @router.get("/trends")
+@query_cache.cached(tables=["product_analytics"])
 async def get_analytics_trends(
     days: int = Query(30, ge=7, le=365),
+    source: Optional[str] = Query(None, regex=SOURCE_PATTERN),
     db: AsyncSession = Depends(get_db)
 ):
     """Get analytics trends over time"""
     
+    snapshot = await _get_snapshot(source, db, days)
+    if snapshot:
+        return snapshot.trends(days)
+    
     date_filter = datetime.utcnow() - timedelta(days=days)
+    analytics = await retention_service.analytics_rows(db, date_filter)
     
     query = (
         select(
-            func.date(ProductAnalytics.date).label("date"),
-            func.sum(ProductAnalytics.revenue).label("revenue"),
-            func.sum(ProductAnalytics.views).label("views"),
-            func.sum(ProductAnalytics.conversions).label("conversions")
+            func.date(analytics.c.date).label("date"),
+            func.sum(analytics.c.revenue).label("revenue"),
+            func.sum(analytics.c.views).label("views"),
+            func.sum(analytics.c.conversions).label("conversions")
         )
-        .where(ProductAnalytics.date >= date_filter)
-        .group_by(func.date(ProductAnalytics.date))
-        .order_by(func.date(ProductAnalytics.date))
+        .group_by(func.date(analytics.c.date))
+        .order_by(func.date(analytics.c.date))
     )
     
     result = await db.execute(query)
@@ -125,4 +171,181 @@ async def get_analytics_trends(
             "conversions": row.conversions or 0
         }
         for row in trends
-    ]
\ No newline at end of file
+    ]
+
+
+async def _stream_json_array(
+    head: List[Dict[str, Any]], rest: AsyncIterator[Dict[str, Any]], chunk_size: int = 1000
+) -> AsyncIterator[str]:
+    """Encode rows as a JSON array while they are read from the cursor"""
+    yield "["
+    chunk, separator = head, ""
+    async for row in rest:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield separator + ",".join(json.dumps(row, separators=(",", ":")) for row in jsonable_encoder(chunk))
+            chunk, separator = [], ","
+    if chunk:
+        yield separator + ",".join(json.dumps(row, separators=(",", ":")) for row in jsonable_encoder(chunk))
+    yield "]"
+
+
+@router.post("/cube")
+@rate_limiter.cost(5)
+async def get_analytics_cube(query: CubeQuery, db: AsyncSession = Depends(get_db)):
+    """Get revenue/views/conversions bucketed by time and grouped by category, brand or ASIN"""
+    rows, rest = await cube_service.run(db, query, settings.CUBE_STREAM_THRESHOLD_ROWS)
+    
+    if rest is not None:
+        return StreamingResponse(_stream_json_array(rows, rest), media_type="application/json")
+    
+    return rows
+
+
+@router.get("/snapshot/stats")
+async def get_snapshot_stats(db: AsyncSession = Depends(get_db)):
+    """Get row counts, coverage and memory use of the in-memory analytics snapshot"""
+    from app.services.analytics_snapshot import analytics_snapshot
+    await analytics_snapshot.ensure_fresh(db)
+    return analytics_snapshot.stats()
+
+
+@router.get("/snapshot/compare")
+@rate_limiter.cost(10)
+async def compare_snapshot_with_sql(
+    days: int = Query(30, ge=7, le=365),
+    db: AsyncSession = Depends(get_db)
+):
+    """Run overview, top-products and trends against both SQL and the snapshot"""
+    # The uncached endpoints, so both sides are computed rather than read from the query cache
+    queries = {
+        "overview": lambda source: get_analytics_overview.__wrapped__(source=source, db=db),
+        "top_products": lambda source: get_top_products.__wrapped__(
+            metric="revenue", limit=10, days=days, source=source, db=db
+        ),
+        "trends": lambda source: get_analytics_trends.__wrapped__(days=days, source=source, db=db),
+    }
+    
+    comparison = {}
+    for name, run in queries.items():
+        answers = {}
+        timings = {}
+        for source in ("sql", "snapshot"):
+            started = time.perf_counter()
+            answers[source] = jsonable_encoder(await run(source))
+            timings[f"{source}_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        comparison[name] = {"match": answers["sql"] == answers["snapshot"], **timings}
+    
+    return comparison
+
+
+@router.get("/elasticity/{asin}", response_model=PriceElasticityResponse)
+@query_cache.cached(
+    asin_tables=["price_elasticity"], asins=lambda params: [params["asin"]], response_model=PriceElasticityResponse
+)
+async def get_price_elasticity(asin: str, db: AsyncSession = Depends(get_db)):
+    """Get the precomputed price elasticity and lagged demand correlations for a product"""
+    result = await db.execute(select(PriceElasticity).where(PriceElasticity.asin == asin))
+    elasticity = result.scalar_one_or_none()
+    
+    if not elasticity:
+        raise HTTPException(status_code=404, detail="Price elasticity not computed for this product")
+    
+    return elasticity
+
+
+async def _forecast(db: AsyncSession, scope: str, key: str, metric: str, horizon: int) -> Dict[str, Any]:
+    # Imported lazily so NumPy is only loaded when forecasts are requested
+    from app.services.forecast_service import forecast_service
+
+    result = await forecast_service.get_forecast(db, scope, key, metric, horizon)
+    if not result:
+        raise HTTPException(status_code=404, detail=f"No {metric} forecast model for this {scope} yet")
+    return result
+
+
+@router.get("/forecast/asin/{asin}", response_model=ForecastResponse)
+@query_cache.cached(tables=["forecast_models"])
+async def get_product_forecast(
+    asin: str,
+    metric: str = Query("revenue", regex="^(revenue|views|conversions|price)$"),
+    horizon: int = Query(14, ge=1, le=settings.FORECAST_MAX_HORIZON_DAYS),
+    db: AsyncSession = Depends(get_db)
+):
+    """Forecast a product's daily metric from its stored exponential smoothing model"""
+    return await _forecast(db, "asin", asin, metric, horizon)
+
+
+@router.get("/forecast/category/{category}", response_model=ForecastResponse)
+@query_cache.cached(tables=["forecast_models"])
+async def get_category_forecast(
+    category: str,
+    metric: str = Query("revenue", regex="^(revenue|views|conversions|price)$"),
+    horizon: int = Query(14, ge=1, le=settings.FORECAST_MAX_HORIZON_DAYS),
+    db: AsyncSession = Depends(get_db)
+):
+    """Forecast a category's daily total (average for price) from its stored model"""
+    return await _forecast(db, "category", category, metric, horizon)
+
+
+@router.get("/anomalies", response_model=List[AnomalyResponse])
+@query_cache.cached(tables=["anomalies"], response_model=List[AnomalyResponse])
+async def get_anomalies(
+    asin: Optional[str] = Query(None),
+    metric: Optional[str] = Query(None, regex="^(views|conversions|revenue|bounce_rate)$"),
+    direction: Optional[str] = Query(None, regex="^(drop|spike)$"),
+    hours: int = Query(24, ge=1, le=24 * 90, description="Observed within this many hours"),
+    min_score: float = Query(0, ge=0, description="Minimum absolute robust z-score"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get recent traffic and conversion anomalies, newest first"""
+    query = select(Anomaly).where(Anomaly.observed_at >= datetime.utcnow() - timedelta(hours=hours))
+    if asin:
+        query = query.where(Anomaly.asin == asin)
+    if metric:
+        query = query.where(Anomaly.metric == metric)
+    if direction:
+        query = query.where(Anomaly.direction == direction)
+    if min_score:
+        query = query.where(func.abs(Anomaly.score) >= min_score)
+    
+    result = await db.execute(query.order_by(Anomaly.observed_at.desc(), func.abs(Anomaly.score).desc()).limit(limit))
+    return result.scalars().all()
+
+
+@router.get("/anomalies/status")
+async def get_anomaly_detector_status():
+    """Get the anomaly detector's cursor, tracked ASINs, state size and last run"""
+    # Imported lazily so NumPy is only loaded when the detector is in use
+    from app.services.anomaly_service import anomaly_service
+    return anomaly_service.snapshot()
+
+
+@router.get("/benchmarks/percentile")
+async def get_benchmark_percentile(
+    dimension: str = Query(..., regex="^(category|brand)$"),
+    key: str = Query(..., description="Category or brand name"),
+    metric: str = Query(..., regex="^(price|rating|review_count)$"),
+    value: float = Query(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the percentile rank of a value among products of a category or brand"""
+    rank = await benchmark_service.percentile_rank(db, dimension, key, metric, value)
+    
+    if not rank:
+        raise HTTPException(status_code=404, detail="No benchmark data for this group")
+    
+    return rank
+
+
+@router.get("/retention")
+async def get_retention_stats(db: AsyncSession = Depends(get_db)):
+    """Get history table sizes, tier watermarks and the last retention run"""
+    return {
+        "table_sizes": await retention_service.table_sizes(db),
+        "watermarks": await retention_service.get_watermarks(db),
+        "runs": retention_service.runs,
+        "failures": retention_service.failures,
+        "last_run": retention_service.last_run
+    }
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.ratelimit import rate_limiter
+from app.db.database import get_db
+from app.schemas.job import JobCreate, JobResponse
+from app.services.job_service import job_service, job_worker, JOB_HANDLERS
+
+router = APIRouter()
+
+MEDIA_TYPES = {".json": "application/json", ".ndjson": "application/x-ndjson"}
+
+
+@router.post("/", response_model=JobResponse, status_code=202)
+@rate_limiter.cost(10)
+async def submit_job(request: JobCreate, db: AsyncSession = Depends(get_db)):
+    """Queue a long-running job; poll GET /jobs/{id} for progress"""
+    try:
+        return await job_service.submit(db, request.type, request.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/", response_model=List[JobResponse])
+async def list_jobs(
+    status: Optional[str] = Query(None, description="queued, running, succeeded, failed, cancelled"),
+    type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """List recent jobs, newest first"""
+    return await job_service.list(db, status, type, limit)
+
+
+@router.get("/types")
+async def get_job_types():
+    """Registered job types with their concurrency limits"""
+    return {
+        job_type: {"concurrency": settings.JOB_TYPE_CONCURRENCY.get(job_type)}
+        for job_type in JOB_HANDLERS
+    }
+
+
+@router.get("/stats")
+async def get_job_stats(db: AsyncSession = Depends(get_db)):
+    """Job counts by type and status, plus this process's worker if it runs one"""
+    return {
+        "jobs": await job_service.stats(db),
+        "worker": job_worker.snapshot() if settings.JOB_WORKERS_IN_API else None
+    }
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Get a job's status, progress and inline result"""
+    job = await job_service.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Cancel a queued job, or ask the worker to stop a running one"""
+    job = await job_service.cancel(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Download a job's result, streaming it from disk when stored as a file"""
+    job = await job_service.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if not job.result_path:
+        return job.result
+    if not os.path.exists(job.result_path):
+        raise HTTPException(status_code=410, detail="Result file is no longer available")
+    extension = os.path.splitext(job.result_path)[1]
+    return FileResponse(
+        job.result_path,
+        media_type=MEDIA_TYPES.get(extension, "application/octet-stream"),
+        filename=f"{job.type}-{job.id}{extension}"
+    )
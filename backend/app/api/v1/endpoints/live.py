@@ -0,0 +1,163 @@
+import asyncio
+import json
+from typing import Any, List
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.api.v1.endpoints import analytics
+from app.services.batch_loader import get_products_by_asin
+from app.services.live_service import live_hub, TopicSource
+
+router = APIRouter()
+
+SSE_KEEPALIVE_SECONDS = 15
+TOP_PRODUCT_METRICS = ("revenue", "views", "conversions")
+
+
+def _bounded(value: str, low: int, high: int) -> int:
+    number = int(value)
+    if not low <= number <= high:
+        raise ValueError(f"{number} is outside {low}..{high}")
+    return number
+
+
+# Resolvers bypass the query cache, since they run because the data changed
+async def _overview(db):
+    return await analytics.get_analytics_overview.__wrapped__(source=None, db=db)
+
+
+def _trend_args(days: str = "30"):
+    return (_bounded(days, 7, 365),)
+
+
+async def _trends(db, days: int):
+    return await analytics.get_analytics_trends.__wrapped__(days=days, source=None, db=db)
+
+
+def _top_product_args(metric: str = "revenue", days: str = "30", limit: str = "10"):
+    if metric not in TOP_PRODUCT_METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    return metric, _bounded(days, 1, 365), _bounded(limit, 1, 50)
+
+
+async def _top_products(db, metric: str, days: int, limit: int):
+    return await analytics.get_top_products.__wrapped__(metric=metric, limit=limit, days=days, source=None, db=db)
+
+
+async def _price(db, asin: str):
+    product = (await get_products_by_asin(db, [asin])).get(asin)
+    if product is None:
+        return {"asin": asin, "price": None}
+    return {
+        "asin": asin,
+        "price": product.price,
+        "currency": product.currency,
+        "availability": product.availability,
+        "updated_at": product.updated_at,
+    }
+
+
+# Topics: overview, trends:{days}, top-products:{metric}:{days}:{limit}, price:{asin}
+live_hub.register("overview", TopicSource(_overview, fields={"price", "rating"}, periodic=True))
+live_hub.register("trends", TopicSource(_trends, parse=_trend_args, periodic=True))
+live_hub.register("top-products", TopicSource(
+    _top_products, parse=_top_product_args, fields={"title", "price", "rating"}, periodic=True
+))
+live_hub.register("price", TopicSource(_price, fields={"price", "currency", "availability"}, per_asin=True))
+
+
+async def _subscribe_all(subscriber, topics: List[str]) -> None:
+    if len(subscriber.topics) + len(topics) > settings.LIVE_MAX_TOPICS_PER_CONNECTION:
+        raise ValueError(f"At most {settings.LIVE_MAX_TOPICS_PER_CONNECTION} topics per connection")
+    for topic in topics:
+        try:
+            await live_hub.subscribe(subscriber, topic)
+        except ValueError as e:
+            raise ValueError(f"Invalid topic {topic}: {e}")
+
+
+def _decode(message) -> Any:
+    """A client frame's JSON; malformed frames are reported without closing the socket"""
+    try:
+        return json.loads(message.get("text") or message.get("bytes") or "")
+    except ValueError as e:
+        raise ValueError(f"Malformed JSON: {e}")
+
+
+def _requested_topics(request) -> List[str]:
+    topics = (request.get("topics") or [request.get("topic")]) if isinstance(request, dict) else None
+    if not isinstance(topics, list) or not topics or not all(isinstance(topic, str) and topic for topic in topics):
+        raise ValueError('Send "topics" as a non-empty list of strings')
+    return topics
+
+
+@router.websocket("/ws")
+async def live_websocket(websocket: WebSocket):
+    """Push topic updates over a WebSocket
+
+    Send `{"action": "subscribe" | "unsubscribe", "topics": [...]}`; receive
+    `{"topic", "seq", "type": "snapshot" | "delta", "data"}` messages.
+    """
+    await websocket.accept()
+    subscriber = live_hub.connect()
+
+    async def forward():
+        while True:
+            await websocket.send_json(await subscriber.queue.get())
+
+    sender = asyncio.create_task(forward())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                request = _decode(message)
+                topics = _requested_topics(request)
+                if request.get("action") == "unsubscribe":
+                    for topic in topics:
+                        live_hub.unsubscribe(subscriber, topic)
+                else:
+                    await _subscribe_all(subscriber, topics)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        live_hub.disconnect(subscriber)
+
+
+@router.get("/sse")
+async def live_events(topic: List[str] = Query(..., description="Repeat for each topic")):
+    """Push topic updates as Server-Sent Events"""
+    subscriber = live_hub.connect()
+    try:
+        await _subscribe_all(subscriber, topic)
+    except ValueError as e:
+        live_hub.disconnect(subscriber)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message, separators=(',', ':'))}\n\n"
+        finally:
+            live_hub.disconnect(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats")
+async def get_live_stats():
+    """Connections, subscribed topics and recompute/delivery counts for this worker"""
+    return live_hub.snapshot()
@@ -1,17 +1,59 @@
+import os
+import time
+import uuid
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from datetime import datetime
 from app.db.database import get_db
-from app.models.product import Product, PriceHistory
-from app.schemas.product import ProductResponse, ProductCreate, PriceHistoryResponse
+from app.models.product import Product
+from app.core.config import settings
+from app.schemas.product import (
+    ProductResponse, ProductCreate, PriceHistoryResponse,
+    ProductBatchRequest, ProductBatchResponse, PriceHistoryBatchResponse
+)
+from app.schemas.job import JobResponse
+from app.core.cache import query_cache
+from app.core.ratelimit import rate_limiter
+from app.core.resilience import UpstreamError, CircuitOpenError
 from app.services.amazon_service import amazon_service
+from app.services.benchmark_service import benchmark_service, DIMENSIONS, METRICS
+from app.services.product_sync import product_sync_service, change_feed
+from app.services.retention_service import retention_service
+from app.services.batch_loader import product_loader, price_history_loader, get_products_by_asin, loader_metrics
+from app.services.job_service import job_service
 
 router = APIRouter()
 
 
+def _upstream_unavailable(error: UpstreamError) -> HTTPException:
+    """Map an upstream failure to 503 when failing fast, 502 otherwise"""
+    status_code = 503 if isinstance(error, CircuitOpenError) else 502
+    return HTTPException(status_code=status_code, detail=f"Amazon data unavailable: {str(error)}")
+
+
+def _unique_asins(asins: List[str]) -> List[str]:
+    """De-duplicate requested ASINs, preserving order, within the batch limit"""
+    unique = list(dict.fromkeys(asin.strip() for asin in asins if asin.strip()))
+    if len(unique) > settings.BATCH_LOOKUP_MAX_ASINS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_LOOKUP_MAX_ASINS} ASINs per batch"
+        )
+    return unique
+
+
+async def _batch_products(asins: List[str], db: AsyncSession) -> ProductBatchResponse:
+    asins = _unique_asins(asins)
+    found = await get_products_by_asin(db, asins)
+    return ProductBatchResponse(
+        products=[found[asin] for asin in asins if asin in found],
+        missing=[asin for asin in asins if asin not in found]
+    )
+
+
 @router.get("/", response_model=List[ProductResponse])
+@query_cache.cached(tables=["products"], response_model=List[ProductResponse])
 async def get_products(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
@@ -31,11 +73,58 @@ async def get_products(
     return products
 
 
+@router.get("/changes")
+async def get_product_changes(
+    since: int = Query(0, ge=0, description="Return events after this sequence number"),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """Get buffered product change events and sync write statistics"""
+    events = change_feed.since(since, limit)
+    return {
+        "events": [event.to_dict() for event in events],
+        "last_seq": change_feed.last_seq,
+        "stats": product_sync_service.stats
+    }
+
+
+@router.post("/batch", response_model=ProductBatchResponse)
+@rate_limiter.cost(5)
+async def get_products_batch(request: ProductBatchRequest, db: AsyncSession = Depends(get_db)):
+    """Get many products by ASIN in one query"""
+    return await _batch_products(request.asins, db)
+
+
+@router.get("/batch", response_model=ProductBatchResponse)
+@rate_limiter.cost(5)
+@query_cache.cached(asin_tables=["products"], asins=lambda params: params["asin"], response_model=ProductBatchResponse)
+async def get_products_batch_by_query(
+    asin: List[str] = Query(..., description="Repeat for each ASIN"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get many products by ASIN in one query, e.g. ?asin=A&asin=B"""
+    return await _batch_products(asin, db)
+
+
+@router.post("/price-history/batch", response_model=PriceHistoryBatchResponse)
+@rate_limiter.cost(5)
+async def get_price_history_batch(request: ProductBatchRequest, db: AsyncSession = Depends(get_db)):
+    """Get price history for many products with one query per history tier"""
+    asins = _unique_asins(request.asins)
+    return {"price_history": await retention_service.price_history_many(db, asins, limit=100)}
+
+
+@router.get("/batch/stats")
+async def get_batch_loader_stats():
+    """Get request coalescing statistics for single-ASIN lookups"""
+    return loader_metrics()
+
+
 @router.get("/{asin}", response_model=ProductResponse)
-async def get_product(asin: str, db: AsyncSession = Depends(get_db)):
+@query_cache.cached(asin_tables=["products"], asins=lambda params: [params["asin"]], response_model=ProductResponse)
+async def get_product(asin: str):
     """Get a specific product by ASIN"""
-    result = await db.execute(select(Product).where(Product.asin == asin))
-    product = result.scalar_one_or_none()
+    # Concurrent lookups are coalesced into one batched query
+    product = await product_loader.load(asin)
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -44,30 +133,66 @@ async def get_product(asin: str, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/", response_model=ProductResponse)
+@rate_limiter.cost(2)
 async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_db)):
     """Create a new product"""
     db_product = Product(**product.model_dump())
     db.add(db_product)
     await db.commit()
     await db.refresh(db_product)
+    await benchmark_service.observe(db_product)
+    await change_feed.publish(db_product.asin, "insert", product.model_dump(exclude={"asin"}, exclude_none=True))
     return db_product
 
 
-@router.get("/{asin}/price-history", response_model=List[PriceHistoryResponse])
-async def get_price_history(asin: str, db: AsyncSession = Depends(get_db)):
-    """Get price history for a product"""
-    result = await db.execute(
-        select(PriceHistory)
-        .where(PriceHistory.asin == asin)
-        .order_by(PriceHistory.timestamp.desc())
-        .limit(100)
+@router.post("/import", response_model=JobResponse, status_code=202)
+@rate_limiter.cost(50)
+async def import_products(
+    file: UploadFile = File(..., description="CSV, NDJSON or Parquet file"),
+    kind: str = Form("products", description="products, price_history or product_analytics"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue a bulk import; the job result reports row-level errors and rows/sec"""
+    from app.services.import_service import IMPORT_KINDS, detect_format
+
+    if kind not in IMPORT_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown import kind: {kind}")
+    try:
+        fmt = detect_format(file.filename or "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Uploads go next to job results, which API and worker containers share
+    upload_dir = os.path.join(settings.JOB_RESULT_DIR, "imports")
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f"{uuid.uuid4()}{os.path.splitext(file.filename)[1].lower()}")
+    written = 0
+    with open(path, "wb") as output:
+        while chunk := await file.read(1024 * 1024):
+            written += len(chunk)
+            if written > settings.IMPORT_MAX_UPLOAD_MB * 1024 * 1024:
+                output.close()
+                os.remove(path)
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Files over {settings.IMPORT_MAX_UPLOAD_MB} MB must be imported with scripts/import_catalog.py"
+                )
+            output.write(chunk)
+
+    return await job_service.submit(
+        db, "catalog_import", {"path": path, "kind": kind, "format": fmt, "delete_file": True}
     )
-    price_history = result.scalars().all()
-    
-    return price_history
+
+
+@router.get("/{asin}/price-history", response_model=List[PriceHistoryResponse])
+@query_cache.cached(asin_tables=["price_history"], asins=lambda params: [params["asin"]])
+async def get_price_history(asin: str):
+    """Get price history for a product, including downsampled older points"""
+    return await price_history_loader.load(asin)
 
 
 @router.get("/search/amazon")
+@rate_limiter.cost(10, queue="upstream")
 async def search_amazon_products(
     query: str = Query(..., description="Search term for Amazon products"),
     pages: int = Query(1, ge=1, le=3, description="Number of pages to search")
@@ -80,11 +205,14 @@ async def search_amazon_products(
             "total_results": len(products),
             "products": products
         }
+    except UpstreamError as e:
+        raise _upstream_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to search Amazon: {str(e)}")
 
 
 @router.post("/sync/{asin}", response_model=ProductResponse)
+@rate_limiter.cost(10, queue="upstream")
 async def sync_product_from_amazon(asin: str, db: AsyncSession = Depends(get_db)):
     """Sync a product from Amazon and save to local database"""
     try:
@@ -93,58 +221,22 @@ async def sync_product_from_amazon(asin: str, db: AsyncSession = Depends(get_db)
         if not amazon_data:
             raise HTTPException(status_code=404, detail="Product not found on Amazon")
         
-        # Check if product already exists in our database
-        result = await db.execute(select(Product).where(Product.asin == asin))
-        existing_product = result.scalar_one_or_none()
-        
-        if existing_product:
-            # Update existing product
-            for key, value in amazon_data.items():
-                if hasattr(existing_product, key) and value is not None:
-                    setattr(existing_product, key, value)
-            existing_product.updated_at = datetime.utcnow()
-            
-            # Add price history entry
-            if amazon_data.get('price', 0) > 0:
-                price_entry = PriceHistory(
-                    asin=asin,
-                    price=amazon_data['price'],
-                    currency=amazon_data.get('currency', 'USD'),
-                    timestamp=datetime.utcnow()
-                )
-                db.add(price_entry)
-            
-            await db.commit()
-            await db.refresh(existing_product)
-            return existing_product
-        else:
-            # Create new product
-            new_product = Product(**amazon_data)
-            new_product.created_at = datetime.utcnow()
-            new_product.updated_at = datetime.utcnow()
-            db.add(new_product)
-            
-            # Add initial price history entry
-            if amazon_data.get('price', 0) > 0:
-                price_entry = PriceHistory(
-                    asin=asin,
-                    price=amazon_data['price'],
-                    currency=amazon_data.get('currency', 'USD'),
-                    timestamp=datetime.utcnow()
-                )
-                db.add(price_entry)
-            
-            await db.commit()
-            await db.refresh(new_product)
-            return new_product
+        # Only changed fields are written; unchanged prices record periodic heartbeats
+        product, event = await product_sync_service.upsert(db, asin, amazon_data)
+        if event:
+            await benchmark_service.observe(product, event)
+        return product
             
     except HTTPException:
         raise
+    except UpstreamError as e:
+        raise _upstream_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to sync product: {str(e)}")
 
 
 @router.get("/{asin}/with-amazon-fallback", response_model=ProductResponse)
+@rate_limiter.cost(5, queue="upstream")
 async def get_product_with_amazon_fallback(asin: str, db: AsyncSession = Depends(get_db)):
     """Get product from local database, fallback to Amazon if not found"""
     # First try to get from local database
@@ -160,35 +252,101 @@ async def get_product_with_amazon_fallback(asin: str, db: AsyncSession = Depends
         if not amazon_data:
             raise HTTPException(status_code=404, detail="Product not found locally or on Amazon")
         
-        # Create new product from Amazon data
-        new_product = Product(**amazon_data)
-        new_product.created_at = datetime.utcnow()
-        new_product.updated_at = datetime.utcnow()
-        db.add(new_product)
-        
-        # Add initial price history entry
-        if amazon_data.get('price', 0) > 0:
-            price_entry = PriceHistory(
-                asin=asin,
-                price=amazon_data['price'],
-                currency=amazon_data.get('currency', 'USD'),
-                timestamp=datetime.utcnow()
-            )
-            db.add(price_entry)
-        
-        await db.commit()
-        await db.refresh(new_product)
+        new_product, event = await product_sync_service.upsert(db, asin, amazon_data)
+        if event:
+            await benchmark_service.observe(new_product, event)
         return new_product
         
+    except UpstreamError as e:
+        raise _upstream_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch product: {str(e)}")
 
 
+@router.get("/{asin}/benchmark")
+async def get_product_benchmark(asin: str, db: AsyncSession = Depends(get_db)):
+    """Get percentile ranks of a product's price, rating and review count among its category and brand peers"""
+    result = await db.execute(
+        select(Product.category, Product.brand, Product.price, Product.rating, Product.review_count)
+        .where(Product.asin == asin)
+    )
+    product = result.one_or_none()
+    
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    benchmarks = {}
+    for dimension in DIMENSIONS:
+        key = getattr(product, dimension)
+        if not key:
+            continue
+        for metric in METRICS:
+            value = getattr(product, metric)
+            if value is None:
+                continue
+            rank = await benchmark_service.percentile_rank(db, dimension, key, metric, value)
+            if rank:
+                benchmarks.setdefault(dimension, {})[metric] = rank
+    
+    return {"asin": asin, "benchmarks": benchmarks}
+
+
+@router.get("/similar/stats")
+async def get_similarity_stats():
+    """Get similar-products index size, embedder and update statistics"""
+    from app.services.similarity_service import similarity_service
+    return similarity_service.snapshot()
+
+
+@router.get("/{asin}/similar")
+@rate_limiter.cost(2)
+async def get_similar_products(
+    asin: str,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get substitutes and competitors ranked by title/feature/category/brand similarity"""
+    # Imported lazily so NumPy is only loaded when the index is in use
+    from app.services.similarity_service import similarity_service
+    
+    # Loading, building or catching up the index is reported apart from the search itself
+    started = time.perf_counter()
+    index = await similarity_service.ensure_index(db)
+    index_ms = round((time.perf_counter() - started) * 1000, 3)
+    started = time.perf_counter()
+    matches = similarity_service.search(index, asin, limit)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Product not found in similarity index")
+    search_ms = round((time.perf_counter() - started) * 1000, 3)
+    
+    products = await get_products_by_asin(db, [match["asin"] for match in matches])
+    return {
+        "asin": asin,
+        "index_ms": index_ms,
+        "search_ms": search_ms,
+        "similar": [
+            {
+                **match,
+                "title": products[match["asin"]].title,
+                "price": products[match["asin"]].price,
+                "rating": products[match["asin"]].rating,
+                "brand": products[match["asin"]].brand,
+                "category": products[match["asin"]].category
+            }
+            for match in matches
+            if match["asin"] in products
+        ]
+    }
+
+
 @router.get("/{asin}/reviews")
+@rate_limiter.cost(10, queue="upstream")
 async def get_product_reviews(asin: str):
     """Get product reviews from Amazon"""
     try:
         reviews = await amazon_service.get_product_reviews(asin)
         return reviews
+    except UpstreamError as e:
+        raise _upstream_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch reviews: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class GrowableArray:
+    """Append-only NumPy array with amortized capacity doubling
+
+    `row_shape` makes each element a fixed-size row, e.g. (dim,) for vectors.
+    """
+
+    def __init__(self, dtype, capacity: int = 1024, row_shape: tuple = ()):
+        self._data = np.empty((capacity, *row_shape), dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def extend(self, values) -> None:
+        values = np.asarray(values, dtype=self._data.dtype)
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            capacity = max(needed, len(self._data) * 2)
+            grown = np.empty((capacity, *self._data.shape[1:]), dtype=self._data.dtype)
+            grown[:self._size] = self.values
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+    def resize(self, size: int, fill) -> None:
+        """Grow to at least size elements, filling new slots"""
+        if size > self._size:
+            self.extend(np.full(size - self._size, fill, dtype=self._data.dtype))
+
+    def keep(self, mask: np.ndarray) -> None:
+        """Drop elements where mask is False, releasing the spare capacity"""
+        self._data = self.values[mask].copy()
+        self._size = len(self._data)
@@ -0,0 +1,357 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from app.core.config import settings
+
+INVALIDATE_CHANNEL = "qc:invalidate"
+ENTRY_KEY = "qc:entry:{key}"
+TAG_KEY = "qc:tag:{tag}"
+
+def table_tags(table: str, asins: Optional[Iterable[str]] = None) -> Set[str]:
+    """Tags a result reading `table` (only these ASINs' rows, if given) depends on"""
+    if asins is None:
+        return {table}
+    return {f"{table}:*", *(f"{table}:{asin}" for asin in asins)}
+
+
+def write_tags(table: str, asins: Optional[Iterable[str]] = None) -> Set[str]:
+    """Tags invalidated by a write to `table` (only these ASINs' rows, if given)"""
+    if asins is None:
+        return {table, f"{table}:*"}
+    return {table, *(f"{table}:{asin}" for asin in asins)}
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    tags: Set[str]
+    route: str
+    expires: float
+
+
+@dataclass
+class _RouteStats:
+    hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # Lookups that waited for another request's computation of the same key
+    stores: int = 0
+    stale_skips: int = 0  # Results not stored because a dependency changed while computing
+    entries: int = 0
+    bytes: int = 0
+    compute_ms: float = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.redis_hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.hits + self.redis_hits) / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "stale_skips": self.stale_skips,
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "avg_miss_ms": round(self.compute_ms / self.misses, 2) if self.misses else None,
+        }
+
+
+class QueryCache:
+    """Two-tier cache of read endpoint results, invalidated by the tables they read
+
+    Results are kept in a per-process LRU bounded by serialized size and,
+    when Redis is reachable, in Redis with a TTL so other workers can share
+    them. Each result is tagged with the tables (or table rows by ASIN) it
+    read; writes invalidate those tags locally, in Redis, and on every other
+    worker through pub/sub. The TTL bounds staleness from writes that are
+    not reported.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._seq = 0  # Bumped by every invalidation
+        self._invalidated_at: Dict[str, int] = {}
+        self._routes: Dict[str, _RouteStats] = {}
+        self.worker_id = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._redis = None
+        self._pending_remote: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"invalidations": 0, "evictions": 0, "remote_invalidations": 0}
+
+    async def start(self) -> None:
+        from app.services.product_sync import change_feed
+        change_feed.subscribe(self._on_change)
+
+        if settings.QUERY_CACHE_REDIS:
+            try:
+                import redis.asyncio as redis
+                self._redis = redis.from_url(settings.REDIS_URL)
+                await self._redis.ping()
+                self._tasks.append(asyncio.create_task(self._listen()))
+            except Exception as e:
+                print(f"Query cache running without Redis: {e}")
+                self._redis = None
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    # Decorator
+
+    def cached(
+        self,
+        tables: Iterable[str] = (),
+        asin_tables: Iterable[str] = (),
+        asins: Optional[Callable[[Dict[str, Any]], Iterable[str]]] = None,
+        response_model: Any = None,
+        ttl: Optional[float] = None
+    ):
+        """Cache a read endpoint by its normalized route and parameters
+
+        `tables` are read in full. `asin_tables` are read only for the ASINs
+        `asins(params)` returns from the endpoint's parameters. Endpoints
+        returning ORM objects pass their `response_model` so results are
+        cached in serialized form.
+        """
+        adapter = TypeAdapter(response_model) if response_model is not None else None
+
+        def decorate(endpoint: Callable[..., Awaitable[Any]]):
+            route = f"{endpoint.__module__.rsplit('.', 1)[-1]}.{endpoint.__name__}"
+            signature = inspect.signature(endpoint)
+
+            @functools.wraps(endpoint)
+            async def wrapper(*args, **kwargs):
+                if not settings.QUERY_CACHE_ENABLED:
+                    return await endpoint(*args, **kwargs)
+                params = signature.bind(*args, **kwargs)
+                params.apply_defaults()
+                arguments = {
+                    name: value for name, value in params.arguments.items()
+                    if isinstance(value, (str, int, float, bool, list, tuple, type(None)))
+                }
+                tags = set()
+                for table in tables:
+                    tags |= table_tags(table)
+                if asin_tables:
+                    keys = list(asins(arguments)) if asins else None
+                    for table in asin_tables:
+                        tags |= table_tags(table, keys)
+
+                async def compute() -> Any:
+                    value = await endpoint(*args, **kwargs)
+                    if adapter is not None:
+                        value = adapter.dump_python(adapter.validate_python(value, from_attributes=True), mode="json")
+                    return jsonable_encoder(value)
+
+                return await self.get_or_compute(route, arguments, tags, compute, ttl or self.ttl)
+
+            return wrapper
+        return decorate
+
+    def _key(self, route: str, arguments: Dict[str, Any]) -> str:
+        normalized = json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
+        return f"{route}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+    def _route(self, route: str) -> _RouteStats:
+        if route not in self._routes:
+            self._routes[route] = _RouteStats()
+        return self._routes[route]
+
+    async def get_or_compute(
+        self, route: str, arguments: Dict[str, Any], tags: Set[str], compute: Callable[[], Awaitable[Any]], ttl: float
+    ) -> Any:
+        stats = self._route(route)
+        key = self._key(route, arguments)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires > now:
+            self._entries.move_to_end(key)
+            stats.hits += 1
+            return entry.value
+
+        # Redis may still hold entries whose invalidation is waiting to be flushed
+        if self._redis is not None and not tags & self._pending_remote:
+            try:
+                cached = await self._redis.get(ENTRY_KEY.format(key=key))
+            except Exception:
+                cached = None
+            if cached is not None:
+                stats.redis_hits += 1
+                value = json.loads(cached)
+                self._store_local(key, route, value, len(cached), tags, ttl)
+                return value
+
+        # Concurrent misses for the same key share one computation
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stats.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        started_seq = self._seq
+        started = time.perf_counter()
+        try:
+            value = await compute()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            stats.compute_ms += (time.perf_counter() - started) * 1000
+        future.set_result(value)
+
+        if any(self._invalidated_at.get(tag, 0) > started_seq for tag in tags):
+            stats.stale_skips += 1
+            return value
+
+        payload = json.dumps(value, separators=(",", ":"))
+        self._store_local(key, route, value, len(payload), tags, ttl)
+        stats.stores += 1
+        if self._redis is not None:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.set(ENTRY_KEY.format(key=key), payload, ex=int(ttl))
+                    for tag in tags:
+                        pipe.sadd(TAG_KEY.format(tag=tag), key)
+                        pipe.expire(TAG_KEY.format(tag=tag), int(ttl) * 2)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"Error storing query cache entry: {e}")
+        return value
+
+    def _store_local(self, key: str, route: str, value: Any, size: int, tags: Set[str], ttl: float) -> None:
+        if size > self.max_bytes // 10:
+            return  # One huge result should not flush everything else
+        self._drop(key)
+        self._entries[key] = _Entry(value, size, tags, route, time.monotonic() + ttl)
+        self._bytes += size
+        stats = self._route(route)
+        stats.entries += 1
+        stats.bytes += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while self._bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        stats = self._route(entry.route)
+        stats.entries -= 1
+        stats.bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    # Invalidation
+
+    def _invalidate_local(self, tags: Set[str]) -> None:
+        self._seq += 1
+        for tag in tags:
+            self._invalidated_at[tag] = self._seq
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+
+    async def invalidate(self, table: str, asins: Optional[Iterable[str]] = None) -> None:
+        """Drop cached results that read rows of `table` (only these ASINs, if given)
+
+        Local entries are dropped immediately. Redis entries and other
+        workers are updated in the background, so bursts of invalidations
+        (a bulk import, a sync job) share a few round trips.
+        """
+        tags = write_tags(table, list(asins) if asins is not None else None)
+        self.stats["invalidations"] += 1
+        self._invalidate_local(tags)
+        if self._redis is not None:
+            self._pending_remote |= tags
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.ensure_future(self._flush_remote())
+
+    async def _flush_remote(self) -> None:
+        await asyncio.sleep(0)  # Let the rest of a burst accumulate
+        while self._pending_remote and self._redis is not None:
+            tags, self._pending_remote = self._pending_remote, set()
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for tag in tags:
+                        pipe.smembers(TAG_KEY.format(tag=tag))
+                    members = await pipe.execute()
+                keys = {ENTRY_KEY.format(key=key.decode()) for group in members for key in group}
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    if keys:
+                        pipe.delete(*keys)
+                    pipe.delete(*(TAG_KEY.format(tag=tag) for tag in tags))
+                    pipe.publish(INVALIDATE_CHANNEL, json.dumps({"origin": self.worker_id, "tags": sorted(tags)}))
+                    await pipe.execute()
+            except Exception as e:
+                print(f"Error invalidating query cache: {e}")
+
+    def _on_change(self, event) -> Awaitable[None]:
+        return self.invalidate("products", [event.asin])
+
+    async def _listen(self) -> None:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(INVALIDATE_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                update = json.loads(message["data"])
+                if update["origin"] != self.worker_id:
+                    self.stats["remote_invalidations"] += 1
+                    self._invalidate_local(set(update["tags"]))
+        finally:
+            await pubsub.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "redis": self._redis is not None,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            **self.stats,
+            "routes": {route: stats.snapshot() for route, stats in sorted(self._routes.items())},
+        }
+
+
+query_cache = QueryCache(settings.QUERY_CACHE_MAX_MB * 1024 * 1024, settings.QUERY_CACHE_TTL_SECONDS)
+
+
+def cache_metrics() -> Dict[str, Any]:
+    """Hit ratio and memory per cached route"""
+    return query_cache.snapshot()
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict, List
 
 
 class Settings(BaseSettings):
@@ -27,8 +27,153 @@ class Settings(BaseSettings):
     
     # Amazon APIs
     RAINFOREST_API_KEY: Optional[str] = None
+    RAINFOREST_BASE_URL: str = "https://api.rainforestapi.com/request"
     AMAZON_MARKETPLACE: str = "US"  # US, UK, DE, etc.
     
+    # Upstream resilience (Rainforest, AI providers)
+    UPSTREAM_TIMEOUT_SECONDS: float = 10.0  # Per attempt
+    UPSTREAM_DEADLINE_SECONDS: float = 25.0  # Per call, across retries
+    UPSTREAM_MAX_ATTEMPTS: int = 3
+    UPSTREAM_BACKOFF_BASE_SECONDS: float = 0.2
+    UPSTREAM_BACKOFF_MAX_SECONDS: float = 5.0
+    UPSTREAM_HEDGE_DELAY_SECONDS: Optional[float] = None  # Enables hedged requests
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    
+    # Upstream record/replay for offline benchmarks
+    UPSTREAM_RECORD_MODE: Optional[str] = None  # record: save upstream calls to cassettes; replay: serve them
+    UPSTREAM_CASSETTE_DIR: str = "/tmp/amazon-analytics-cassettes"
+    UPSTREAM_REPLAY_LATENCY: str = "recorded"  # recorded, sampled from the upstream's distribution, or none
+    UPSTREAM_REPLAY_LATENCY_SCALE: float = 1.0
+    UPSTREAM_REPLAY_MISSING: str = "error"  # error, or any: replay another recording of the same kind
+    
+    # Product sync change capture
+    PRICE_HEARTBEAT_HOURS: int = 24  # Record an unchanged price at most this often
+    CHANGE_FEED_BUFFER_SIZE: int = 10000
+    
+    # Per-client rate limiting, in cost units (a cached read costs 1)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS: bool = True  # Falls back to per-process buckets when Redis is unreachable
+    RATE_LIMIT_RATE: float = 10  # Units refilled per second per client
+    RATE_LIMIT_BURST: float = 100
+    RATE_LIMIT_API_KEYS: Dict[str, str] = {}  # X-API-Key -> client name; other callers are limited per IP
+    RATE_LIMIT_TRUSTED_PROXIES: List[str] = []  # Addresses or CIDRs whose X-Real-IP header is trusted
+    RATE_LIMIT_CLIENT_RATES: Dict[str, float] = {}  # Per-client rate overrides; burst scales with the rate
+    RATE_LIMIT_QUEUES: Dict[str, int] = {"upstream": 4, "ai": 2}  # Concurrent expensive requests per worker
+    RATE_LIMIT_QUEUE_TIMEOUT_SECONDS: float = 15
+    RATE_LIMIT_QUEUE_PER_CLIENT: int = 20  # Waiting requests per client and queue
+    RATE_LIMIT_MAX_TRACKED_CLIENTS: int = 10000
+    
+    # Read endpoint result cache
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_REDIS: bool = True  # Shared second tier; falls back to in-process only
+    QUERY_CACHE_MAX_MB: int = 64  # Per-process LRU, by serialized size
+    QUERY_CACHE_TTL_SECONDS: int = 300  # Bounds staleness from writes that are not reported
+    
+    # Batch lookups
+    BATCH_LOOKUP_MAX_ASINS: int = 500
+    COALESCE_WINDOW_MS: float = 2  # Single-ASIN lookups arriving this close together share one query
+    COALESCE_MAX_BATCH: int = 200
+    
+    # Bulk imports
+    IMPORT_BATCH_ROWS: int = 5000  # Rows per validate/COPY/merge transaction
+    IMPORT_MAX_ERRORS: int = 1000  # Row-level errors kept in the report
+    IMPORT_MAX_UPLOAD_MB: int = 1024
+    
+    # AI prompt context
+    AI_CONTEXT_TOKEN_BUDGET: int = 300  # Per product
+    AI_INSIGHTS_TOKEN_BUDGET: int = 1500  # For client-supplied data
+    AI_CONTEXT_WINDOW_DAYS: int = 30
+    AI_CONTEXT_CACHE_SIZE: int = 5000
+    AI_CONTEXT_CACHE_TTL_SECONDS: int = 900  # Analytics change without a new product version
+    
+    # Similar products
+    SIMILARITY_EMBEDDING_MODEL: Optional[str] = None  # sentence-transformers model; hashing TF-IDF when unset
+    SIMILARITY_DIM: int = 128  # Hashing embedder dimensions; 512 MB of float32 vectors per million products
+    SIMILARITY_NPROBE: int = 8  # Partitions scanned per query
+    SIMILARITY_IVF_MIN_ROWS: int = 10000  # Exact search below this many products
+    SIMILARITY_REFRESH_SECONDS: int = 60
+    SIMILARITY_INDEX_PATH: str = "/tmp/amazon-analytics-similarity.npz"
+    
+    # Live updates
+    LIVE_REDIS_FANOUT: bool = True  # Falls back to in-process fan-out when Redis is unreachable
+    LIVE_DEBOUNCE_MS: float = 250  # Coalesce bursts of product changes into one recompute
+    LIVE_REFRESH_SECONDS: float = 30  # Refresh analytics topics, which have no change events
+    LIVE_QUEUE_SIZE: int = 100
+    LIVE_SNAPSHOT_TTL_SECONDS: int = 3600
+    LIVE_MAX_TOPICS_PER_CONNECTION: int = 50
+    
+    # Background jobs
+    JOB_WORKERS_IN_API: bool = False  # Otherwise run scripts/run_job_worker.py
+    JOB_WORKER_CONCURRENCY: int = 4
+    JOB_TYPE_CONCURRENCY: Dict[str, int] = {
+        "ai_category_analysis": 1, "catalog_export": 1, "bulk_sync": 2, "catalog_import": 2,
+        "anomaly_detection": 1
+    }
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_HEARTBEAT_SECONDS: float = 5.0
+    JOB_STALE_SECONDS: int = 120  # Running jobs without a heartbeat this long are requeued
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RESULT_DIR: str = "/tmp/amazon-analytics-jobs"
+    JOB_INLINE_RESULT_BYTES: int = 64 * 1024
+    
+    # History retention
+    RETENTION_ENABLED: bool = False  # Run the retention job in the API process
+    RETENTION_INTERVAL_MINUTES: int = 60
+    PRICE_RAW_RETENTION_DAYS: int = 30  # Then hourly OHLC
+    PRICE_HOURLY_RETENTION_DAYS: int = 180  # Then daily OHLC
+    ANALYTICS_RAW_RETENTION_DAYS: int = 400  # Then daily rollups
+    RETENTION_COMPRESS_AFTER_DAYS: int = 7
+    
+    # Anomaly detection
+    ANOMALY_ENABLED: bool = False  # Run the detector in the API process
+    ANOMALY_INTERVAL_SECONDS: int = 300
+    ANOMALY_SEASONALITY: str = "weekly"  # weekly: day-of-week baselines for daily rows; daily: hour-of-day for hourly rows
+    ANOMALY_ALPHA: float = 0.1  # Baseline and scale smoothing per observation
+    ANOMALY_GAMMA: float = 0.1  # Seasonal profile smoothing
+    ANOMALY_Z_THRESHOLD: float = 4.0
+    ANOMALY_MIN_CHANGE: float = 0.3  # Deviations must also be this fraction of the baseline
+    ANOMALY_WARMUP_OBSERVATIONS: int = 14  # Per ASIN and metric before anything is flagged
+    ANOMALY_WARMUP_DAYS: int = 28  # History replayed to rebuild state on a cold start
+    ANOMALY_FLAG_MAX_AGE_HOURS: int = 48  # Older rows update baselines without being flagged
+    ANOMALY_BATCH_ROWS: int = 50000
+    ANOMALY_MAX_ASINS: int = 500000  # Least recently seen ASINs are evicted beyond this
+    ANOMALY_STATE_PATH: str = "/tmp/amazon-analytics-anomalies.npz"
+    
+    # Analytics cube
+    CUBE_CACHE_TTL_SECONDS: int = 60
+    CUBE_STREAM_THRESHOLD_ROWS: int = 5000  # Larger results are streamed
+    
+    # Analytics snapshot
+    ANALYTICS_BACKEND: str = "sql"  # sql or snapshot
+    ANALYTICS_SNAPSHOT_MAX_MB: int = 256
+    ANALYTICS_SNAPSHOT_REFRESH_SECONDS: int = 60
+    ANALYTICS_SNAPSHOT_RELOAD_SECONDS: int = 3600  # Full reload; also on drift from SQL
+    ANALYTICS_SNAPSHOT_DAYS: int = 365
+    
+    # Price elasticity job
+    ELASTICITY_SHARD_SIZE: int = 500  # ASINs per process-pool task
+    ELASTICITY_WORKERS: Optional[int] = None  # Defaults to CPU count
+    ELASTICITY_MAX_LAG_DAYS: int = 7
+    ELASTICITY_MIN_OBSERVATIONS: int = 14
+    
+    # Forecasting job
+    FORECAST_SHARD_SIZE: int = 500  # Series per process-pool task
+    FORECAST_WORKERS: Optional[int] = None  # Defaults to CPU count
+    FORECAST_HISTORY_DAYS: int = 365
+    FORECAST_REFIT_DAYS: int = 7  # Refit parameters this often; new days are folded in on every run
+    FORECAST_MIN_OBSERVATIONS: int = 28
+    FORECAST_MAX_HORIZON_DAYS: int = 90
+    
+    # Category/brand benchmarks
+    BENCHMARK_SKETCH_K: int = 200  # KLL accuracy/size trade-off
+    BENCHMARK_CACHE_TTL_SECONDS: int = 300
+    BENCHMARK_REBUILD_ENABLED: bool = True  # Rebuild in the API process; live updates only add new products
+    BENCHMARK_REBUILD_INTERVAL_MINUTES: int = 60
+    
+    # Startup
+    STARTUP_IMPORT_BUDGET_MS: int = 1500  # Max cold import time of app.main
+    
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
@@ -0,0 +1,5 @@
+"""PostgreSQL advisory lock keys, kept in one place so no two uses collide"""
+
+RETENTION_LOCK_KEY = 723401  # One retention run at a time across workers
+JOB_CLAIM_LOCK_KEY = 723402  # Serializes job claims so per-type limits hold across workers
+BENCHMARK_LOCK_KEY = 723403  # Sketch rebuilds take it exclusively, sketch updates shared
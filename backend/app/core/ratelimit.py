@@ -0,0 +1,348 @@
+import asyncio
+import ipaddress
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+from app.core.config import settings
+
+BUCKET_KEY = "rl:bucket:{client}"
+USAGE_KEY = "rl:usage:{day}"  # Cost units spent per client, across workers
+THROTTLED_KEY = "rl:throttled:{day}"
+USAGE_TTL_SECONDS = 3 * 86400
+
+# Refill and take atomically, on Redis' clock so workers' clocks do not matter
+TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+    redis.call('HINCRBYFLOAT', KEYS[2], ARGV[4], cost)
+    redis.call('EXPIRE', KEYS[2], ARGV[5])
+else
+    retry_after = (cost - tokens) / rate
+    redis.call('HINCRBY', KEYS[3], ARGV[4], 1)
+    redis.call('EXPIRE', KEYS[3], ARGV[5])
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+class QueueFull(Exception):
+    """The client already has the maximum number of requests waiting in this queue"""
+
+
+class FairQueue:
+    """Concurrency limit for expensive endpoints that serves waiting clients round-robin
+
+    Each client waits in its own FIFO; a freed slot goes to the next client
+    in rotation, so a client with many queued requests only gets its turn
+    like everyone else.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_waiting_per_client: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_waiting_per_client = max_waiting_per_client
+        self.active = 0
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.stats = {"granted": 0, "queued": 0, "timeouts": 0, "rejected": 0}
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiting.values())
+
+    async def acquire(self, client: str, timeout: float) -> None:
+        if self.active < self.concurrency and not self._waiting:
+            self.active += 1
+            self.stats["granted"] += 1
+            return
+
+        waiters = self._waiting.setdefault(client, deque())
+        if len(waiters) >= self.max_waiting_per_client:
+            if not waiters:
+                del self._waiting[client]
+            self.stats["rejected"] += 1
+            raise QueueFull(f"{client} has {len(waiters)} requests waiting for {self.name}")
+
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                self.release()  # Granted as we gave up; pass the slot on
+            else:
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters and self._waiting.get(client) is waiters:
+                    del self._waiting[client]
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["timeouts"] += 1
+            raise
+        self.stats["granted"] += 1
+
+    def release(self) -> None:
+        """Hand the slot to the next waiting client in rotation, or free it"""
+        while self._waiting:
+            client, waiters = next(iter(self._waiting.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._waiting.move_to_end(client)
+            else:
+                del self._waiting[client]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "waiting_clients": len(self._waiting),
+            **self.stats,
+        }
+
+
+@dataclass
+class _ClientStats:
+    requests: int = 0
+    cost: float = 0.0
+    throttled: int = 0
+    queued: int = 0
+    queue_rejected: int = 0
+    queue_timeouts: int = 0
+    queue_wait_ms: float = 0.0
+    max_queue_wait_ms: float = 0.0
+    in_flight: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "cost": round(self.cost, 2),
+            "throttled": self.throttled,
+            "queued": self.queued,
+            "queue_rejected": self.queue_rejected,
+            "queue_timeouts": self.queue_timeouts,
+            "avg_queue_wait_ms": round(self.queue_wait_ms / self.queued, 1) if self.queued else None,
+            "max_queue_wait_ms": round(self.max_queue_wait_ms, 1),
+            "in_flight": self.in_flight,
+        }
+
+
+class RateLimiter:
+    """Cost-weighted token buckets per client, shared across workers through Redis
+
+    Clients are identified by a registered X-API-Key, otherwise by IP. Every
+    request spends its endpoint's cost from the client's bucket; endpoints
+    that call Amazon or AI providers cost more and also wait for a slot in
+    a fair queue. Without Redis each worker keeps its own buckets.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._redis = None
+        self._script = None
+        self._local: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # client -> (tokens, monotonic time)
+        self._clients: "OrderedDict[str, _ClientStats]" = OrderedDict()
+        self.queues = {
+            name: FairQueue(name, concurrency, settings.RATE_LIMIT_QUEUE_PER_CLIENT)
+            for name, concurrency in settings.RATE_LIMIT_QUEUES.items()
+        }
+        self.trusted_proxies = [
+            ipaddress.ip_network(proxy, strict=False) for proxy in settings.RATE_LIMIT_TRUSTED_PROXIES
+        ]
+        self.stats = {"redis_errors": 0}
+
+    async def start(self) -> None:
+        if settings.RATE_LIMIT_REDIS:
+            try:
+                import redis.asyncio as redis
+                self._redis = redis.from_url(settings.REDIS_URL)
+                await self._redis.ping()
+                self._script = self._redis.register_script(TOKEN_BUCKET)
+            except Exception as e:
+                print(f"Rate limiter running without Redis: {e}")
+                self._redis = None
+
+    async def stop(self) -> None:
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    # Endpoint costs
+
+    def cost(self, units: float, queue: Optional[str] = None):
+        """Set an endpoint's cost, and the fair queue it waits in if RATE_LIMIT_QUEUES has it"""
+
+        def decorate(endpoint: Callable) -> Callable:
+            endpoint.__rate_limit__ = (units, queue)
+            return endpoint
+        return decorate
+
+    def client_id(self, request: Request) -> str:
+        key = request.headers.get("x-api-key")
+        if key and key in settings.RATE_LIMIT_API_KEYS:
+            return f"key:{settings.RATE_LIMIT_API_KEYS[key]}"
+        peer = request.client.host if request.client else "unknown"
+        # X-Real-IP is only believed from our own proxies; anyone else could pick a fresh one per request
+        forwarded = request.headers.get("x-real-ip")
+        if forwarded and self._trusted(peer):
+            return f"ip:{forwarded}"
+        return f"ip:{peer}"
+
+    def _trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def limits(self, client: str) -> Tuple[float, float]:
+        rate = settings.RATE_LIMIT_CLIENT_RATES.get(client.split(":", 1)[1], self.rate)
+        return rate, self.burst * rate / self.rate
+
+    def _client(self, client: str) -> _ClientStats:
+        stats = self._clients.get(client)
+        if stats is None:
+            stats = self._clients[client] = _ClientStats()
+            while len(self._clients) > settings.RATE_LIMIT_MAX_TRACKED_CLIENTS:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return stats
+
+    async def take(self, client: str, cost: float) -> Tuple[bool, float, float]:
+        """Spend `cost` from the client's bucket: (allowed, tokens left, seconds until affordable)"""
+        rate, burst = self.limits(client)
+        cost = min(cost, burst)  # Otherwise it could never be afforded
+        if self._redis is not None:
+            day = datetime.now(timezone.utc).strftime("%Y%m%d")
+            try:
+                allowed, tokens, retry_after = await self._script(
+                    keys=[BUCKET_KEY.format(client=client), USAGE_KEY.format(day=day), THROTTLED_KEY.format(day=day)],
+                    args=[rate, burst, cost, client, USAGE_TTL_SECONDS]
+                )
+                return bool(allowed), float(tokens), float(retry_after)
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                print(f"Error checking rate limit in Redis: {e}")
+
+        now = time.monotonic()
+        tokens, updated = self._local.pop(client, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._local[client] = (tokens, now)
+        if len(self._local) > settings.RATE_LIMIT_MAX_TRACKED_CLIENTS:
+            self._local.popitem(last=False)  # Least recently seen, most likely full again anyway
+        return allowed, tokens, 0.0 if allowed else (cost - tokens) / rate
+
+    async def enforce(self, request: Request, response: Response):
+        """Router dependency charging the matched endpoint's cost to the caller"""
+        if not settings.RATE_LIMIT_ENABLED:
+            yield
+            return
+
+        cost, queue = getattr(request.scope.get("endpoint"), "__rate_limit__", (1, None))
+        client = self.client_id(request)
+        stats = self._client(client)
+        rate, burst = self.limits(client)
+        allowed, remaining, retry_after = await self.take(client, cost)
+        headers = {
+            "X-RateLimit-Limit": f"{burst:g}",
+            "X-RateLimit-Remaining": str(int(remaining)),
+            "X-RateLimit-Cost": f"{cost:g}",
+        }
+        if not allowed:
+            stats.throttled += 1
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded; this request costs {cost:g} of {rate:g} units/sec",
+                headers={**headers, "Retry-After": str(math.ceil(retry_after))}
+            )
+        response.headers.update(headers)
+        stats.requests += 1
+        stats.cost += cost
+
+        fair_queue = self.queues.get(queue) if queue else None
+        if fair_queue is not None:
+            started = time.perf_counter()
+            try:
+                await fair_queue.acquire(client, settings.RATE_LIMIT_QUEUE_TIMEOUT_SECONDS)
+            except QueueFull:
+                stats.queue_rejected += 1
+                raise HTTPException(status_code=429, detail=f"Too many requests waiting for {queue}")
+            except asyncio.TimeoutError:
+                stats.queue_timeouts += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Timed out waiting for a {queue} slot",
+                    headers={"Retry-After": str(math.ceil(settings.RATE_LIMIT_QUEUE_TIMEOUT_SECONDS))}
+                )
+            waited = (time.perf_counter() - started) * 1000
+            stats.queued += 1
+            stats.queue_wait_ms += waited
+            stats.max_queue_wait_ms = max(stats.max_queue_wait_ms, waited)
+
+        stats.in_flight += 1
+        try:
+            yield
+        finally:
+            stats.in_flight -= 1
+            if fair_queue is not None:
+                fair_queue.release()
+
+    async def snapshot(self) -> Dict[str, Any]:
+        usage = {}
+        if self._redis is not None:
+            day = datetime.now(timezone.utc).strftime("%Y%m%d")
+            try:
+                spent = await self._redis.hgetall(USAGE_KEY.format(day=day))
+                throttled = await self._redis.hgetall(THROTTLED_KEY.format(day=day))
+                for client in spent.keys() | throttled.keys():
+                    usage[client.decode()] = {
+                        "cost": round(float(spent.get(client, 0)), 2),
+                        "throttled": int(throttled.get(client, 0)),
+                    }
+            except Exception as e:
+                print(f"Error reading rate limit usage: {e}")
+
+        clients = sorted(self._clients.items(), key=lambda item: item[1].cost, reverse=True)
+        return {
+            "backend": "redis" if self._redis is not None else "local",
+            "rate": self.rate,
+            "burst": self.burst,
+            **self.stats,
+            "queues": {name: queue.snapshot() for name, queue in self.queues.items()},
+            "clients": {client: stats.snapshot() for client, stats in clients[:100]},
+            "usage_today": dict(sorted(usage.items(), key=lambda item: item[1]["cost"], reverse=True)[:100]),
+        }
+
+
+rate_limiter = RateLimiter(settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST)
+
+
+async def ratelimit_metrics() -> Dict[str, Any]:
+    """Per-client usage in this worker and today across workers, and fair queue state"""
+    return await rate_limiter.snapshot()
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.resilience import UpstreamError
+
+REDACTED_FIELDS = frozenset({"api_key"})
+MODES = (None, "record", "replay")
+
+
+def request_key(upstream: str, request: Dict[str, Any]) -> str:
+    """Stable key for a request, ignoring credentials"""
+    normalized = json.dumps(
+        {k: v for k, v in request.items() if k not in REDACTED_FIELDS}, sort_keys=True, separators=(",", ":"), default=str
+    )
+    return f"{upstream}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+@dataclass
+class _Cassette:
+    """Recordings of one upstream: by request key, by kind, and all latencies"""
+    by_key: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    by_kind: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    latencies_ms: List[float] = field(default_factory=list)
+    replays: Dict[str, int] = field(default_factory=dict)  # Next recording to serve per key
+
+
+class UpstreamRecorder:
+    """Records upstream calls to NDJSON cassettes and replays them offline
+
+    In record mode every call's request (without credentials), response or
+    UpstreamError and end-to-end latency, retries included, are appended to
+    `<UPSTREAM_CASSETTE_DIR>/<upstream>.ndjson`. In replay mode calls are
+    answered from the cassette after sleeping for the recorded latency, or
+    one sampled from that upstream's recorded distribution, without
+    touching the network. Repeated requests cycle through their recordings.
+    """
+
+    def __init__(self, mode: Optional[str], directory: str):
+        if mode not in MODES:
+            raise ValueError(f"Unknown upstream record mode: {mode}")
+        self.mode = mode
+        self.directory = directory
+        self._cassettes: Dict[str, _Cassette] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _path(self, upstream: str) -> str:
+        return os.path.join(self.directory, f"{upstream}.ndjson")
+
+    def _count(self, upstream: str, outcome: str) -> None:
+        counts = self.stats.setdefault(upstream, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    def _cassette(self, upstream: str) -> _Cassette:
+        cassette = self._cassettes.get(upstream)
+        if cassette is None:
+            cassette = self._cassettes[upstream] = _Cassette()
+            if os.path.exists(self._path(upstream)):
+                with open(self._path(upstream)) as f:
+                    for line in f:
+                        if line.strip():
+                            self._add(cassette, json.loads(line))
+        return cassette
+
+    def _add(self, cassette: _Cassette, entry: Dict[str, Any]) -> None:
+        cassette.by_key.setdefault(entry["key"], []).append(entry)
+        cassette.by_kind.setdefault(entry["kind"], []).append(entry)
+        cassette.latencies_ms.append(entry["latency_ms"])
+
+    async def call(
+        self, upstream: str, kind: str, request: Dict[str, Any], send: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Run `send` for a JSON-serializable result, recording or replaying it per the mode"""
+        if self.mode == "replay":
+            return await self._replay(upstream, kind, request)
+        if self.mode != "record":
+            return await send()
+
+        started = time.perf_counter()
+        entry = {
+            "key": request_key(upstream, request),
+            "kind": kind,
+            "request": {k: v for k, v in request.items() if k not in REDACTED_FIELDS},
+        }
+        try:
+            result = await send()
+            entry["response"] = result
+            return result
+        except UpstreamError as e:
+            entry["error"] = {"message": str(e).split(": ", 1)[-1], "status_code": e.status_code}
+            raise
+        finally:
+            entry["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            entry["recorded_at"] = time.time()
+            await self._write(upstream, entry)
+
+    async def _write(self, upstream: str, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        cassette = self._cassette(upstream)  # Loads earlier recordings before this one is appended
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(upstream), "a") as f:
+            f.write(line)
+        self._add(cassette, entry)
+        self._count(upstream, "recorded")
+
+    async def _replay(self, upstream: str, kind: str, request: Dict[str, Any]) -> Any:
+        cassette = self._cassette(upstream)
+        key = request_key(upstream, request)
+        recordings = cassette.by_key.get(key)
+        if recordings:
+            served = cassette.replays.get(key, 0)
+            cassette.replays[key] = served + 1
+            entry = recordings[served % len(recordings)]
+            self._count(upstream, "replayed")
+        elif settings.UPSTREAM_REPLAY_MISSING == "any" and cassette.by_kind.get(kind):
+            entry = random.choice(cassette.by_kind[kind])
+            self._count(upstream, "substituted")
+        else:
+            self._count(upstream, "missing")
+            raise UpstreamError(upstream, f"no recording for this {kind} request")
+
+        if settings.UPSTREAM_REPLAY_LATENCY == "recorded":
+            latency_ms = entry["latency_ms"]
+        elif settings.UPSTREAM_REPLAY_LATENCY == "sampled":
+            latency_ms = random.choice(cassette.latencies_ms)
+        else:
+            latency_ms = 0
+        if latency_ms:
+            await asyncio.sleep(latency_ms * settings.UPSTREAM_REPLAY_LATENCY_SCALE / 1000)
+
+        if "error" in entry:
+            raise UpstreamError(upstream, entry["error"]["message"], entry["error"]["status_code"])
+        return entry["response"]
+
+    def latency_percentiles(self, upstream: str) -> Dict[str, float]:
+        """Recorded latency distribution of an upstream's cassette"""
+        latencies = sorted(self._cassette(upstream).latencies_ms)
+        if not latencies:
+            return {}
+        pick = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+        return {"count": len(latencies), "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "directory": self.directory, "calls": self.stats}
+
+
+upstream_recorder = UpstreamRecorder(settings.UPSTREAM_RECORD_MODE, settings.UPSTREAM_CASSETTE_DIR)
@@ -0,0 +1,274 @@
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional
+from app.core.config import settings
+
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class UpstreamError(Exception):
+    """An upstream call failed after exhausting retries"""
+
+    def __init__(self, upstream: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+        self.status_code = status_code
+
+
+class CircuitOpenError(UpstreamError):
+    """The upstream's circuit breaker is open and the call was not attempted"""
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, response: Any):
+        self.response = response
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 5.0
+    retryable_statuses: FrozenSet[int] = RETRYABLE_STATUSES
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt`"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one probe through after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_started = None
+        if self.state == self.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) is presumed lost
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                return False
+            self._probe_started = now
+            return True
+        return self.state == self.CLOSED
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_started = None
+
+
+@dataclass
+class UpstreamMetrics:
+    calls: int = 0
+    successes: int = 0
+    failures: int = 0
+    attempts: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    short_circuited: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    status_codes: Dict[int, int] = field(default_factory=dict)
+    latencies_ms: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies_ms)
+        percentile = lambda q: round(latencies[min(int(q * len(latencies)), len(latencies) - 1)], 2) if latencies else None
+        return {
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "short_circuited": self.short_circuited,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "status_codes": dict(self.status_codes),
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+            "latency_p99_ms": percentile(0.99),
+        }
+
+
+class Upstream:
+    """Deadline, retry, circuit breaker and hedging policy for one upstream service
+
+    `call` takes a zero-argument coroutine factory producing an HTTP response
+    (anything with a `status_code`) so each retry or hedge issues a fresh
+    request. Retryable statuses, timeouts and connection errors are retried;
+    other 4xx responses raise UpstreamError immediately.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        deadline: float,
+        retry: RetryPolicy,
+        breaker: CircuitBreaker,
+        hedge_delay: Optional[float] = None
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retry = retry
+        self.breaker = breaker
+        self.hedge_delay = hedge_delay
+        self.metrics = UpstreamMetrics()
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[Any]],
+        deadline: Optional[float] = None,
+        hedge: bool = True
+    ) -> Any:
+        self.metrics.calls += 1
+        if not self.breaker.allow():
+            self.metrics.short_circuited += 1
+            raise CircuitOpenError(self.name, "circuit open, failing fast")
+
+        expires = time.monotonic() + (deadline or self.deadline)
+        last_error: Optional[UpstreamError] = None
+
+        for attempt in range(self.retry.max_attempts):
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempt:
+                self.metrics.retries += 1
+
+            started = time.monotonic()
+            try:
+                response = await self._attempt(request, min(self.timeout, remaining), hedge)
+            except asyncio.TimeoutError:
+                self.metrics.timeouts += 1
+                last_error = UpstreamError(self.name, "request timed out")
+            except _RetryableStatus as e:
+                last_error = UpstreamError(self.name, f"HTTP {e.response.status_code}", e.response.status_code)
+            except UpstreamError:
+                # Non-retryable status: the upstream is healthy, the request is not
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                # Connection errors, resets and client timeouts are transient
+                last_error = UpstreamError(self.name, str(e) or e.__class__.__name__)
+            else:
+                self.metrics.latencies_ms.append((time.monotonic() - started) * 1000)
+                self.metrics.successes += 1
+                self.breaker.record_success()
+                return response
+
+            if attempt + 1 < self.retry.max_attempts:
+                delay = self.retry.backoff(attempt)
+                if time.monotonic() + delay >= expires:
+                    break
+                await asyncio.sleep(delay)
+
+        self.metrics.failures += 1
+        self.breaker.record_failure()
+        raise last_error or UpstreamError(self.name, "deadline exceeded before first attempt")
+
+    async def _attempt(self, request: Callable[[], Awaitable[Any]], timeout: float, hedge: bool) -> Any:
+        """One logical attempt, optionally racing a hedged duplicate"""
+        if not hedge or not self.hedge_delay or self.hedge_delay >= timeout:
+            return await asyncio.wait_for(self._send(request), timeout)
+
+        expires = time.monotonic() + timeout
+        primary = self._spawn(request)
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay)
+            if not done:
+                self.metrics.hedges += 1
+                pending.add(self._spawn(request))
+
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.metrics.hedge_wins += 1
+                        return task.result()
+                if not pending:
+                    raise done.pop().exception()
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(expires - time.monotonic(), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _spawn(self, request: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        task = asyncio.ensure_future(self._send(request))
+        # The losing side of a hedge may fail after we stop watching it
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _send(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        self.metrics.attempts += 1
+        response = await request()
+        status = response.status_code
+        self.metrics.status_codes[status] = self.metrics.status_codes.get(status, 0) + 1
+        if status in self.retry.retryable_statuses:
+            raise _RetryableStatus(response)
+        if status >= 400:
+            raise UpstreamError(self.name, f"HTTP {status}", status)
+        return response
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            **self.metrics.snapshot(),
+        }
+
+
+_upstreams: Dict[str, Upstream] = {}
+
+
+def get_upstream(name: str) -> Upstream:
+    """Return the shared resilience policy for an upstream, creating it from settings"""
+    if name not in _upstreams:
+        _upstreams[name] = Upstream(
+            name,
+            timeout=settings.UPSTREAM_TIMEOUT_SECONDS,
+            deadline=settings.UPSTREAM_DEADLINE_SECONDS,
+            retry=RetryPolicy(
+                max_attempts=settings.UPSTREAM_MAX_ATTEMPTS,
+                base_delay=settings.UPSTREAM_BACKOFF_BASE_SECONDS,
+                max_delay=settings.UPSTREAM_BACKOFF_MAX_SECONDS
+            ),
+            breaker=CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS),
+            hedge_delay=settings.UPSTREAM_HEDGE_DELAY_SECONDS
+        )
+    return _upstreams[name]
+
+
+def upstream_metrics() -> Dict[str, Dict[str, Any]]:
+    """Per-upstream circuit state and call metrics"""
+    return {name: upstream.snapshot() for name, upstream in _upstreams.items()}
@@ -2,6 +2,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.api import api_router
 from app.core.config import settings
+from app.core.resilience import upstream_metrics
+from app.core.cache import query_cache, cache_metrics
+from app.core.ratelimit import rate_limiter, ratelimit_metrics
+from app.services.retention_service import retention_service
+from app.services.benchmark_service import benchmark_service
+from app.services.job_service import job_worker
+from app.services.live_service import live_hub
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -22,6 +29,37 @@ app.add_middleware(
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.on_event("startup")
+async def start_background_jobs():
+    await query_cache.start()
+    await rate_limiter.start()
+    await live_hub.start()
+    if settings.RETENTION_ENABLED:
+        retention_service.start_scheduler()
+    if settings.BENCHMARK_REBUILD_ENABLED:
+        benchmark_service.start_scheduler()
+    if settings.ANOMALY_ENABLED:
+        # Imported lazily so NumPy is only loaded when the detector runs here
+        from app.services.anomaly_service import anomaly_service
+        anomaly_service.start_scheduler()
+    if settings.JOB_WORKERS_IN_API:
+        job_worker.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await live_hub.stop()
+    await query_cache.stop()
+    await rate_limiter.stop()
+    await retention_service.stop_scheduler()
+    await benchmark_service.stop_scheduler()
+    if settings.ANOMALY_ENABLED:
+        from app.services.anomaly_service import anomaly_service
+        await anomaly_service.stop_scheduler()
+    if settings.JOB_WORKERS_IN_API:
+        await job_worker.stop()
+
+
 @app.get("/")
 async def root():
     return {"message": "Amazon Analytics API is running"}
@@ -29,4 +67,22 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/health/upstreams")
+async def upstream_health():
+    """Circuit breaker state and call metrics per upstream"""
+    return upstream_metrics()
+
+
+@app.get("/health/cache")
+async def cache_health():
+    """Read endpoint cache hit ratio and memory per route"""
+    return cache_metrics()
+
+
+@app.get("/health/ratelimit")
+async def ratelimit_health():
+    """Per-client request costs, throttling and fair queue waits"""
+    return await ratelimit_metrics()
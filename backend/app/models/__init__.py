@@ -1,3 +1,13 @@
 from .product import Product, PriceHistory, ProductAnalytics
+from .elasticity import PriceElasticity
+from .benchmark import DistributionSketch
+from .retention import PriceHistoryHourly, PriceHistoryDaily, ProductAnalyticsDaily, RetentionWatermark
+from .job import Job
+from .forecast import ForecastModel
+from .anomaly import Anomaly
 
-__all__ = ["Product", "PriceHistory", "ProductAnalytics"]
\ No newline at end of file
+__all__ = [
+    "Product", "PriceHistory", "ProductAnalytics", "PriceElasticity", "DistributionSketch",
+    "PriceHistoryHourly", "PriceHistoryDaily", "ProductAnalyticsDaily", "RetentionWatermark",
+    "Job", "ForecastModel", "Anomaly",
+]
\ No newline at end of file
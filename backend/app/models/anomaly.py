@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class Anomaly(Base):
+    __tablename__ = "anomalies"
+    __table_args__ = (UniqueConstraint("asin", "metric", "observed_at", name="uq_anomalies_observation"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    asin = Column(String(20), index=True, nullable=False)
+    metric = Column(String(20), nullable=False)  # views, conversions, revenue, bounce_rate
+    direction = Column(String(8), nullable=False)  # drop, spike
+    value = Column(Float, nullable=False)
+    expected = Column(Float, nullable=False)  # Seasonal baseline at the time of the observation
+    score = Column(Float, nullable=False)  # Robust z-score of the deviation
+    analytics_id = Column(Integer)  # product_analytics row that triggered it
+    observed_at = Column(DateTime(timezone=True), index=True, nullable=False)
+    detected_at = Column(DateTime(timezone=True), server_default=func.now())
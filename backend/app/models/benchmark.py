@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class DistributionSketch(Base):
+    __tablename__ = "distribution_sketches"
+    __table_args__ = (UniqueConstraint("dimension", "key", "metric", name="uq_distribution_sketch"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    dimension = Column(String(20), nullable=False)  # category, brand
+    key = Column(String(255), nullable=False)
+    metric = Column(String(20), nullable=False)  # price, rating, review_count
+    count = Column(Integer, default=0)
+    sketch = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
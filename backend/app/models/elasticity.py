@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class PriceElasticity(Base):
+    __tablename__ = "price_elasticity"
+
+    id = Column(Integer, primary_key=True, index=True)
+    asin = Column(String(20), unique=True, index=True, nullable=False)
+    elasticity = Column(Float)  # d ln(conversions) / d ln(price)
+    r_squared = Column(Float)
+    observations = Column(Integer, default=0)
+    lagged_correlations = Column(JSON)  # {"views": [lag0, lag1, ...], ...}
+    data_through = Column(DateTime(timezone=True), nullable=False)  # Newest input row used
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class ForecastModel(Base):
+    __tablename__ = "forecast_models"
+    __table_args__ = (UniqueConstraint("scope", "key", "metric", name="uq_forecast_models_series"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(16), nullable=False)  # asin, category
+    key = Column(String(255), nullable=False)  # ASIN or category name
+    metric = Column(String(20), nullable=False)  # revenue, views, conversions, price
+    method = Column(String(20), nullable=False)  # holt_winters, seasonal_naive
+    params = Column(JSON)  # {"alpha": ..., "beta": ..., "gamma": ...}
+    level = Column(Float)
+    trend = Column(Float)
+    season = Column(JSON)  # Seasonal terms indexed by day number % 7
+    rmse = Column(Float)  # One-step-ahead error over the fit window
+    observations = Column(Integer, default=0)
+    data_through = Column(DateTime(timezone=True), nullable=False)  # Last day folded into the state
+    fitted_at = Column(DateTime(timezone=True), nullable=False)  # Last full refit
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Text, Boolean, Index
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_created_at", "status", "created_at"),)
+
+    id = Column(String(36), primary_key=True)  # uuid4
+    type = Column(String(50), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    params = Column(JSON)
+    progress = Column(Float, default=0.0)  # 0..1
+    progress_message = Column(String(255))
+    result = Column(JSON)  # Small results inline
+    result_path = Column(String(500))  # Large results are written to JOB_RESULT_DIR
+    result_bytes = Column(Integer)
+    error = Column(Text)
+    cancel_requested = Column(Boolean, default=False)
+    attempts = Column(Integer, default=0)
+    worker_id = Column(String(100))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    @property
+    def has_result_file(self) -> bool:
+        return bool(self.result_path)
@@ -22,6 +22,7 @@ class Product(Base):
     features = Column(JSON)
     dimensions = Column(JSON)
     weight = Column(Float)
+    content_hash = Column(String(64))  # Hash of the last synced normalized payload
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
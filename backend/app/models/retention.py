@@ -0,0 +1,51 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from app.db.database import Base
+
+
+class PriceHistoryHourly(Base):
+    __tablename__ = "price_history_hourly"
+
+    asin = Column(String(20), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True, index=True)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    avg = Column(Float, nullable=False)
+    samples = Column(Integer, nullable=False)
+    currency = Column(String(3), default="USD")
+
+
+class PriceHistoryDaily(Base):
+    __tablename__ = "price_history_daily"
+
+    asin = Column(String(20), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True, index=True)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    avg = Column(Float, nullable=False)
+    samples = Column(Integer, nullable=False)
+    currency = Column(String(3), default="USD")
+
+
+class ProductAnalyticsDaily(Base):
+    __tablename__ = "product_analytics_daily"
+
+    asin = Column(String(20), primary_key=True)
+    date = Column(DateTime(timezone=True), primary_key=True, index=True)
+    views = Column(Integer, default=0)
+    conversions = Column(Integer, default=0)
+    revenue = Column(Float, default=0.0)
+    bounce_rate = Column(Float, default=0.0)
+    avg_session_duration = Column(Float, default=0.0)
+    samples = Column(Integer, nullable=False)
+
+
+class RetentionWatermark(Base):
+    __tablename__ = "retention_watermarks"
+
+    # Rows of `table_name` older than `through` live only in the next tier down
+    table_name = Column(String(64), primary_key=True)
+    through = Column(DateTime(timezone=True), nullable=False)
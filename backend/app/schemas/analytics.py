@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Literal
+from datetime import datetime, date
 
 
 class AnalyticsBase(BaseModel):
@@ -28,4 +28,67 @@ class TopProductsResponse(BaseModel):
     metric_value: float
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CubeQuery(BaseModel):
+    bucket: Literal["hour", "day", "week", "month"] = "day"
+    group_by: List[Literal["category", "brand", "asin"]] = []
+    metrics: List[Literal["revenue", "views", "conversions", "conversion_rate", "revenue_per_view"]] = [
+        "revenue", "views", "conversions"
+    ]
+    days: int = Field(30, ge=1, le=365)
+    start: Optional[datetime] = None  # Overrides days when set
+    end: Optional[datetime] = None
+    asins: Optional[List[str]] = None
+    categories: Optional[List[str]] = None
+    brands: Optional[List[str]] = None
+    limit: Optional[int] = Field(None, ge=1, le=100000)
+
+
+class PriceElasticityResponse(BaseModel):
+    asin: str
+    elasticity: Optional[float]
+    r_squared: Optional[float]
+    observations: int
+    lagged_correlations: Optional[Dict[str, List[Optional[float]]]]
+    data_through: datetime
+    computed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ForecastPoint(BaseModel):
+    date: date
+    value: float
+    lower: float
+    upper: float
+
+
+class ForecastResponse(BaseModel):
+    scope: Literal["asin", "category"]
+    key: str
+    metric: str
+    method: str  # holt_winters, seasonal_naive
+    params: Optional[Dict[str, float]] = None
+    rmse: Optional[float] = None
+    observations: int
+    data_through: datetime
+    fitted_at: datetime
+    forecast: List[ForecastPoint]
+
+
+class AnomalyResponse(BaseModel):
+    id: int
+    asin: str
+    metric: str
+    direction: Literal["drop", "spike"]
+    value: float
+    expected: float
+    score: float
+    analytics_id: Optional[int] = None
+    observed_at: datetime
+    detected_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
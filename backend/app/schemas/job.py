@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+
+class JobCreate(BaseModel):
+    type: str  # ai_category_analysis, catalog_export, catalog_import, bulk_sync, elasticity, forecast, benchmark_rebuild, retention
+    params: Dict[str, Any] = {}
+
+
+class JobResponse(BaseModel):
+    id: str
+    type: str
+    status: str
+    params: Optional[Dict[str, Any]] = None
+    progress: Optional[float] = None
+    progress_message: Optional[str] = None
+    result: Optional[Any] = None
+    result_bytes: Optional[int] = None
+    has_result_file: bool = False
+    error: Optional[str] = None
+    cancel_requested: Optional[bool] = None
+    attempts: Optional[int] = None
+    worker_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
 
 
@@ -16,7 +16,7 @@ class ProductBase(BaseModel):
     image_url: Optional[str] = None
     product_url: Optional[str] = None
     description: Optional[str] = None
-    features: Optional[Dict[str, Any]] = None
+    features: Optional[Union[List[str], Dict[str, Any]]] = None  # Rainforest sends feature bullets
     dimensions: Optional[Dict[str, Any]] = None
     weight: Optional[float] = None
 
@@ -41,8 +41,25 @@ class PriceHistoryBase(BaseModel):
 
 
 class PriceHistoryResponse(PriceHistoryBase):
-    id: int
+    id: Optional[int] = None  # None for downsampled points
     timestamp: datetime
+    resolution: str = "raw"  # raw, hour, day
+    open: Optional[float] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class ProductBatchRequest(BaseModel):
+    asins: List[str]
+
+
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse]
+    missing: List[str] = []
+
+
+class PriceHistoryBatchResponse(BaseModel):
+    price_history: Dict[str, List[PriceHistoryResponse]]
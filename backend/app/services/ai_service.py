@@ -1,7 +1,7 @@
-import json
 from typing import Dict, Any, Optional
-import httpx
 from app.core.config import settings
+from app.core.recording import upstream_recorder
+from app.services.context_builder import compact_data
 
 
 class AIService:
@@ -18,15 +18,13 @@ class AIService:
             else None
         )
 
-    async def analyze_product(self, asin: str, analysis_type: str = "comprehensive") -> str:
-        """Analyze a product using AI"""
+    async def analyze_product(self, asin: str, analysis_type: str = "comprehensive", context: Optional[str] = None) -> str:
+        """Analyze a product using AI, grounded in the given product context if any"""
         
-        prompt = self._get_analysis_prompt(asin, analysis_type)
+        prompt = self._get_analysis_prompt(asin, analysis_type, context)
         
-        if self.openai_api_key:
-            return await self._call_openai(prompt)
-        elif self.anthropic_api_key:
-            return await self._call_anthropic(prompt)
+        if self.openai_api_key or self.anthropic_api_key or upstream_recorder.replaying:
+            return await self._complete(f"analysis:{analysis_type}", prompt)
         else:
             return "AI analysis not available - please configure OpenAI or Anthropic API key"
 
@@ -35,14 +33,12 @@ class AIService:
         
         prompt = self._get_insights_prompt(data, insight_type)
         
-        if self.openai_api_key:
-            return await self._call_openai(prompt)
-        elif self.anthropic_api_key:
-            return await self._call_anthropic(prompt)
+        if self.openai_api_key or self.anthropic_api_key or upstream_recorder.replaying:
+            return await self._complete(f"insights:{insight_type}", prompt)
         else:
             return "AI insights not available - please configure OpenAI or Anthropic API key"
 
-    def _get_analysis_prompt(self, asin: str, analysis_type: str) -> str:
+    def _get_analysis_prompt(self, asin: str, analysis_type: str, context: Optional[str] = None) -> str:
         """Generate analysis prompt"""
         prompts = {
             "comprehensive": f"Provide a comprehensive analysis of Amazon product {asin}, including market position, pricing strategy, customer sentiment, and competitive landscape.",
@@ -50,11 +46,14 @@ class AIService:
             "reviews": f"Analyze customer reviews and sentiment for Amazon product {asin}.",
             "competition": f"Analyze the competitive landscape for Amazon product {asin}."
         }
-        return prompts.get(analysis_type, prompts["comprehensive"])
+        prompt = prompts.get(analysis_type, prompts["comprehensive"])
+        if context:
+            prompt += f"\nBase the analysis on our data for this product:\n{context}"
+        return prompt
 
     def _get_insights_prompt(self, data: Dict[str, Any], insight_type: str) -> str:
         """Generate insights prompt"""
-        data_str = json.dumps(data, indent=2)
+        data_str = compact_data(data, settings.AI_INSIGHTS_TOKEN_BUDGET)
         prompts = {
             "trends": f"Analyze the following analytics data and provide insights on trends:\n{data_str}",
             "recommendations": f"Based on the following data, provide actionable recommendations:\n{data_str}",
@@ -62,6 +61,12 @@ class AIService:
         }
         return prompts.get(insight_type, prompts["trends"])
 
+    async def _complete(self, kind: str, prompt: str) -> str:
+        """Send a prompt to the configured provider through the upstream recorder"""
+        send = self._call_openai if self.openai_api_key else self._call_anthropic
+        # One cassette for both providers, so replays need no key
+        return await upstream_recorder.call("ai", kind, {"prompt": prompt}, lambda: send(prompt))
+
     async def _call_openai(self, prompt: str) -> str:
         """Call OpenAI API"""
         # TODO: Implement actual OpenAI API integration
@@ -1,9 +1,10 @@
 import json
 import asyncio
 from typing import Dict, Any, Optional, List
-import requests
 from datetime import datetime
 from app.core.config import settings
+from app.core.resilience import UpstreamError, get_upstream
+from app.core.recording import upstream_recorder
 
 
 class AmazonDataService:
@@ -16,12 +17,14 @@ class AmazonDataService:
             if settings.RAINFOREST_API_KEY and settings.RAINFOREST_API_KEY.strip() and not settings.RAINFOREST_API_KEY.startswith('your_')
             else None
         )
-        self.base_url = "https://api.rainforestapi.com/request"
+        self.base_url = settings.RAINFOREST_BASE_URL
         self.marketplace = settings.AMAZON_MARKETPLACE
+        self.upstream = get_upstream("rainforest")
+        self._client = None
         
     async def search_products(self, query: str, pages: int = 1) -> List[Dict[str, Any]]:
         """Search for products on Amazon"""
-        if not self.api_key:
+        if not self.api_key and not upstream_recorder.replaying:
             return []
         
         try:
@@ -33,10 +36,7 @@ class AmazonDataService:
                 'page': '1'
             }
             
-            response = requests.get(self.base_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self._request(params)
             search_results = data.get('search_results', [])
             
             # Convert to our format
@@ -48,13 +48,15 @@ class AmazonDataService:
             
             return products
             
+        except UpstreamError:
+            raise
         except Exception as e:
             print(f"Error fetching search results: {e}")
             return []
     
     async def get_product_details(self, asin: str) -> Optional[Dict[str, Any]]:
         """Get detailed product information by ASIN"""
-        if not self.api_key:
+        if not self.api_key and not upstream_recorder.replaying:
             return None
         
         try:
@@ -65,10 +67,7 @@ class AmazonDataService:
                 'asin': asin
             }
             
-            response = requests.get(self.base_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self._request(params)
             product_data = data.get('product', {})
             
             if not product_data:
@@ -76,13 +75,15 @@ class AmazonDataService:
                 
             return self._convert_product_data_to_our_format(product_data)
             
+        except UpstreamError:
+            raise
         except Exception as e:
             print(f"Error fetching product details for {asin}: {e}")
             return None
     
     async def get_product_reviews(self, asin: str, pages: int = 1) -> Dict[str, Any]:
         """Get product reviews and ratings"""
-        if not self.api_key:
+        if not self.api_key and not upstream_recorder.replaying:
             return {
                 'total_reviews': 0,
                 'average_rating': 0.0,
@@ -98,10 +99,7 @@ class AmazonDataService:
                 'page': '1'
             }
             
-            response = requests.get(self.base_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self._request(params)
             reviews = data.get('reviews', [])
             
             # Process reviews
@@ -114,6 +112,8 @@ class AmazonDataService:
                 'reviews': reviews[:5]  # Return first 5 reviews
             }
             
+        except UpstreamError:
+            raise
         except Exception as e:
             print(f"Error fetching reviews for {asin}: {e}")
             return {
@@ -122,6 +122,25 @@ class AmazonDataService:
                 'reviews': []
             }
     
+    async def _request(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Perform a Rainforest API request and return the decoded JSON body
+
+        Deadlines, retries, circuit breaking and hedging come from the shared
+        "rainforest" upstream policy; failures raise UpstreamError instead of
+        turning into empty results. Calls go through the upstream recorder,
+        which can save them to or serve them from cassettes.
+        """
+        return await upstream_recorder.call("rainforest", params.get("type", ""), params, lambda: self._send(params))
+
+    async def _send(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self._client is None:
+            # Imported on first use so that importing the app stays cheap
+            import httpx
+            self._client = httpx.AsyncClient(timeout=self.upstream.timeout)
+
+        response = await self.upstream.call(lambda: self._client.get(self.base_url, params=params))
+        return response.json()
+    
     def _convert_search_result_to_product(self, item: Dict) -> Optional[Dict[str, Any]]:
         """Convert Rainforest API search result to our product format"""
         try:
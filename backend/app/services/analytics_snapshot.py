@@ -0,0 +1,367 @@
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone, date
+from typing import Dict, Any, List, Optional
+import numpy as np
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.arrays import GrowableArray
+from app.core.config import settings
+from app.models.product import Product, ProductAnalytics
+from app.services.retention_service import retention_service
+
+SECONDS_PER_DAY = 86400
+BOOKKEEPING = frozenset({"_lock", "last_reload", "reloads", "drift_reloads"})  # Kept across reloads
+
+
+class _Dictionary:
+    """Dictionary encoding of strings to dense int32 codes"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, value: Optional[str]) -> int:
+        value = value or ""
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    @property
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(v) for v in self.values) + sys.getsizeof(self.codes)
+
+
+class AnalyticsSnapshot:
+    """In-process columnar copy of product_analytics and product dimensions"""
+
+    def __init__(self, max_bytes: int, refresh_interval: int, window_days: int, reload_interval: int):
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self.window_days = window_days
+        self.reload_interval = reload_interval
+        self._lock = asyncio.Lock()
+        self.last_reload: Optional[float] = None
+        self.reloads = 0
+        self.drift_reloads = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.asins = _Dictionary()
+        self.categories = _Dictionary()
+        self.brands = _Dictionary()
+
+        # Product dimensions, indexed by ASIN code
+        self.product_present = GrowableArray(np.bool_)
+        self.product_category = GrowableArray(np.int32)
+        self.product_brand = GrowableArray(np.int32)
+        self.product_price = GrowableArray(np.float64)
+        self.product_rating = GrowableArray(np.float64)
+        self.product_titles: List[str] = []
+
+        # Analytics facts, one element per product_analytics row
+        self.fact_asin = GrowableArray(np.int32)
+        self.fact_date = GrowableArray(np.int64)  # Epoch seconds
+        self.fact_views = GrowableArray(np.int64)
+        self.fact_conversions = GrowableArray(np.int64)
+        self.fact_revenue = GrowableArray(np.float64)
+
+        self.coverage_start: Optional[datetime] = None
+        self.raw_since: Optional[datetime] = None  # product_analytics retention watermark
+        self.newest_date: Optional[datetime] = None
+        self._newest_ids: set = set()
+        self._products_synced_at: Optional[datetime] = None
+        self.last_refresh: Optional[float] = None
+        self.last_refresh_ms: float = 0.0
+
+    # Refresh
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """Refresh the snapshot if it is older than the refresh interval"""
+        if self.last_refresh and time.monotonic() - self.last_refresh < self.refresh_interval:
+            return
+        async with self._lock:
+            if self.last_refresh and time.monotonic() - self.last_refresh < self.refresh_interval:
+                return
+            await self.refresh(db)
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """Incrementally load products and analytics rows changed since the last refresh
+
+        The incremental pass only sees products with a newer updated_at and
+        rows dated at or after the newest loaded date. Rows updated in
+        place or backfilled, rows removed by retention and deleted products
+        are caught by comparing counts and totals with SQL after each pass,
+        and by a full reload every `reload_interval` seconds.
+        """
+        started = time.perf_counter()
+        if self.last_reload is None or time.monotonic() - self.last_reload >= self.reload_interval:
+            await self._reload(db)
+        else:
+            await self._refresh_products(db)
+            await self._refresh_facts(db)
+            self._enforce_bounds()
+            if await self._drifted(db):
+                self.drift_reloads += 1
+                await self._reload(db)
+        self.last_refresh = time.monotonic()
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+
+    async def _reload(self, db: AsyncSession) -> None:
+        """Load everything into a fresh snapshot and swap it in, so queries never see a partial one"""
+        fresh = AnalyticsSnapshot(self.max_bytes, self.refresh_interval, self.window_days, self.reload_interval)
+        await fresh._refresh_products(db)
+        await fresh._refresh_facts(db)
+        fresh._enforce_bounds()
+        self.__dict__.update({name: value for name, value in vars(fresh).items() if name not in BOOKKEEPING})
+        self.last_reload = time.monotonic()
+        self.reloads += 1
+
+    async def _drifted(self, db: AsyncSession) -> bool:
+        """Whether SQL disagrees with the snapshot on rows it should already hold
+
+        Facts are compared before the newest loaded date, where nothing new
+        can arrive, and products up to the last seen change.
+        """
+        if self.coverage_start is None or self.newest_date is None:
+            return False
+        window = and_(ProductAnalytics.date >= self.coverage_start, ProductAnalytics.date < self.newest_date)
+        facts = (await db.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(ProductAnalytics.views), 0),
+                func.coalesce(func.sum(ProductAnalytics.conversions), 0)
+            ).where(window)
+        )).one()
+        products = await db.scalar(
+            select(func.count()).select_from(Product).where(
+                func.coalesce(Product.updated_at, Product.created_at) <= self._products_synced_at
+            )
+        ) if self._products_synced_at else 0
+
+        mask = (self.fact_date.values >= int(self.coverage_start.timestamp())) & (
+            self.fact_date.values < int(self.newest_date.timestamp())
+        )
+        return (
+            tuple(int(value) for value in facts) != (
+                int(mask.sum()),
+                int(self.fact_views.values[mask].sum()),
+                int(self.fact_conversions.values[mask].sum())
+            )
+            or products != int(self.product_present.values.sum())
+        )
+
+    async def _refresh_products(self, db: AsyncSession) -> None:
+        changed_at = func.coalesce(Product.updated_at, Product.created_at)
+        query = select(
+            Product.asin, Product.title, Product.price, Product.rating,
+            Product.category, Product.brand, changed_at.label("changed_at")
+        )
+        if self._products_synced_at:
+            query = query.where(changed_at >= self._products_synced_at)
+
+        result = await db.execute(query)
+        for row in result.all():
+            code = self._asin_code(row.asin)
+            self.product_present.values[code] = True
+            self.product_category.values[code] = self.categories.encode(row.category)
+            self.product_brand.values[code] = self.brands.encode(row.brand)
+            self.product_price.values[code] = np.nan if row.price is None else row.price
+            self.product_rating.values[code] = np.nan if row.rating is None else row.rating
+            self.product_titles[code] = row.title
+            if row.changed_at and (not self._products_synced_at or row.changed_at > self._products_synced_at):
+                self._products_synced_at = row.changed_at
+
+    async def _refresh_facts(self, db: AsyncSession) -> None:
+        self.raw_since = (await retention_service.get_watermarks(db)).get("product_analytics")
+        query = select(
+            ProductAnalytics.id, ProductAnalytics.asin, ProductAnalytics.date,
+            ProductAnalytics.views, ProductAnalytics.conversions, ProductAnalytics.revenue
+        ).order_by(ProductAnalytics.date, ProductAnalytics.id)
+
+        if self.newest_date:
+            # Rows sharing the newest loaded date may still be arriving
+            same_date = and_(
+                ProductAnalytics.date == self.newest_date,
+                ProductAnalytics.id.notin_(self._newest_ids)
+            )
+            query = query.where(or_(ProductAnalytics.date > self.newest_date, same_date))
+        else:
+            self.coverage_start = self._window_start()
+            query = query.where(ProductAnalytics.date >= self.coverage_start)
+
+        result = await db.execute(query)
+        rows = result.all()
+        if not rows:
+            return
+
+        self.fact_asin.extend([self._asin_code(r.asin) for r in rows])
+        self.fact_date.extend([int(r.date.timestamp()) for r in rows])
+        self.fact_views.extend([r.views or 0 for r in rows])
+        self.fact_conversions.extend([r.conversions or 0 for r in rows])
+        self.fact_revenue.extend([r.revenue or 0.0 for r in rows])
+
+        newest = rows[-1].date
+        if newest != self.newest_date:
+            self._newest_ids = set()
+        self.newest_date = newest
+        self._newest_ids.update(r.id for r in rows if r.date == newest)
+
+    def _asin_code(self, asin: str) -> int:
+        code = self.asins.encode(asin)
+        if code >= len(self.product_present):
+            size = code + 1
+            self.product_present.resize(size, False)
+            self.product_category.resize(size, 0)
+            self.product_brand.resize(size, 0)
+            self.product_price.resize(size, np.nan)
+            self.product_rating.resize(size, np.nan)
+            self.product_titles.extend([""] * (size - len(self.product_titles)))
+        return code
+
+    def _window_start(self) -> datetime:
+        """Start of the window, capped at the raw-tier watermark
+
+        Older days only exist as daily rollups, which the snapshot does not
+        load, so `covers` sends queries reaching past the watermark to SQL.
+        """
+        start = datetime.now(timezone.utc) - timedelta(days=self.window_days)
+        return max(start, self.raw_since) if self.raw_since else start
+
+    def _enforce_bounds(self) -> None:
+        """Drop facts outside the window, then the oldest days until under the memory budget"""
+        cutoff = self._window_start()
+        if self.coverage_start is None or cutoff > self.coverage_start:
+            self._drop_facts_before(cutoff)
+
+        while self.memory_bytes() > self.max_bytes and len(self.fact_date):
+            oldest = datetime.fromtimestamp(int(self.fact_date.values.min()), timezone.utc)
+            self._drop_facts_before(oldest + timedelta(days=1))
+
+    def _drop_facts_before(self, cutoff: datetime) -> None:
+        keep = self.fact_date.values >= int(cutoff.timestamp())
+        for column in self._fact_columns():
+            column.keep(keep)
+        self.coverage_start = cutoff
+
+    def _fact_columns(self) -> List[GrowableArray]:
+        return [self.fact_asin, self.fact_date, self.fact_views, self.fact_conversions, self.fact_revenue]
+
+    # Introspection
+
+    def memory_bytes(self) -> int:
+        columns = self._fact_columns() + [
+            self.product_present, self.product_category, self.product_brand,
+            self.product_price, self.product_rating
+        ]
+        return (
+            sum(c.nbytes for c in columns)
+            + sum(sys.getsizeof(t) for t in self.product_titles)
+            + self.asins.nbytes + self.categories.nbytes + self.brands.nbytes
+        )
+
+    def covers(self, days: int) -> bool:
+        """Whether the snapshot holds every row of the last `days` days"""
+        if self.coverage_start is None:
+            return False
+        return datetime.now(timezone.utc) - timedelta(days=days) >= self.coverage_start
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "products": int(self.product_present.values.sum()),
+            "analytics_rows": len(self.fact_date),
+            "distinct_asins": len(self.asins.values),
+            "distinct_categories": len(self.categories.values),
+            "distinct_brands": len(self.brands.values),
+            "memory_bytes": self.memory_bytes(),
+            "max_bytes": self.max_bytes,
+            "coverage_start": self.coverage_start,
+            "newest_date": self.newest_date,
+            "last_refresh_ms": round(self.last_refresh_ms, 2),
+            "reloads": self.reloads,
+            "drift_reloads": self.drift_reloads,
+        }
+
+    # Queries
+
+    def _window_mask(self, days: int) -> np.ndarray:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        return self.fact_date.values >= int(cutoff.timestamp())
+
+    def overview(self) -> Dict[str, Any]:
+        present = self.product_present.values
+        prices = self.product_price.values[present]
+        ratings = self.product_rating.values[present]
+        prices = prices[~np.isnan(prices)]
+        ratings = ratings[~np.isnan(ratings)]
+        total_revenue = float(self.fact_revenue.values[self._window_mask(30)].sum())
+
+        return {
+            "total_products": int(present.sum()),
+            "average_price": round(float(prices.mean()), 2) if len(prices) else 0,
+            "total_revenue_30d": round(total_revenue, 2),
+            "average_rating": round(float(ratings.mean()), 2) if len(ratings) else 0
+        }
+
+    def top_products(self, metric: str, limit: int, days: int) -> List[Dict[str, Any]]:
+        mask = self._window_mask(days)
+        values = {
+            "revenue": self.fact_revenue,
+            "views": self.fact_views,
+            "conversions": self.fact_conversions,
+        }[metric].values[mask]
+        codes = self.fact_asin.values[mask]
+
+        size = len(self.product_present)
+        totals = np.bincount(codes, weights=values, minlength=size)
+        has_rows = np.bincount(codes, minlength=size) > 0
+        candidates = np.flatnonzero(has_rows & self.product_present.values)
+        if not len(candidates):
+            return []
+
+        order = candidates[np.argsort(-totals[candidates], kind="stable")][:limit]
+        return [
+            {
+                "asin": self.asins.values[code],
+                "title": self.product_titles[code],
+                "price": None if np.isnan(self.product_price.values[code]) else float(self.product_price.values[code]),
+                "rating": None if np.isnan(self.product_rating.values[code]) else float(self.product_rating.values[code]),
+                "metric_value": float(totals[code]) if metric == "revenue" else int(totals[code])
+            }
+            for code in order
+        ]
+
+    def trends(self, days: int) -> List[Dict[str, Any]]:
+        mask = self._window_mask(days)
+        day_index = self.fact_date.values[mask] // SECONDS_PER_DAY
+        if not len(day_index):
+            return []
+
+        days_present, inverse = np.unique(day_index, return_inverse=True)
+        revenue = np.bincount(inverse, weights=self.fact_revenue.values[mask])
+        views = np.bincount(inverse, weights=self.fact_views.values[mask])
+        conversions = np.bincount(inverse, weights=self.fact_conversions.values[mask])
+
+        epoch = date(1970, 1, 1)
+        return [
+            {
+                "date": epoch + timedelta(days=int(day)),
+                "revenue": float(revenue[i]),
+                "views": int(views[i]),
+                "conversions": int(conversions[i])
+            }
+            for i, day in enumerate(days_present)
+        ]
+
+
+# Create a singleton instance
+analytics_snapshot = AnalyticsSnapshot(
+    settings.ANALYTICS_SNAPSHOT_MAX_MB * 1024 * 1024,
+    settings.ANALYTICS_SNAPSHOT_REFRESH_SECONDS,
+    settings.ANALYTICS_SNAPSHOT_DAYS,
+    settings.ANALYTICS_SNAPSHOT_RELOAD_SECONDS
+)
@@ -0,0 +1,386 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.product import ProductAnalytics
+from app.models.anomaly import Anomaly
+
+METRICS = ("views", "conversions", "revenue", "bounce_rate")
+MIN_SCALE = np.array([1.0, 0.5, 1.0, 0.01], dtype=np.float32)  # Noise floor per metric, in its units
+SEASONALITY = {"weekly": (7, 86400), "daily": (24, 3600)}  # Slots and slot length in seconds
+MAD_TO_SIGMA = 1.2533  # Mean absolute deviation to standard deviation for normal noise
+HUBER_K = 3.0  # Residuals are clipped to this many sigmas before updating the baseline
+NEVER = np.iinfo(np.int64).min
+INSERT_CHUNK = 1000
+STATE_ARRAYS = ("level", "scale", "season", "count", "last_seen")
+
+
+class AnomalyState:
+    """Per-ASIN online baselines in dense arrays, one row per tracked ASIN
+
+    For every ASIN and metric the state holds an EWMA level, an additive
+    seasonal profile (day of week or hour of day) and an EWMA of absolute
+    residuals used as a robust scale. Each observation is scored against
+    level + season before it is folded in, with its residual clipped so a
+    collapse does not drag the baseline along with it.
+    """
+
+    def __init__(self, slots: int, slot_seconds: int, capacity: int = 1024):
+        self.slots = slots
+        self.slot_seconds = slot_seconds
+        self.asins: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.level = np.zeros((capacity, len(METRICS)), dtype=np.float32)
+        self.scale = np.zeros((capacity, len(METRICS)), dtype=np.float32)
+        self.season = np.zeros((capacity, len(METRICS), slots), dtype=np.float32)
+        self.count = np.zeros((capacity, len(METRICS)), dtype=np.int32)
+        self.last_seen = np.full(capacity, NEVER, dtype=np.int64)  # Epoch seconds of the newest row folded in
+
+    def __len__(self) -> int:
+        return len(self.asins)
+
+    @property
+    def memory_bytes(self) -> int:
+        arrays = sum(getattr(self, name).nbytes for name in STATE_ARRAYS)
+        keys = sum(sys.getsizeof(asin) for asin in self.asins)
+        return arrays + keys + sys.getsizeof(self.index) + sys.getsizeof(self.asins)
+
+    def _resize(self, capacity: int) -> None:
+        for name in STATE_ARRAYS:
+            array = getattr(self, name)
+            fill = NEVER if name == "last_seen" else 0
+            grown = np.full((capacity, *array.shape[1:]), fill, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def codes(self, asins: List[str]) -> np.ndarray:
+        """Row per ASIN, adding rows for ASINs seen for the first time"""
+        codes = np.empty(len(asins), dtype=np.int64)
+        for i, asin in enumerate(asins):
+            code = self.index.get(asin)
+            if code is None:
+                code = len(self.asins)
+                self.index[asin] = code
+                self.asins.append(asin)
+            codes[i] = code
+        if len(self.asins) > len(self.last_seen):
+            self._resize(max(len(self.asins), 2 * len(self.last_seen)))
+        return codes
+
+    def evict(self, keep: int) -> int:
+        """Keep the `keep` most recently seen ASINs; returns how many were dropped"""
+        dropped = len(self.asins) - keep
+        if dropped <= 0:
+            return 0
+        rows = np.sort(np.argsort(self.last_seen[:len(self.asins)], kind="stable")[dropped:])
+        for name in STATE_ARRAYS:
+            setattr(self, name, getattr(self, name)[rows].copy())
+        self.asins = [self.asins[row] for row in rows]
+        self.index = {asin: code for code, asin in enumerate(self.asins)}
+        return dropped
+
+    def update(
+        self,
+        codes: np.ndarray,
+        times: np.ndarray,
+        values: np.ndarray,
+        flag_after: int,
+        alpha: float,
+        gamma: float,
+        threshold: float,
+        min_change: float,
+        warmup: int
+    ) -> Dict[str, np.ndarray]:
+        """Score and fold in observations (rows, metrics), in input order per ASIN
+
+        Rows older than the ASIN's newest folded-in row are skipped as late.
+        Returns the flagged (row, metric) pairs with their baseline and score,
+        and a mask of the rows that were applied.
+        """
+        metric_index = np.arange(len(METRICS))
+        applied = np.zeros(len(codes), dtype=bool)
+        flagged: List[Tuple[np.ndarray, ...]] = []
+
+        # Rows of one ASIN go in successive rounds so each round updates every row at most once
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+        rank = np.empty(len(codes), dtype=np.int64)
+        rank[order] = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+
+        for round_number in range(int(rank.max()) + 1 if len(codes) else 0):
+            rows = np.flatnonzero(rank == round_number)
+            rows = rows[times[rows] > self.last_seen[codes[rows]]]
+            if not len(rows):
+                continue
+            applied[rows] = True
+            c = codes[rows]
+            self.last_seen[c] = times[rows]
+            slot = (times[rows] // self.slot_seconds) % self.slots
+
+            x = values[rows].astype(np.float32)
+            valid = ~np.isnan(x)
+            n = self.count[c]
+            level = self.level[c]
+            season = self.season[c[:, None], metric_index, slot[:, None]]
+            expected = level + season
+            residual = np.where(valid, x - expected, 0)
+
+            sigma = np.maximum(MAD_TO_SIGMA * self.scale[c], MIN_SCALE)
+            score = residual / sigma
+            warm = n >= warmup
+            anomalous = (
+                valid & warm & (np.abs(score) >= threshold)
+                & (np.abs(residual) >= min_change * np.abs(expected))
+                & (times[rows] >= flag_after)[:, None]
+            )
+            if anomalous.any():
+                row, metric = np.nonzero(anomalous)
+                flagged.append((rows[row], metric, expected[row, metric], score[row, metric]))
+
+            # Full residuals while warming up, clipped ones once the scale means something
+            bound = HUBER_K * sigma
+            clipped = np.where(warm, np.clip(residual, -bound, bound), residual)
+            rate = np.where(valid, np.maximum(alpha, 1.0 / (n + 1)), 0).astype(np.float32)
+            self.level[c] = level + rate * clipped
+            # Each slot starts as a running mean of what the level leaves unexplained
+            season_rate = np.maximum(gamma, 1.0 / (n // self.slots + 1)).astype(np.float32)
+            self.season[c[:, None], metric_index, slot[:, None]] = season + season_rate * (1 - rate) * clipped
+            scale_rate = np.where(valid & (n > 0), np.maximum(alpha, 1.0 / np.maximum(n, 1)), 0)
+            self.scale[c] += (scale_rate * (np.abs(clipped) - self.scale[c])).astype(np.float32)
+            self.count[c] = n + valid
+
+        if flagged:
+            rows, metrics, expected, scores = (np.concatenate(parts) for parts in zip(*flagged))
+        else:
+            rows, metrics = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            expected, scores = np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+        return {"rows": rows, "metrics": metrics, "expected": expected, "scores": scores, "applied": applied}
+
+    def save(self, path: str, cursor: int) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        size = len(self.asins)
+        # Written aside and renamed over the old file, so a crash mid-save never leaves a torn state
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez(
+                f,
+                asins=np.array(self.asins),
+                cursor=np.array(cursor),
+                slot_seconds=np.array(self.slot_seconds),
+                **{name: getattr(self, name)[:size] for name in STATE_ARRAYS},
+            )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str, slots: int, slot_seconds: int) -> Optional[Tuple["AnomalyState", int]]:
+        """Saved state and its cursor, or None if missing, unreadable or built with other seasonality"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as saved:
+                if saved["season"].shape[2] != slots or int(saved["slot_seconds"]) != slot_seconds:
+                    return None
+                state = cls(slots, slot_seconds, capacity=max(len(saved["asins"]), 1024))
+                state.codes(saved["asins"].tolist())
+                for name in STATE_ARRAYS:
+                    getattr(state, name)[:len(state.asins)] = saved[name]
+                return state, int(saved["cursor"])
+        except Exception as e:
+            print(f"Ignoring unreadable anomaly state {path}: {e}")
+            return None
+
+
+class AnomalyService:
+    """Streams new product_analytics rows through per-ASIN baselines and records anomalies
+
+    Rows are read in id order after a cursor, so every row is scored once
+    as it arrives. State is kept in memory and saved next to its cursor
+    after each run; on a cold start the last ANOMALY_WARMUP_DAYS of
+    analytics are replayed in date order to rebuild baselines.
+    """
+
+    def __init__(self, seasonality: str, max_asins: int, batch_rows: int, state_path: str):
+        self.slots, self.slot_seconds = SEASONALITY[seasonality]
+        self.max_asins = max_asins
+        self.batch_rows = batch_rows
+        self.state_path = state_path
+        self.state: Optional[AnomalyState] = None
+        self.cursor = 0  # Highest product_analytics id folded in
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _columns(self):
+        return (ProductAnalytics.id, ProductAnalytics.asin, ProductAnalytics.date,
+                *(getattr(ProductAnalytics, metric) for metric in METRICS))
+
+    async def _process(self, db: AsyncSession, rows, report: Dict[str, Any]) -> None:
+        """Score a batch of analytics rows, store what was flagged and advance the cursor"""
+        state = self.state
+        incoming = len(state) + len({row.asin for row in rows if row.asin not in state.index})
+        if incoming > self.max_asins:
+            report["evicted"] += state.evict(max(self.max_asins * 9 // 10 - (incoming - len(state)), 0))
+
+        codes = state.codes([row.asin for row in rows])
+        times = np.array([int(row.date.timestamp()) for row in rows], dtype=np.int64)
+        values = np.array(
+            [[np.nan if value is None else value for value in row[3:]] for row in rows], dtype=np.float64
+        )
+        flag_after = int(time.time()) - settings.ANOMALY_FLAG_MAX_AGE_HOURS * 3600
+        result = state.update(
+            codes, times, values, flag_after,
+            settings.ANOMALY_ALPHA, settings.ANOMALY_GAMMA, settings.ANOMALY_Z_THRESHOLD,
+            settings.ANOMALY_MIN_CHANGE, settings.ANOMALY_WARMUP_OBSERVATIONS
+        )
+
+        anomalies = [
+            {
+                "asin": rows[row].asin,
+                "metric": METRICS[metric],
+                "direction": "drop" if score < 0 else "spike",
+                "value": float(values[row, metric]),
+                "expected": float(expected),
+                "score": round(float(score), 3),
+                "analytics_id": rows[row].id,
+                "observed_at": rows[row].date,
+            }
+            for row, metric, expected, score in zip(
+                result["rows"].tolist(), result["metrics"].tolist(), result["expected"], result["scores"]
+            )
+        ]
+        for i in range(0, len(anomalies), INSERT_CHUNK):
+            await db.execute(
+                insert(Anomaly).values(anomalies[i:i + INSERT_CHUNK])
+                .on_conflict_do_nothing(constraint="uq_anomalies_observation")
+            )
+        await db.commit()
+
+        self.cursor = max(self.cursor, max(row.id for row in rows))
+        report["rows"] += len(rows)
+        report["late_rows"] += int((~result["applied"]).sum())
+        report["anomalies"] += len(anomalies)
+
+    async def _replay(self, db: AsyncSession, report: Dict[str, Any]) -> None:
+        """Rebuild baselines from recent history in date order"""
+        since = datetime.now(timezone.utc) - timedelta(days=settings.ANOMALY_WARMUP_DAYS)
+        after = None
+        while True:
+            query = (
+                select(*self._columns())
+                .where(ProductAnalytics.date >= since)
+                .order_by(ProductAnalytics.date, ProductAnalytics.id)
+                .limit(self.batch_rows)
+            )
+            if after:
+                query = query.where(tuple_(ProductAnalytics.date, ProductAnalytics.id) > after)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+            await self._process(db, rows, report)
+            after = (rows[-1].date, rows[-1].id)
+
+    async def run(self, db: AsyncSession) -> Dict[str, Any]:
+        """Fold every analytics row added since the last run into the baselines"""
+        async with self._lock:
+            started = time.perf_counter()
+            report: Dict[str, Any] = {
+                "started_at": datetime.now(timezone.utc), "cold_start": False,
+                "rows": 0, "late_rows": 0, "anomalies": 0, "evicted": 0
+            }
+            try:
+                if self.state is None:
+                    loaded = await asyncio.to_thread(AnomalyState.load, self.state_path, self.slots, self.slot_seconds)
+                    if loaded:
+                        self.state, self.cursor = loaded
+                    else:
+                        self.state, self.cursor = AnomalyState(self.slots, self.slot_seconds), 0
+                        report["cold_start"] = True
+                        await self._replay(db, report)
+
+                while True:
+                    rows = (await db.execute(
+                        select(*self._columns())
+                        .where(ProductAnalytics.id > self.cursor)
+                        .order_by(ProductAnalytics.id)
+                        .limit(self.batch_rows)
+                    )).all()
+                    if not rows:
+                        break
+                    await self._process(db, rows, report)
+                    if len(rows) < self.batch_rows:
+                        break
+            except Exception:
+                await db.rollback()
+                self.failures += 1
+                raise
+
+            if report["rows"]:
+                await asyncio.to_thread(self.state.save, self.state_path, self.cursor)
+            if report["anomalies"]:
+                await query_cache.invalidate("anomalies")
+
+            elapsed = time.perf_counter() - started
+            report.update({
+                "cursor": self.cursor,
+                "asins_tracked": len(self.state),
+                "state_mb": round(self.state.memory_bytes / 1024 / 1024, 1),
+                "rows_per_sec": round(report["rows"] / elapsed, 1) if elapsed else None,
+                "elapsed_seconds": round(elapsed, 3),
+            })
+            self.runs += 1
+            self.last_run = report
+            return report
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "seasonality": f"{self.slots} slots of {self.slot_seconds}s",
+            "cursor": self.cursor,
+            "asins_tracked": len(self.state) if self.state else 0,
+            "max_asins": self.max_asins,
+            "state_bytes": self.state.memory_bytes if self.state else 0,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+        }
+
+    def start_scheduler(self) -> None:
+        """Run detection every ANOMALY_INTERVAL_SECONDS in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._schedule())
+
+    async def stop_scheduler(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _schedule(self) -> None:
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.run(db)
+            except Exception as e:
+                print(f"Error detecting anomalies: {e}")
+            await asyncio.sleep(settings.ANOMALY_INTERVAL_SECONDS)
+
+
+# Create a singleton instance
+anomaly_service = AnomalyService(
+    settings.ANOMALY_SEASONALITY,
+    settings.ANOMALY_MAX_ASINS,
+    settings.ANOMALY_BATCH_ROWS,
+    settings.ANOMALY_STATE_PATH
+)
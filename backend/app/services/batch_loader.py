@@ -0,0 +1,127 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from sqlalchemy import select, any_
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.product import Product
+from app.services.retention_service import retention_service
+
+
+class BatchLoader:
+    """Coalesces concurrent single-key lookups into one batched call
+
+    Keys requested within `window` seconds of the first pending key (or until
+    `max_batch` keys are pending) are resolved together by `batch_fn`, which
+    takes a list of unique keys and returns a dict of the keys it found.
+    Missing keys resolve to None. Concurrent loads of the same key share one
+    future. A batch that raises is split in half and each half retried, so
+    one failing key fails alone instead of failing every caller in its batch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        window: float,
+        max_batch: int
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {"loads": 0, "deduplicated": 0, "batches": 0, "keys": 0, "max_batch_size": 0, "splits": 0}
+
+    async def load(self, key: Hashable) -> Any:
+        self.stats["loads"] += 1
+        future = self._pending.get(key)
+        if future is not None:
+            self.stats["deduplicated"] += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._dispatch)
+        # Shield so one cancelled caller does not cancel the shared result
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: List[Hashable]) -> List[Any]:
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.ensure_future(self._resolve(batch))
+
+    async def _resolve(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        self.stats["batches"] += 1
+        self.stats["keys"] += len(batch)
+        self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+        await self._call(batch)
+
+    async def _call(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as e:
+            if len(batch) > 1:
+                self.stats["splits"] += 1
+                keys = list(batch)
+                middle = len(keys) // 2
+                await asyncio.gather(
+                    self._call({key: batch[key] for key in keys[:middle]}),
+                    self._call({key: batch[key] for key in keys[middle:]})
+                )
+                return
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def snapshot(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "avg_batch_size": round(self.stats["keys"] / batches, 2) if batches else None,
+        }
+
+
+async def get_products_by_asin(db, asins: List[str]) -> Dict[str, Product]:
+    """Products for many ASINs in one `asin = ANY(...)` query"""
+    if not asins:
+        return {}
+    result = await db.execute(select(Product).where(Product.asin == any_(asins)))
+    return {product.asin: product for product in result.scalars().all()}
+
+
+async def _load_products(asins: List[str]) -> Dict[str, Product]:
+    async with AsyncSessionLocal() as db:
+        return await get_products_by_asin(db, asins)
+
+
+async def _load_price_histories(asins: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    async with AsyncSessionLocal() as db:
+        return await retention_service.price_history_many(db, asins, limit=100)
+
+
+product_loader = BatchLoader(
+    "products", _load_products, settings.COALESCE_WINDOW_MS / 1000, settings.COALESCE_MAX_BATCH
+)
+price_history_loader = BatchLoader(
+    "price_history", _load_price_histories, settings.COALESCE_WINDOW_MS / 1000, settings.COALESCE_MAX_BATCH
+)
+
+
+def loader_metrics() -> Dict[str, Dict[str, Any]]:
+    """Per-loader coalescing statistics"""
+    return {loader.name: loader.snapshot() for loader in (product_loader, price_history_loader)}
@@ -0,0 +1,321 @@
+import asyncio
+import bisect
+import random
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, delete, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.locks import BENCHMARK_LOCK_KEY
+from app.db.database import AsyncSessionLocal
+from app.models.product import Product
+from app.models.benchmark import DistributionSketch
+from app.services.product_sync import ChangeEvent
+
+DIMENSIONS = ("category", "brand")
+METRICS = ("price", "rating", "review_count")
+
+
+class KLLSketch:
+    """KLL quantile sketch with bounded memory and O(log n) rank queries
+
+    Items live in a hierarchy of compactors; an item at level h stands for
+    2**h original values. A full compactor sorts itself and promotes every
+    other item to the next level.
+
+    Removed values go into a second sketch whose items count negatively,
+    so a product whose value changes can be moved instead of counted
+    twice. `n` is the number of values currently represented.
+    """
+
+    def __init__(
+        self,
+        k: int = 200,
+        compactors: Optional[List[List[float]]] = None,
+        n: int = 0,
+        removed: Optional["KLLSketch"] = None
+    ):
+        self.k = k
+        self.compactors = compactors or [[]]
+        self.n = n
+        self.removed = removed
+        self._index: Optional[Tuple[List[float], List[int], List[int]]] = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(int(self.k * (2 / 3) ** depth), 2)
+
+    def update(self, value: float) -> None:
+        self.compactors[0].append(float(value))
+        self.n += 1
+        self._index = None
+        self._compress()
+
+    def remove(self, value: float) -> None:
+        """Take back one earlier update with this value"""
+        if self.removed is None:
+            self.removed = KLLSketch(self.k)
+        self.removed.update(value)
+        self.n -= 1
+        self._index = None
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Fold another sketch's values into this one, level by level"""
+        for level, items in enumerate(other.compactors):
+            if level == len(self.compactors):
+                self.compactors.append([])
+            self.compactors[level].extend(items)
+        self.n += other.n
+        if other.removed is not None:
+            if self.removed is None:
+                self.removed = KLLSketch(self.k)
+            self.removed.merge(other.removed)
+        self._index = None
+        while any(len(items) >= self._capacity(level) for level, items in enumerate(self.compactors)):
+            self._compress()
+
+    def _compress(self) -> None:
+        for level in range(len(self.compactors)):
+            items = self.compactors[level]
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+            items.sort()
+            # Keep one item back when the count is odd so weights stay exact
+            kept = [items.pop()] if len(items) % 2 else []
+            self.compactors[level + 1].extend(items[random.randint(0, 1)::2])
+            self.compactors[level] = kept
+
+    def _weighted(self, sign: int) -> List[Tuple[float, int]]:
+        return [
+            (value, sign * 2 ** level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        ]
+
+    def _build_index(self) -> Tuple[List[float], List[int], List[int]]:
+        weighted = self._weighted(1) + (self.removed._weighted(-1) if self.removed else [])
+        weighted.sort()
+        values = [value for value, _ in weighted]
+        cumulative, rising = [], []  # Running rank, and its running maximum for quantile search
+        total = peak = 0
+        for _, weight in weighted:
+            total += weight
+            peak = max(peak, total)
+            cumulative.append(total)
+            rising.append(peak)
+        return values, cumulative, rising
+
+    def rank(self, value: float) -> int:
+        """Approximate number of observed values <= value"""
+        if self._index is None:
+            self._index = self._build_index()
+        values, cumulative, _ = self._index
+        position = bisect.bisect_right(values, value)
+        return min(max(cumulative[position - 1], 0), max(self.n, 0)) if position else 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile q in [0, 1]"""
+        if self._index is None:
+            self._index = self._build_index()
+        values, _, rising = self._index
+        if not values or self.n <= 0:
+            return None
+        position = bisect.bisect_left(rising, q * self.n)
+        return values[min(position, len(values) - 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"k": self.k, "n": self.n, "compactors": self.compactors}
+        if self.removed is not None:
+            data["removed"] = self.removed.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KLLSketch":
+        removed = cls.from_dict(data["removed"]) if data.get("removed") else None
+        return cls(data["k"], [list(c) for c in data["compactors"]], data["n"], removed)
+
+
+class BenchmarkService:
+    """Per-category and per-brand distribution sketches for percentile ranks"""
+
+    def __init__(self, k: int, cache_ttl: int):
+        self.k = k
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[Tuple[str, str, str], Tuple[float, Optional[KLLSketch]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _moves(
+        self, product: Product, event: Optional[ChangeEvent]
+    ) -> List[Tuple[Tuple[str, str, str], Optional[float], Optional[float]]]:
+        """(sketch key, value to remove, value to add) for every group the write touches"""
+        current = {name: getattr(product, name) for name in DIMENSIONS + METRICS}
+        before = None
+        if event is not None and event.op == "update":
+            before = {**current, **{name: value for name, value in event.previous.items() if name in current}}
+
+        moves = []
+        for dimension in DIMENSIONS:
+            for metric in METRICS:
+                old = (before[dimension], before[metric]) if before else (None, None)
+                new = (current[dimension], current[metric])
+                if old == new:
+                    continue
+                if old[0] and old[1] is not None:
+                    moves.append(((dimension, old[0], metric), old[1], None))
+                if new[0] and new[1] is not None:
+                    moves.append(((dimension, new[0], metric), None, new[1]))
+        return moves
+
+    async def observe(self, product: Product, event: Optional[ChangeEvent] = None) -> None:
+        """Fold a written product's price, rating and review count into its sketches
+
+        New products (no event, or an insert) are added to their groups.
+        For updates, old values of changed fields are removed from the
+        groups they were counted in and the new ones added, so every
+        product counts once. Runs under the shared benchmark lock, so it
+        waits for a rebuild instead of being overwritten by it. Sketches
+        are written in their own session and errors are only logged, so
+        they never fail the product write.
+        """
+        moves = self._moves(product, event)
+        if not moves:
+            return
+
+        keys = sorted({key for key, _, _ in moves})
+        empty = KLLSketch(self.k).to_dict()
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("SELECT pg_advisory_xact_lock_shared(:key)"), {"key": BENCHMARK_LOCK_KEY})
+                # Concurrent first writes for a group both land on the existing row
+                await db.execute(
+                    insert(DistributionSketch)
+                    .values([
+                        {"dimension": dimension, "key": key, "metric": metric, "count": 0, "sketch": empty}
+                        for dimension, key, metric in keys
+                    ])
+                    .on_conflict_do_nothing(constraint="uq_distribution_sketch")
+                )
+                result = await db.execute(
+                    select(DistributionSketch)
+                    .where(tuple_(DistributionSketch.dimension, DistributionSketch.key, DistributionSketch.metric).in_(keys))
+                    .order_by(DistributionSketch.id)
+                    .with_for_update()
+                )
+                rows = {(row.dimension, row.key, row.metric): row for row in result.scalars().all()}
+                updated = {key: KLLSketch.from_dict(row.sketch) for key, row in rows.items()}
+                for key, removed, added in moves:
+                    sketch = updated[key]
+                    if removed is not None and sketch.n > 0:
+                        sketch.remove(removed)
+                    if added is not None:
+                        sketch.update(added)
+                for key, sketch in updated.items():
+                    rows[key].sketch = sketch.to_dict()
+                    rows[key].count = sketch.n
+                await db.commit()
+        except Exception as e:
+            print(f"Error updating benchmark sketches for {product.asin}: {e}")
+            return
+
+        for cache_key, sketch in updated.items():
+            self._cache[cache_key] = (time.monotonic(), sketch)
+
+    async def get_sketch(self, db: AsyncSession, dimension: str, key: str, metric: str) -> Optional[KLLSketch]:
+        """Load a sketch by its unique key, serving recent loads from memory"""
+        cache_key = (dimension, key, metric)
+        cached = self._cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        result = await db.execute(
+            select(DistributionSketch.sketch)
+            .where(DistributionSketch.dimension == dimension)
+            .where(DistributionSketch.key == key)
+            .where(DistributionSketch.metric == metric)
+        )
+        data = result.scalar_one_or_none()
+        sketch = KLLSketch.from_dict(data) if data else None
+        self._cache[cache_key] = (time.monotonic(), sketch)
+        return sketch
+
+    async def percentile_rank(
+        self, db: AsyncSession, dimension: str, key: str, metric: str, value: float
+    ) -> Optional[Dict[str, Any]]:
+        """Percentage of peers in the group whose metric is at or below value"""
+        sketch = await self.get_sketch(db, dimension, key, metric)
+        if not sketch or not sketch.n:
+            return None
+        return {
+            "dimension": dimension,
+            "key": key,
+            "metric": metric,
+            "value": value,
+            "percentile": round(100.0 * sketch.rank(value) / sketch.n, 1),
+            "peers": sketch.n,
+            "median": sketch.quantile(0.5),
+        }
+
+    async def rebuild(self, db: AsyncSession, batch_size: int = 5000, wait: bool = True) -> Optional[int]:
+        """Recreate every sketch from the products table, dropping stale values
+
+        Takes the benchmark lock exclusively, so rebuilds are serialized
+        across workers and sketch updates wait until the new sketches are
+        committed instead of being lost. With `wait=False` this returns
+        None instead of waiting when the lock is held.
+        """
+        if wait:
+            await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": BENCHMARK_LOCK_KEY})
+        else:
+            locked = await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": BENCHMARK_LOCK_KEY})
+            if not locked.scalar():
+                return None
+
+        sketches: Dict[Tuple[str, str, str], KLLSketch] = {}
+        result = await db.stream(
+            select(Product.category, Product.brand, Product.price, Product.rating, Product.review_count)
+            .execution_options(yield_per=batch_size)
+        )
+        async for row in result:
+            for dimension in DIMENSIONS:
+                key = getattr(row, dimension)
+                if not key:
+                    continue
+                for metric in METRICS:
+                    value = getattr(row, metric)
+                    if value is not None:
+                        sketches.setdefault((dimension, key, metric), KLLSketch(self.k)).update(value)
+
+        await db.execute(delete(DistributionSketch))
+        db.add_all([
+            DistributionSketch(dimension=d, key=k, metric=m, count=s.n, sketch=s.to_dict())
+            for (d, k, m), s in sketches.items()
+        ])
+        await db.commit()
+        self._cache.clear()
+        return len(sketches)
+
+    def start_scheduler(self) -> None:
+        """Rebuild sketches every BENCHMARK_REBUILD_INTERVAL_MINUTES in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._schedule())
+
+    async def stop_scheduler(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _schedule(self) -> None:
+        while True:
+            await asyncio.sleep(settings.BENCHMARK_REBUILD_INTERVAL_MINUTES * 60)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.rebuild(db, wait=False)
+            except Exception as e:
+                print(f"Error rebuilding benchmark sketches: {e}")
+
+
+# Create a singleton instance
+benchmark_service = BenchmarkService(settings.BENCHMARK_SKETCH_K, settings.BENCHMARK_CACHE_TTL_SECONDS)
@@ -0,0 +1,268 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, func, case, any_, Float
+from sqlalchemy.dialects.postgresql import aggregate_order_by, ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.product import Product
+from app.models.elasticity import PriceElasticity
+from app.services.retention_service import retention_service
+
+CHARS_PER_TOKEN = 4  # Rough average for English text and numbers
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _number(value: Optional[float], digits: int = 2) -> str:
+    if value is None:
+        return "?"
+    if abs(value) >= 1000:
+        return f"{value:,.0f}"
+    return f"{value:.{digits}f}".rstrip("0").rstrip(".")
+
+
+def _change(current: Optional[float], previous: Optional[float]) -> Optional[str]:
+    if not current or not previous:
+        return None
+    return f"{(current - previous) / previous * 100:+.0f}%"
+
+
+def fit_to_budget(sections: List[Tuple[int, str]], max_tokens: int) -> str:
+    """Join (priority, line) sections, dropping the lowest priority lines first
+
+    The last dropped line is truncated into any budget left over. Priority 0
+    lines are always kept but truncated as a last resort.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    kept = sorted(sections, key=lambda section: section[0])
+    dropped = None
+    while kept and estimate_tokens("\n".join(line for _, line in kept)) > max_tokens:
+        if kept[-1][0] == 0:
+            break
+        dropped = kept.pop()
+    if dropped:
+        room = max_chars - len("\n".join(line for _, line in kept)) - 2
+        if room >= 40:
+            kept.append((dropped[0], dropped[1][:room - 1] + "…"))
+    order = {line: i for i, (_, line) in enumerate(sections)}
+    text = "\n".join(line for _, line in sorted(kept, key=lambda section: order.get(section[1], len(sections))))
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+def compact_data(data: Any, max_tokens: int, max_items: int = 20) -> str:
+    """Compact one-line rendering of arbitrary JSON-like data within a token budget"""
+    def compact(value: Any) -> Any:
+        if isinstance(value, float):
+            return float(f"{value:.4g}")
+        if isinstance(value, dict):
+            return {key: compact(item) for key, item in value.items() if item not in (None, "", [], {})}
+        if isinstance(value, (list, tuple)):
+            items = [compact(item) for item in value[:max_items]]
+            if len(value) > max_items:
+                items.append(f"+{len(value) - max_items} more")
+            return items
+        return value
+
+    text = json.dumps(compact(data), separators=(",", ":"), ensure_ascii=False, default=str)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+class ProductContextBuilder:
+    """Assembles compact, token-budgeted product facts for AI prompts
+
+    Facts for many ASINs come from one batched query joining the product row,
+    a price-history summary, analytics rollups and elasticity. Contexts are
+    cached per ASIN and product version (content hash or update time), with a
+    TTL bounding staleness of analytics that change without a new version.
+    """
+
+    def __init__(self, token_budget: int, cache_size: int, cache_ttl: int, window_days: int):
+        self.token_budget = token_budget
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.window_days = window_days
+        self._cache: "OrderedDict[Tuple[str, str, int], Tuple[float, str]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "fact_queries": 0}
+
+    async def _versions(self, db: AsyncSession, asins: List[str]) -> Dict[str, str]:
+        result = await db.execute(
+            select(Product.asin, Product.content_hash, Product.updated_at, Product.created_at)
+            .where(Product.asin == any_(asins))
+        )
+        return {
+            row.asin: row.content_hash or str(row.updated_at or row.created_at)
+            for row in result.all()
+        }
+
+    async def _facts(self, db: AsyncSession, asins: List[str]) -> Dict[str, Any]:
+        """Product, price, analytics and elasticity facts for many ASINs in one query"""
+        now = datetime.now(timezone.utc)
+        window_start = now - timedelta(days=self.window_days)
+        prior_start = window_start - timedelta(days=self.window_days)
+
+        # Both read across the retention tiers, so windows reaching past the
+        # raw-tier watermarks are summarized from the rollups
+        daily_prices = await retention_service.daily_prices(db, window_start)
+        ordered_prices = lambda order: func.array_agg(aggregate_order_by(daily_prices.c.price, order), type_=ARRAY(Float))
+        prices = (
+            select(
+                daily_prices.c.asin,
+                func.min(daily_prices.c.price).label("min_price"),
+                func.max(daily_prices.c.price).label("max_price"),
+                func.avg(daily_prices.c.price).label("avg_price"),
+                func.count().label("price_days"),
+                ordered_prices(daily_prices.c.day.asc())[1].label("first_price"),
+                ordered_prices(daily_prices.c.day.desc())[1].label("last_price"),
+            )
+            .where(daily_prices.c.asin == any_(asins))
+            .group_by(daily_prices.c.asin)
+            .subquery()
+        )
+
+        rows = await retention_service.analytics_rows(db, prior_start)
+        in_window = rows.c.date >= window_start
+        in_prior = rows.c.date < window_start
+        window_sum = lambda column, condition: func.sum(case((condition, column), else_=0))
+        analytics = (
+            select(
+                rows.c.asin,
+                window_sum(rows.c.views, in_window).label("views"),
+                window_sum(rows.c.conversions, in_window).label("conversions"),
+                window_sum(rows.c.revenue, in_window).label("revenue"),
+                window_sum(rows.c.views, in_prior).label("prior_views"),
+                window_sum(rows.c.conversions, in_prior).label("prior_conversions"),
+                window_sum(rows.c.revenue, in_prior).label("prior_revenue"),
+                func.avg(case((in_window, rows.c.bounce_rate))).label("bounce_rate"),
+            )
+            .where(rows.c.asin == any_(asins))
+            .group_by(rows.c.asin)
+            .subquery()
+        )
+
+        query = (
+            select(
+                Product,
+                prices.c.min_price, prices.c.max_price, prices.c.avg_price, prices.c.price_days,
+                prices.c.first_price, prices.c.last_price,
+                analytics.c.views, analytics.c.conversions, analytics.c.revenue,
+                analytics.c.prior_views, analytics.c.prior_conversions, analytics.c.prior_revenue,
+                analytics.c.bounce_rate,
+                PriceElasticity.elasticity, PriceElasticity.r_squared, PriceElasticity.observations,
+            )
+            .outerjoin(prices, prices.c.asin == Product.asin)
+            .outerjoin(analytics, analytics.c.asin == Product.asin)
+            .outerjoin(PriceElasticity, PriceElasticity.asin == Product.asin)
+            .where(Product.asin == any_(asins))
+        )
+        self.stats["fact_queries"] += 1
+        result = await db.execute(query)
+        return {row.Product.asin: row for row in result.all()}
+
+    def render(self, facts, max_tokens: int) -> str:
+        """Compact line-per-topic summary, most important lines first"""
+        product = facts.Product
+        days = self.window_days
+        identity = [f"asin={product.asin}", f'title="{product.title}"']
+        if product.brand:
+            identity.append(f"brand={product.brand}")
+        if product.category:
+            identity.append(f"category={product.category}")
+        sections = [(0, "product: " + " | ".join(identity))]
+
+        listing = [f"price={product.currency or 'USD'} {_number(product.price)}"]
+        if product.rating is not None:
+            listing.append(f"rating={_number(product.rating, 1)}/5 from {product.review_count or 0:,} reviews")
+        listing.append(f"in_stock={'yes' if product.availability else 'no'}")
+        sections.append((1, "listing: " + " | ".join(listing)))
+
+        if facts.price_days:
+            sections.append((2,
+                f"price_{days}d: min={_number(facts.min_price)} max={_number(facts.max_price)} "
+                f"avg={_number(facts.avg_price)} change={_change(facts.last_price, facts.first_price) or '0%'} "
+                f"days={facts.price_days}"
+            ))
+
+        if facts.views is not None:
+            conversion_rate = facts.conversions / facts.views * 100 if facts.views else None
+            line = (
+                f"sales_{days}d: views={_number(facts.views)} orders={_number(facts.conversions)} "
+                f"cr={_number(conversion_rate)}% revenue={_number(facts.revenue)}"
+            )
+            trend = [
+                f"{name} {change}"
+                for name, change in (
+                    ("views", _change(facts.views, facts.prior_views)),
+                    ("orders", _change(facts.conversions, facts.prior_conversions)),
+                    ("revenue", _change(facts.revenue, facts.prior_revenue)),
+                )
+                if change
+            ]
+            if trend:
+                line += f" | vs prior {days}d: " + ", ".join(trend)
+            if facts.bounce_rate is not None:
+                line += f" | bounce={_number(facts.bounce_rate * 100)}%"
+            sections.append((2, line))
+
+        if facts.elasticity is not None:
+            sections.append((3,
+                f"price_elasticity: {_number(facts.elasticity)} (r2={_number(facts.r_squared)}, n={facts.observations})"
+            ))
+
+        if product.features:
+            features = product.features
+            if isinstance(features, dict):
+                features = [f"{key}: {value}" for key, value in features.items()]
+            sections.append((4, "features: " + "; ".join(str(feature) for feature in features)))
+
+        if product.description:
+            sections.append((5, "description: " + " ".join(product.description.split())))
+
+        return fit_to_budget(sections, max_tokens)
+
+    async def build_many(
+        self, db: AsyncSession, asins: List[str], max_tokens: Optional[int] = None
+    ) -> Dict[str, str]:
+        """Contexts for many ASINs; unknown ASINs are omitted"""
+        max_tokens = max_tokens or self.token_budget
+        asins = list(dict.fromkeys(asins))
+        versions = await self._versions(db, asins)
+        now = time.monotonic()
+
+        contexts: Dict[str, str] = {}
+        missing = []
+        for asin, version in versions.items():
+            cached = self._cache.get((asin, version, max_tokens))
+            if cached and now - cached[0] < self.cache_ttl:
+                self._cache.move_to_end((asin, version, max_tokens))
+                contexts[asin] = cached[1]
+                self.stats["hits"] += 1
+            else:
+                missing.append(asin)
+
+        if missing:
+            self.stats["misses"] += len(missing)
+            for asin, facts in (await self._facts(db, missing)).items():
+                contexts[asin] = self.render(facts, max_tokens)
+                self._cache[(asin, versions[asin], max_tokens)] = (now, contexts[asin])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return {asin: contexts[asin] for asin in asins if asin in contexts}
+
+    async def build(self, db: AsyncSession, asin: str, max_tokens: Optional[int] = None) -> Optional[str]:
+        return (await self.build_many(db, [asin], max_tokens)).get(asin)
+
+
+# Create a singleton instance
+context_builder = ProductContextBuilder(
+    settings.AI_CONTEXT_TOKEN_BUDGET,
+    settings.AI_CONTEXT_CACHE_SIZE,
+    settings.AI_CONTEXT_CACHE_TTL_SECONDS,
+    settings.AI_CONTEXT_WINDOW_DAYS
+)
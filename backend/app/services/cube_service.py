@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.encoders import jsonable_encoder
+from app.core.cache import query_cache, table_tags
+from app.core.config import settings
+from app.models.product import Product
+from app.schemas.analytics import CubeQuery
+from app.services.retention_service import retention_service
+
+
+BUCKET_INTERVALS = {
+    "hour": "1 hour",
+    "day": "1 day",
+    "week": "1 week",
+    "month": "1 month",
+}
+
+PRODUCT_COLUMNS = {
+    "category": Product.category,
+    "brand": Product.brand,
+}
+
+CACHE_ROUTE = "cube_service.run"
+STREAMED = {"streamed": True}  # Cached in place of results too large to cache
+
+
+class CubeService:
+    """Compiles time-bucketed analytics queries into a single SQL statement"""
+
+    def __init__(self, cache_ttl: int):
+        self.cache_ttl = cache_ttl
+
+    def normalize(self, query: CubeQuery) -> CubeQuery:
+        """Return an equivalent query with deduplicated, ordered list fields"""
+        return query.model_copy(update={
+            "group_by": sorted(set(query.group_by)),
+            "metrics": sorted(set(query.metrics)),
+            "asins": sorted(set(query.asins)) if query.asins else None,
+            "categories": sorted(set(query.categories)) if query.categories else None,
+            "brands": sorted(set(query.brands)) if query.brands else None,
+        })
+
+    def build_statement(self, query: CubeQuery, start: datetime, analytics):
+        """Compile a cube query into one grouped SELECT over the analytics rows subquery
+
+        `analytics` is `retention_service.analytics_rows`, so buckets older
+        than the raw-tier watermark are built from daily rollups.
+        """
+        bucket = func.time_bucket(
+            literal_column(f"INTERVAL '{BUCKET_INTERVALS[query.bucket]}'"),
+            analytics.c.date
+        ).label("bucket")
+
+        revenue = func.coalesce(func.sum(analytics.c.revenue), 0)
+        views = func.coalesce(func.sum(analytics.c.views), 0)
+        conversions = func.coalesce(func.sum(analytics.c.conversions), 0)
+        metric_columns = {
+            "revenue": revenue,
+            "views": views,
+            "conversions": conversions,
+            "conversion_rate": func.coalesce(
+                func.sum(analytics.c.conversions) * 1.0 / func.nullif(func.sum(analytics.c.views), 0), 0
+            ),
+            "revenue_per_view": func.coalesce(
+                func.sum(analytics.c.revenue) / func.nullif(func.sum(analytics.c.views), 0), 0
+            ),
+        }
+
+        group_columns = [
+            (analytics.c.asin if name == "asin" else PRODUCT_COLUMNS[name]).label(name) for name in query.group_by
+        ]
+        statement = select(
+            bucket,
+            *group_columns,
+            *[metric_columns[name].label(name) for name in query.metrics]
+        ).select_from(analytics)
+
+        needs_product = bool({"category", "brand"} & set(query.group_by)) or query.categories or query.brands
+        if needs_product:
+            statement = statement.join(Product, Product.asin == analytics.c.asin)
+
+        statement = statement.where(analytics.c.date >= start)
+        if query.end:
+            statement = statement.where(analytics.c.date < query.end)
+        if query.asins:
+            statement = statement.where(analytics.c.asin.in_(query.asins))
+        if query.categories:
+            statement = statement.where(Product.category.in_(query.categories))
+        if query.brands:
+            statement = statement.where(Product.brand.in_(query.brands))
+
+        statement = statement.group_by(bucket, *group_columns).order_by(bucket, *group_columns)
+        if query.limit:
+            statement = statement.limit(query.limit)
+
+        return statement
+
+    async def run(
+        self, db: AsyncSession, query: CubeQuery, stream_after: int
+    ) -> Tuple[List[Dict[str, Any]], Optional[AsyncIterator[Dict[str, Any]]]]:
+        """Execute a cube query from a server-side cursor
+
+        Returns the first `stream_after` rows and, for larger results, an
+        iterator over the rest of the still open cursor. Complete results
+        go through the query cache, invalidated by writes to
+        product_analytics and products. Larger ones are remembered only as
+        too large, so repeats stream without reading the head twice.
+        """
+        query = self.normalize(query)
+        start = query.start or datetime.now(timezone.utc) - timedelta(days=query.days)
+        streamed = {}
+
+        async def compute() -> Any:
+            head, rest = await self._execute(db, query, start, stream_after)
+            if rest is not None:
+                streamed["rows"] = (head, rest)
+                return STREAMED
+            return jsonable_encoder(head)
+
+        if not settings.QUERY_CACHE_ENABLED:
+            return await self._execute(db, query, start, stream_after)
+
+        tags = table_tags("product_analytics") | table_tags("products")
+        result = await query_cache.get_or_compute(
+            CACHE_ROUTE, query.model_dump(mode="json"), tags, compute, self.cache_ttl
+        )
+        if result != STREAMED:
+            return result, None
+        # Another request computed the marker, so this one opens its own cursor
+        return streamed.get("rows") or await self._execute(db, query, start, stream_after)
+
+    async def _execute(
+        self, db: AsyncSession, query: CubeQuery, start: datetime, stream_after: int
+    ) -> Tuple[List[Dict[str, Any]], Optional[AsyncIterator[Dict[str, Any]]]]:
+        analytics = await retention_service.analytics_rows(db, start)
+        result = await db.stream(self.build_statement(query, start, analytics))
+        rows = result.mappings()
+        head = []
+        async for row in rows:
+            head.append(dict(row))
+            if len(head) > stream_after:
+                return head, self._rest(rows)
+        return head, None
+
+    async def _rest(self, rows) -> AsyncIterator[Dict[str, Any]]:
+        async for row in rows:
+            yield dict(row)
+
+
+# Create a singleton instance
+cube_service = CubeService(settings.CUBE_CACHE_TTL_SECONDS)
@@ -0,0 +1,231 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.models.product import PriceHistory, ProductAnalytics
+from app.models.elasticity import PriceElasticity
+from app.services.retention_service import retention_service, EPOCH
+
+SECONDS_PER_DAY = 86400
+METRICS = ("views", "conversions", "revenue")
+
+
+def _correlation(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """Pearson correlation, or None when either side is constant or too short"""
+    if len(x) < 3 or x.std() == 0 or y.std() == 0:
+        return None
+    return round(float(np.corrcoef(x, y)[0, 1]), 4)
+
+
+def estimate_series(
+    day_ts: np.ndarray,
+    metrics: Dict[str, np.ndarray],
+    price_ts: np.ndarray,
+    prices: np.ndarray,
+    max_lag: int,
+    min_observations: int
+) -> Dict[str, Any]:
+    """Estimate price elasticity and lagged price/metric correlations for one ASIN
+
+    Each daily analytics row is paired with the latest daily average price
+    up to and including that day. Elasticity is the slope of a log-log regression of conversions
+    on price; it is None when there are too few priced days with sales.
+    """
+    idx = np.searchsorted(price_ts, day_ts + SECONDS_PER_DAY, side="left") - 1
+    priced = idx >= 0
+    if priced.sum() < min_observations:
+        return {
+            "elasticity": None,
+            "r_squared": None,
+            "observations": int(priced.sum()),
+            "lagged_correlations": None,
+        }
+
+    price = prices[idx[priced]]
+    series = {name: values[priced] for name, values in metrics.items()}
+
+    elasticity = None
+    r_squared = None
+    usable = (price > 0) & (series["conversions"] > 0)
+    if usable.sum() >= min_observations:
+        x = np.log(price[usable])
+        y = np.log(series["conversions"][usable])
+        x_centered = x - x.mean()
+        variance = float((x_centered ** 2).sum())
+        if variance > 0:
+            slope = float((x_centered * (y - y.mean())).sum() / variance)
+            corr = _correlation(x, y)
+            elasticity = round(slope, 4)
+            r_squared = round(corr ** 2, 4) if corr is not None else None
+
+    lagged = {
+        name: [
+            _correlation(price[:len(price) - lag], values[lag:]) if lag < len(price) else None
+            for lag in range(max_lag + 1)
+        ]
+        for name, values in series.items()
+    }
+
+    return {
+        "elasticity": elasticity,
+        "r_squared": r_squared,
+        "observations": int(priced.sum()),
+        "lagged_correlations": lagged,
+    }
+
+
+def compute_shard(shard: Dict[str, Dict[str, np.ndarray]], max_lag: int, min_observations: int) -> Dict[str, Any]:
+    """Process-pool entry point: estimate every ASIN in a shard"""
+    return {
+        asin: estimate_series(
+            data["day_ts"],
+            {name: data[name] for name in METRICS},
+            data["price_ts"],
+            data["prices"],
+            max_lag,
+            min_observations
+        )
+        for asin, data in shard.items()
+    }
+
+
+class ElasticityService:
+    """Incremental batch job relating price_history to daily product_analytics"""
+
+    def __init__(self, shard_size: int, workers: Optional[int], max_lag: int, min_observations: int):
+        self.shard_size = shard_size
+        self.workers = workers
+        self.max_lag = max_lag
+        self.min_observations = min_observations
+
+    async def find_stale_asins(self, db: AsyncSession) -> Dict[str, datetime]:
+        """ASINs whose newest analytics or price row is newer than their stored result"""
+        analytics = (
+            select(ProductAnalytics.asin, func.max(ProductAnalytics.date).label("latest"))
+            .group_by(ProductAnalytics.asin)
+            .subquery()
+        )
+        prices = (
+            select(PriceHistory.asin, func.max(PriceHistory.timestamp).label("latest"))
+            .group_by(PriceHistory.asin)
+            .subquery()
+        )
+        latest = func.greatest(analytics.c.latest, prices.c.latest)
+        query = (
+            select(analytics.c.asin, latest.label("latest"))
+            .outerjoin(prices, prices.c.asin == analytics.c.asin)  # Older prices may only be in rollups
+            .outerjoin(PriceElasticity, PriceElasticity.asin == analytics.c.asin)
+            .where((PriceElasticity.asin.is_(None)) | (latest > PriceElasticity.data_through))
+        )
+        result = await db.execute(query)
+        return {row.asin: row.latest for row in result.all()}
+
+    async def load_shard(self, db: AsyncSession, asins: List[str]) -> Dict[str, Dict[str, np.ndarray]]:
+        """Load daily analytics and daily prices for a shard into per-ASIN arrays
+
+        Both read across the retention tiers, so history older than the
+        raw-tier watermarks comes from the rollups.
+        """
+        analytics = await retention_service.analytics_rows(db, EPOCH)
+        prices = await retention_service.daily_prices(db, EPOCH)
+        day = func.date_trunc("day", analytics.c.date)
+        analytics_result = await db.execute(
+            select(
+                analytics.c.asin,
+                day.label("day"),
+                func.sum(analytics.c.views).label("views"),
+                func.sum(analytics.c.conversions).label("conversions"),
+                func.sum(analytics.c.revenue).label("revenue")
+            )
+            .where(analytics.c.asin.in_(asins))
+            .group_by(analytics.c.asin, day)
+            .order_by(analytics.c.asin, day)
+        )
+        price_result = await db.execute(
+            select(prices.c.asin, prices.c.day.label("timestamp"), prices.c.price)
+            .where(prices.c.asin.in_(asins))
+            .order_by(prices.c.asin, prices.c.day)
+        )
+
+        rows: Dict[str, Dict[str, list]] = {}
+        for row in analytics_result.all():
+            series = rows.setdefault(row.asin, {"day_ts": [], "price_ts": [], "prices": [], **{m: [] for m in METRICS}})
+            series["day_ts"].append(row.day.timestamp())
+            for name in METRICS:
+                series[name].append(getattr(row, name) or 0)
+        for row in price_result.all():
+            if row.asin in rows:
+                rows[row.asin]["price_ts"].append(row.timestamp.timestamp())
+                rows[row.asin]["prices"].append(row.price)
+
+        return {
+            asin: {name: np.asarray(values, dtype=np.float64) for name, values in series.items()}
+            for asin, series in rows.items()
+        }
+
+    async def save_results(self, db: AsyncSession, results: Dict[str, Any], stale: Dict[str, datetime]) -> None:
+        """Upsert estimates, recording the newest input row each one covers"""
+        if not results:
+            return
+        values = [{"asin": asin, "data_through": stale[asin], **estimate} for asin, estimate in results.items()]
+        statement = insert(PriceElasticity).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[PriceElasticity.asin],
+            set_={
+                "elasticity": statement.excluded.elasticity,
+                "r_squared": statement.excluded.r_squared,
+                "observations": statement.excluded.observations,
+                "lagged_correlations": statement.excluded.lagged_correlations,
+                "data_through": statement.excluded.data_through,
+                "computed_at": func.now(),
+            }
+        )
+        await db.execute(statement)
+        await db.commit()
+        await query_cache.invalidate("price_elasticity", results.keys())
+
+    async def run(self, db: AsyncSession) -> Dict[str, Any]:
+        """Recompute elasticity for every ASIN with new analytics or price data"""
+        started = time.perf_counter()
+        stale = await self.find_stale_asins(db)
+        asins = sorted(stale)
+        shards = [asins[i:i + self.shard_size] for i in range(0, len(asins), self.shard_size)]
+
+        loop = asyncio.get_running_loop()
+        estimated = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = []
+            for shard_asins in shards:
+                shard = await self.load_shard(db, shard_asins)
+                pending.append(loop.run_in_executor(
+                    pool, compute_shard, shard, self.max_lag, self.min_observations
+                ))
+            for future in asyncio.as_completed(pending):
+                results = await future
+                await self.save_results(db, results, stale)
+                estimated += sum(1 for r in results.values() if r["elasticity"] is not None)
+
+        return {
+            "stale_asins": len(asins),
+            "estimated": estimated,
+            "insufficient_data": len(asins) - estimated,
+            "shards": len(shards),
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "finished_at": datetime.now(timezone.utc),
+        }
+
+
+# Create a singleton instance
+elasticity_service = ElasticityService(
+    settings.ELASTICITY_SHARD_SIZE,
+    settings.ELASTICITY_WORKERS,
+    settings.ELASTICITY_MAX_LAG_DAYS,
+    settings.ELASTICITY_MIN_OBSERVATIONS
+)
@@ -0,0 +1,442 @@
+import asyncio
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select, func, any_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.models.product import Product
+from app.models.forecast import ForecastModel
+from app.services.retention_service import retention_service
+
+SEASON = 7  # Weekly seasonality on daily series
+PHI = 0.98  # Trend damping, keeps long horizons from running away
+WARMUP = 2 * SEASON  # Days before one-step errors count towards model selection
+SCOPES = ("asin", "category")
+METRICS = ("revenue", "views", "conversions", "price")
+COUNT_METRICS = ("revenue", "views", "conversions")  # Missing days are zero; prices carry forward
+GRID = np.array(list(itertools.product(
+    (0.05, 0.2, 0.4, 0.7),  # alpha: level
+    (0.0, 0.05, 0.15),  # beta: trend
+    (0.0, 0.1, 0.3),  # gamma: season
+)))
+EPOCH_DAY = date(1970, 1, 1)
+
+
+def day_number(day: date) -> int:
+    return (day - EPOCH_DAY).days
+
+
+def holt_winters(
+    Y: np.ndarray,
+    alpha: np.ndarray,
+    beta: np.ndarray,
+    gamma: np.ndarray,
+    start_day: int,
+    level: Optional[np.ndarray] = None,
+    trend: Optional[np.ndarray] = None,
+    season: Optional[np.ndarray] = None,
+    warmup: int = 0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Additive damped Holt-Winters over many daily series at once
+
+    Y is (series, days) with NaN before a series starts or on days without
+    an observation, which only advance the state. Smoothing parameters
+    broadcast against the series axis, so a (grid, 1) column evaluates every
+    grid point for every series in one pass. Returns the final level, trend
+    and season (indexed by day number % 7) plus the sum of squared one-step
+    errors after `warmup` days and how many errors were counted.
+    """
+    shape = np.broadcast_shapes(alpha.shape, beta.shape, gamma.shape, Y.shape[:1])
+    level = np.full(shape, np.nan) if level is None else np.broadcast_to(level, shape).copy()
+    trend = np.zeros(shape) if trend is None else np.broadcast_to(trend, shape).copy()
+    season = np.zeros(shape + (SEASON,)) if season is None else np.broadcast_to(season, shape + (SEASON,)).copy()
+    sse = np.zeros(shape)
+    counted = np.zeros(shape)
+
+    for t in range(Y.shape[1]):
+        y = Y[:, t]
+        position = (start_day + t) % SEASON
+        s = season[..., position]
+        observed = ~np.isnan(y)
+        started = ~np.isnan(level)
+        update = observed & started
+        predicted = level + PHI * trend
+        if t >= warmup:
+            error = np.where(update, y - predicted - s, 0.0)
+            sse += error ** 2
+            counted += update
+
+        new_level = alpha * (y - s) + (1 - alpha) * predicted
+        new_trend = beta * (new_level - level) + (1 - beta) * PHI * trend
+        new_season = gamma * (y - new_level) + (1 - gamma) * s
+        level = np.where(update, new_level, np.where(started, predicted, np.where(observed, y, np.nan)))
+        trend = np.where(update, new_trend, PHI * trend)
+        season[..., position] = np.where(update, new_season, s)
+
+    return level, trend, season, sse, counted
+
+
+def fit_shard(Y: np.ndarray, start_day: int, min_observations: int) -> List[Optional[Dict[str, Any]]]:
+    """Process-pool entry point: pick the best model for every series in a shard
+
+    Every Holt-Winters grid point is evaluated for all series together and
+    compared with a seasonal naive forecast (same weekday last week) on
+    one-step-ahead RMSE. Series with too little history get None.
+    """
+    alpha, beta, gamma = (GRID[:, i:i + 1] for i in range(3))
+    level, trend, season, sse, counted = holt_winters(Y, alpha, beta, gamma, start_day, warmup=WARMUP)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rmse = np.where(counted > 0, np.sqrt(sse / counted), np.inf)
+    best = rmse.argmin(axis=0)
+    columns = np.arange(Y.shape[0])
+
+    naive_error = Y[:, WARMUP:] - Y[:, WARMUP - SEASON:-SEASON] if Y.shape[1] > WARMUP else np.empty((len(Y), 0))
+    naive_counted = (~np.isnan(naive_error)).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        naive_rmse = np.sqrt(np.nansum(naive_error ** 2, axis=1) / naive_counted)
+    observations = (~np.isnan(Y)).sum(axis=1)
+
+    # The seasonal naive state is the last observed value on each weekday
+    last_week = np.full((len(Y), SEASON), np.nan)
+    for t in range(Y.shape[1]):
+        observed = ~np.isnan(Y[:, t])
+        last_week[observed, (start_day + t) % SEASON] = Y[observed, t]
+
+    models: List[Optional[Dict[str, Any]]] = []
+    for i in columns:
+        if observations[i] < min_observations or not np.isfinite(rmse[best[i], i]):
+            models.append(None)
+            continue
+        if naive_counted[i] and naive_rmse[i] < rmse[best[i], i] and not np.isnan(last_week[i]).any():
+            models.append({
+                "method": "seasonal_naive", "params": {}, "level": 0.0, "trend": 0.0,
+                "season": last_week[i].tolist(), "rmse": float(naive_rmse[i]), "observations": int(observations[i]),
+            })
+            continue
+        g = best[i]
+        models.append({
+            "method": "holt_winters",
+            "params": {"alpha": float(GRID[g, 0]), "beta": float(GRID[g, 1]), "gamma": float(GRID[g, 2])},
+            "level": float(level[g, i]), "trend": float(trend[g, i]), "season": season[g, i].tolist(),
+            "rmse": float(rmse[g, i]), "observations": int(observations[i]),
+        })
+    return models
+
+
+def advance(models: List[Dict[str, Any]], Y: np.ndarray, start_day: int) -> None:
+    """Fold new days into stored model states in place, without refitting parameters"""
+    params = np.array([
+        [model["params"].get(name, 0.0) for name in ("alpha", "beta", "gamma")] for model in models
+    ])
+    level = np.array([model["level"] for model in models], dtype=np.float64)
+    trend = np.array([model["trend"] for model in models], dtype=np.float64)
+    season = np.array([model["season"] for model in models], dtype=np.float64)
+    naive = np.array([model["method"] == "seasonal_naive" for model in models])
+
+    level, trend, new_season, sse, counted = holt_winters(
+        Y, params[:, 0], params[:, 1], params[:, 2], start_day, level, trend, season
+    )
+    for t in range(Y.shape[1]):
+        observed = naive & ~np.isnan(Y[:, t])
+        new_season[observed, (start_day + t) % SEASON] = Y[observed, t]
+
+    for i, model in enumerate(models):
+        model["observations"] += int((~np.isnan(Y[i])).sum())
+        if naive[i]:
+            model["season"] = new_season[i].tolist()
+        else:
+            model.update(level=float(level[i]), trend=float(trend[i]), season=new_season[i].tolist())
+
+
+def forecast(model: Dict[str, Any], horizon: int) -> List[Dict[str, Any]]:
+    """Point forecasts with a rough 95% interval for the days after data_through"""
+    last_day = model["data_through"].date()
+    steps = np.arange(1, horizon + 1)
+    damped = np.cumsum(PHI ** steps)
+    positions = (day_number(last_day) + steps) % SEASON
+    values = model["level"] + damped * model["trend"] + np.asarray(model["season"])[positions]
+    spread = 1.96 * (model["rmse"] or 0.0) * np.sqrt(steps)
+    # Every metric is non-negative
+    return [
+        {
+            "date": last_day + timedelta(days=int(step)),
+            "value": round(max(float(value), 0.0), 4),
+            "lower": round(max(float(value - width), 0.0), 4),
+            "upper": round(max(float(value + width), 0.0), 4),
+        }
+        for step, value, width in zip(steps, values, spread)
+    ]
+
+
+def fill_gaps(Y: np.ndarray, metric: str, started: bool = False) -> np.ndarray:
+    """Zero-fill count metrics after a series starts; carry prices forward
+
+    `started` marks series already under way before the window, whose
+    leading missing days are zeros too.
+    """
+    started = np.cumsum(~np.isnan(Y), axis=1) > 0 if not started else np.ones(Y.shape, dtype=bool)
+    if metric in COUNT_METRICS:
+        return np.where(started & np.isnan(Y), 0.0, Y)
+    index = np.where(np.isnan(Y), 0, np.arange(Y.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return Y[np.arange(len(Y))[:, None], index]
+
+
+def _day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+class ForecastService:
+    """Fits and serves per-ASIN and per-category forecasts of daily metrics
+
+    A run fully refits series whose model is missing or older than
+    FORECAST_REFIT_DAYS, in a process pool, and folds only the new days into
+    every other stored model. Forecasts are computed from the stored state
+    on request.
+    """
+
+    def __init__(self, shard_size: int, workers: Optional[int], history_days: int, refit_days: int, min_observations: int):
+        self.shard_size = shard_size
+        self.workers = workers
+        self.history_days = history_days
+        self.refit_days = refit_days
+        self.min_observations = min_observations
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    async def active_keys(self, db: AsyncSession, since: datetime) -> Dict[str, List[str]]:
+        """ASINs with analytics or prices since a date, and their categories"""
+        analytics = await retention_service.analytics_rows(db, since)
+        prices = await retention_service.daily_prices(db, since)
+        active = select(analytics.c.asin).union(select(prices.c.asin)).subquery()
+        asins = (await db.execute(select(active.c.asin))).scalars().all()
+        categories = await db.execute(
+            select(Product.category)
+            .where(Product.category.isnot(None))
+            .where(Product.asin.in_(select(active.c.asin)))
+            .distinct()
+        )
+        return {"asin": sorted(asins), "category": sorted(categories.scalars().all())}
+
+    async def load_series(
+        self, db: AsyncSession, scope: str, keys: List[str], start: date, end: date
+    ) -> Dict[str, np.ndarray]:
+        """Daily (keys, days) matrices per metric from start to end inclusive, NaN where missing"""
+        since = _day_start(start)
+        until = _day_start(end + timedelta(days=1))
+        analytics = await retention_service.analytics_rows(db, since)
+        prices = await retention_service.daily_prices(db, since)
+        analytics_day = func.date_trunc("day", analytics.c.date)
+
+        if scope == "asin":
+            analytics_query = (
+                select(analytics.c.asin.label("key"), analytics_day.label("day"),
+                       *(func.sum(analytics.c[m]).label(m) for m in COUNT_METRICS))
+                .where(analytics.c.asin == any_(keys))
+                .group_by(analytics.c.asin, analytics_day)
+            )
+            price_query = (
+                select(prices.c.asin.label("key"), prices.c.day, prices.c.price)
+                .where(prices.c.asin == any_(keys))
+            )
+        else:
+            analytics_query = (
+                select(Product.category.label("key"), analytics_day.label("day"),
+                       *(func.sum(analytics.c[m]).label(m) for m in COUNT_METRICS))
+                .join(Product, Product.asin == analytics.c.asin)
+                .where(Product.category == any_(keys))
+                .group_by(Product.category, analytics_day)
+            )
+            price_query = (
+                select(Product.category.label("key"), prices.c.day, func.avg(prices.c.price).label("price"))
+                .join(Product, Product.asin == prices.c.asin)
+                .where(Product.category == any_(keys))
+                .group_by(Product.category, prices.c.day)
+            )
+
+        index = {key: i for i, key in enumerate(keys)}
+        days = (end - start).days + 1
+        series = {metric: np.full((len(keys), days), np.nan) for metric in METRICS}
+        for query, metrics, day_column in (
+            (analytics_query, COUNT_METRICS, analytics_day),
+            (price_query, ("price",), prices.c.day),
+        ):
+            result = await db.execute(query.where(day_column < until))
+            for row in result.all():
+                t = (row.day.date() - start).days
+                if 0 <= t < days:
+                    for metric in metrics:
+                        series[metric][index[row.key], t] = getattr(row, metric) or 0
+        return series
+
+    async def model_status(self, db: AsyncSession) -> Dict[Tuple[str, str], Tuple[datetime, datetime]]:
+        """Oldest data_through and fitted_at per (scope, key) across metrics"""
+        result = await db.execute(
+            select(
+                ForecastModel.scope, ForecastModel.key,
+                func.min(ForecastModel.data_through), func.min(ForecastModel.fitted_at)
+            ).group_by(ForecastModel.scope, ForecastModel.key)
+        )
+        return {(scope, key): (data_through, fitted_at) for scope, key, data_through, fitted_at in result.all()}
+
+    async def save_models(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        statement = insert(ForecastModel).values(rows)
+        statement = statement.on_conflict_do_update(
+            constraint="uq_forecast_models_series",
+            set_={
+                column: statement.excluded[column]
+                for column in ("method", "params", "level", "trend", "season", "rmse", "observations", "data_through", "fitted_at")
+            }
+        )
+        await db.execute(statement)
+        await db.commit()
+        await query_cache.invalidate("forecast_models")
+
+    async def _advance_group(
+        self, db: AsyncSession, scope: str, keys: List[str], data_through: datetime, end: date
+    ) -> int:
+        """Fold the days after data_through into the stored models of some keys"""
+        result = await db.execute(
+            select(ForecastModel)
+            .where(ForecastModel.scope == scope)
+            .where(ForecastModel.key == any_(keys))
+            .where(ForecastModel.data_through == data_through)
+        )
+        stored = result.scalars().all()
+        start = data_through.date() + timedelta(days=1)
+        series = await self.load_series(db, scope, keys, start, end)
+        index = {key: i for i, key in enumerate(keys)}
+
+        rows = []
+        for metric in METRICS:
+            models = [
+                {column: getattr(model, column) for column in ("scope", "key", "metric", "method", "params",
+                                                                "level", "trend", "season", "rmse", "observations",
+                                                                "fitted_at")}
+                for model in stored if model.metric == metric
+            ]
+            if not models:
+                continue
+            Y = fill_gaps(series[metric][[index[model["key"]] for model in models]], metric, started=True)
+            advance(models, Y, day_number(start))
+            rows.extend({**model, "data_through": _day_start(end)} for model in models)
+        await self.save_models(db, rows)
+        return len(rows)
+
+    async def run(self, db: AsyncSession) -> Dict[str, Any]:
+        """Refit stale models in a process pool and advance the rest to yesterday"""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        end = now.date() - timedelta(days=1)  # Last complete day
+        start = end - timedelta(days=self.history_days - 1)
+        refit_before = now - timedelta(days=self.refit_days)
+
+        active = await self.active_keys(db, _day_start(start))
+        status = await self.model_status(db)
+        report: Dict[str, Any] = {"data_through": end, "refit": 0, "advanced": 0, "insufficient_data": 0}
+
+        # Series due for a full refit, and the rest grouped by how far they have been folded
+        refit: Dict[str, List[str]] = {scope: [] for scope in SCOPES}
+        advance_groups: Dict[Tuple[str, datetime], List[str]] = {}
+        for scope in SCOPES:
+            for key in active[scope]:
+                data_through, fitted_at = status.get((scope, key), (None, None))
+                if fitted_at is None or fitted_at < refit_before:
+                    refit[scope].append(key)
+                elif data_through.date() < end:
+                    advance_groups.setdefault((scope, data_through), []).append(key)
+
+        fit_started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        start_day = day_number(start)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            async def fit(scope: str, keys: List[str], metric: str, Y: np.ndarray):
+                models = await loop.run_in_executor(pool, fit_shard, Y, start_day, self.min_observations)
+                return scope, keys, metric, models
+
+            pending = set()
+            in_flight = 2 * (self.workers or os.cpu_count() or 1)
+
+            async def drain(until: int) -> None:
+                nonlocal pending
+                while len(pending) > until:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        scope, keys, metric, models = task.result()
+                        rows = [
+                            {"scope": scope, "key": key, "metric": metric, **model,
+                             "data_through": _day_start(end), "fitted_at": now}
+                            for key, model in zip(keys, models) if model is not None
+                        ]
+                        report["refit"] += len(rows)
+                        report["insufficient_data"] += len(keys) - len(rows)
+                        await self.save_models(db, rows)
+
+            for scope in SCOPES:
+                keys = refit[scope]
+                for i in range(0, len(keys), self.shard_size):
+                    shard = keys[i:i + self.shard_size]
+                    series = await self.load_series(db, scope, shard, start, end)
+                    for metric in METRICS:
+                        Y = fill_gaps(series[metric], metric)
+                        pending.add(asyncio.ensure_future(fit(scope, shard, metric, Y)))
+                    # Bound how many loaded shards wait in memory for a worker
+                    await drain(in_flight)
+            await drain(0)
+        fit_seconds = time.perf_counter() - fit_started
+
+        for (scope, data_through), keys in advance_groups.items():
+            for i in range(0, len(keys), self.shard_size):
+                report["advanced"] += await self._advance_group(db, scope, keys[i:i + self.shard_size], data_through, end)
+
+        series_fitted = report["refit"] + report["insufficient_data"]
+        report["fit_series_per_sec"] = round(series_fitted / fit_seconds, 1) if series_fitted else None
+        report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        report["finished_at"] = datetime.now(timezone.utc)
+        self.last_run = report
+        return report
+
+    async def get_forecast(
+        self, db: AsyncSession, scope: str, key: str, metric: str, horizon: int
+    ) -> Optional[Dict[str, Any]]:
+        """Forecast from a stored model, or None if the series has no model yet"""
+        result = await db.execute(
+            select(ForecastModel)
+            .where(ForecastModel.scope == scope)
+            .where(ForecastModel.key == key)
+            .where(ForecastModel.metric == metric)
+        )
+        model = result.scalar_one_or_none()
+        if model is None:
+            return None
+        state = {column: getattr(model, column) for column in ("metric", "level", "trend", "season", "rmse", "data_through")}
+        return {
+            "scope": scope,
+            "key": key,
+            "metric": metric,
+            "method": model.method,
+            "params": model.params,
+            "rmse": model.rmse,
+            "observations": model.observations,
+            "data_through": model.data_through,
+            "fitted_at": model.fitted_at,
+            "forecast": forecast(state, horizon),
+        }
+
+
+# Create a singleton instance
+forecast_service = ForecastService(
+    settings.FORECAST_SHARD_SIZE,
+    settings.FORECAST_WORKERS,
+    settings.FORECAST_HISTORY_DAYS,
+    settings.FORECAST_REFIT_DAYS,
+    settings.FORECAST_MIN_OBSERVATIONS
+)
@@ -0,0 +1,425 @@
+import asyncio
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+from sqlalchemy import select, update, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.locks import JOB_CLAIM_LOCK_KEY
+from app.db.database import AsyncSessionLocal
+from app.models.job import Job
+from app.models.product import Product
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+class JobContext:
+    """Handed to job handlers for progress reporting, cancellation and output files
+
+    Progress is kept in memory and flushed to the jobs table by the worker's
+    heartbeat, so handlers can report as often as they like.
+    """
+
+    def __init__(self, job_id: str, db: AsyncSession):
+        self.job_id = job_id
+        self.db = db
+        self.progress = 0.0
+        self.message: Optional[str] = None
+        self.cancel_requested = False
+        self.output_path: Optional[str] = None
+
+    def report(self, progress: float, message: Optional[str] = None) -> None:
+        self.progress = min(max(progress, 0.0), 1.0)
+        self.message = message[:255] if message else None
+
+    def check_cancelled(self) -> None:
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def output_file(self, extension: str) -> str:
+        """Path for a large result the handler writes itself"""
+        os.makedirs(settings.JOB_RESULT_DIR, exist_ok=True)
+        self.output_path = os.path.join(settings.JOB_RESULT_DIR, f"{self.job_id}.{extension}")
+        return self.output_path
+
+
+JobHandler = Callable[[JobContext, Dict[str, Any]], Awaitable[Any]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(job_type: str):
+    """Register a coroutine `handler(ctx, params)` for a job type"""
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[job_type] = handler
+        return handler
+    return register
+
+
+@job_handler("ai_category_analysis")
+async def analyze_category(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """AI analysis of the most reviewed products in a category"""
+    from app.services.ai_service import AIService
+    from app.services.context_builder import context_builder
+
+    category = params["category"]
+    result = await ctx.db.execute(
+        select(Product.asin)
+        .where(Product.category == category)
+        .order_by(Product.review_count.desc())
+        .limit(int(params.get("limit", 20)))
+    )
+    asins = result.scalars().all()
+    contexts = await context_builder.build_many(ctx.db, asins)
+
+    ai_service = AIService()
+    analyses = {}
+    for i, asin in enumerate(asins):
+        ctx.check_cancelled()
+        analyses[asin] = await ai_service.analyze_product(
+            asin, params.get("analysis_type", "comprehensive"), contexts.get(asin)
+        )
+        ctx.report((i + 1) / len(asins), f"Analyzed {asin}")
+
+    return {"category": category, "analyses": analyses}
+
+
+@job_handler("catalog_export")
+async def export_catalog(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Write every product (optionally one category) to an NDJSON file"""
+    from app.schemas.product import ProductResponse
+
+    query = select(Product)
+    count_query = select(func.count(Product.id))
+    if params.get("category"):
+        query = query.where(Product.category == params["category"])
+        count_query = count_query.where(Product.category == params["category"])
+    total = (await ctx.db.execute(count_query)).scalar() or 0
+
+    rows = 0
+    with open(ctx.output_file("ndjson"), "w") as output:
+        result = await ctx.db.stream(query.order_by(Product.id).execution_options(yield_per=1000))
+        async for product in result.scalars():
+            output.write(ProductResponse.model_validate(product).model_dump_json() + "\n")
+            rows += 1
+            if rows % 1000 == 0:
+                ctx.check_cancelled()
+                ctx.report(rows / total if total else 0, f"Exported {rows} of {total} products")
+
+    return {"rows": rows, "format": "ndjson"}
+
+
+@job_handler("bulk_sync")
+async def sync_products(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Sync a list of ASINs from Amazon, skipping unchanged products"""
+    from app.core.resilience import UpstreamError
+    from app.services.amazon_service import amazon_service
+    from app.services.benchmark_service import benchmark_service
+    from app.services.product_sync import product_sync_service
+
+    asins = list(dict.fromkeys(params["asins"]))
+    summary = {"changed": 0, "unchanged": 0, "not_found": 0, "failed": {}}
+    for i, asin in enumerate(asins):
+        ctx.check_cancelled()
+        try:
+            amazon_data = await amazon_service.get_product_details(asin)
+            if not amazon_data:
+                summary["not_found"] += 1
+            else:
+                product, event = await product_sync_service.upsert(ctx.db, asin, amazon_data)
+                summary["changed" if event else "unchanged"] += 1
+                if event:
+                    await benchmark_service.observe(product, event)
+        except UpstreamError as e:
+            summary["failed"][asin] = str(e)
+        ctx.report((i + 1) / len(asins), f"Synced {i + 1} of {len(asins)} products")
+
+    return summary
+
+
+@job_handler("catalog_import")
+async def import_catalog(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Bulk load a products, price_history or product_analytics file"""
+    from app.services.import_service import import_service
+
+    def progress(report: Dict[str, Any], fraction: float) -> None:
+        ctx.check_cancelled()
+        ctx.report(fraction, f"Imported {report['rows']} rows at {report['rows_per_sec']} rows/sec")
+
+    try:
+        return await import_service.import_file(
+            ctx.db, params["path"], params.get("kind", "products"), params.get("format"), progress
+        )
+    finally:
+        # Uploads are removed whether the import succeeds, fails or is cancelled
+        if params.get("delete_file") and os.path.exists(params["path"]):
+            os.remove(params["path"])
+
+
+@job_handler("elasticity")
+async def compute_elasticity(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.services.elasticity_service import elasticity_service
+    return await elasticity_service.run(ctx.db)
+
+
+@job_handler("forecast")
+async def fit_forecasts(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.services.forecast_service import forecast_service
+    return await forecast_service.run(ctx.db)
+
+
+@job_handler("anomaly_detection")
+async def detect_anomalies(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.services.anomaly_service import anomaly_service
+    return await anomaly_service.run(ctx.db)
+
+
+@job_handler("benchmark_rebuild")
+async def rebuild_benchmarks(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.services.benchmark_service import benchmark_service
+    return {"sketches": await benchmark_service.rebuild(ctx.db)}
+
+
+@job_handler("retention")
+async def run_retention(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.services.retention_service import retention_service
+    return await retention_service.run(ctx.db)
+
+
+class JobService:
+    """Submits, inspects and cancels jobs stored in the jobs table"""
+
+    async def submit(self, db: AsyncSession, job_type: str, params: Dict[str, Any]) -> Job:
+        if job_type not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job = Job(id=str(uuid.uuid4()), type=job_type, status="queued", params=params)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    async def get(self, db: AsyncSession, job_id: str) -> Optional[Job]:
+        result = await db.execute(select(Job).where(Job.id == job_id))
+        return result.scalar_one_or_none()
+
+    async def list(
+        self, db: AsyncSession, status: Optional[str] = None, job_type: Optional[str] = None, limit: int = 50
+    ) -> List[Job]:
+        query = select(Job)
+        if status:
+            query = query.where(Job.status == status)
+        if job_type:
+            query = query.where(Job.type == job_type)
+        result = await db.execute(query.order_by(Job.created_at.desc()).limit(limit))
+        return result.scalars().all()
+
+    async def cancel(self, db: AsyncSession, job_id: str) -> Optional[Job]:
+        """Cancel a queued job immediately, or ask the worker running it to stop"""
+        job = await self.get(db, job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return job
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.finished_at = datetime.now(timezone.utc)
+        else:
+            job.cancel_requested = True
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    async def stats(self, db: AsyncSession) -> Dict[str, Dict[str, int]]:
+        """Job counts by type and status"""
+        result = await db.execute(select(Job.type, Job.status, func.count()).group_by(Job.type, Job.status))
+        counts: Dict[str, Dict[str, int]] = {}
+        for job_type, status, count in result.all():
+            counts.setdefault(job_type, {})[status] = count
+        return counts
+
+
+class JobWorker:
+    """Pool of asyncio workers that claim queued jobs and run their handlers
+
+    Claims take a Postgres advisory lock and skip job types already at their
+    JOB_TYPE_CONCURRENCY limit across all workers. A heartbeat flushes
+    progress, picks up cancellation requests, and lets other workers requeue
+    jobs whose worker has died.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: Dict[str, Tuple[asyncio.Task, JobContext]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"claimed": 0, "succeeded": 0, "failed": 0, "cancelled": 0, "requeued": 0}
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._poll()), asyncio.create_task(self._heartbeat())]
+
+    async def stop(self) -> None:
+        """Stop claiming and hand running jobs back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        running = [task for task, _ in self._running.values()]
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    async def run_forever(self) -> None:
+        self.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                while len(self._running) < self.concurrency:
+                    claimed = await self._claim()
+                    if claimed is None:
+                        break
+                    job_id, job_type, params = claimed
+                    self.stats["claimed"] += 1
+                    self._running[job_id] = (asyncio.create_task(self._execute(job_id, job_type, params)), None)
+            except Exception as e:
+                print(f"Error claiming jobs: {e}")
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+
+    async def _claim(self) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": JOB_CLAIM_LOCK_KEY})
+            now = datetime.now(timezone.utc)
+            await self._requeue_stale(db, now)
+
+            result = await db.execute(
+                select(Job.type, func.count()).where(Job.status == "running").group_by(Job.type)
+            )
+            running = dict(result.all())
+            saturated = [
+                job_type for job_type, limit in settings.JOB_TYPE_CONCURRENCY.items()
+                if running.get(job_type, 0) >= limit
+            ]
+
+            query = select(Job).where(Job.status == "queued").where(Job.type.in_(list(JOB_HANDLERS)))
+            if saturated:
+                query = query.where(Job.type.not_in(saturated))
+            result = await db.execute(
+                query.order_by(Job.created_at).limit(1).with_for_update(skip_locked=True)
+            )
+            job = result.scalar_one_or_none()
+            if job is None:
+                await db.commit()
+                return None
+
+            job.status = "running"
+            job.worker_id = self.worker_id
+            job.attempts = (job.attempts or 0) + 1
+            job.started_at = now
+            job.heartbeat_at = now
+            job.progress = 0.0
+            await db.commit()
+            return job.id, job.type, job.params or {}
+
+    async def _requeue_stale(self, db: AsyncSession, now: datetime) -> None:
+        """Requeue running jobs whose worker stopped heartbeating, or fail them past max attempts"""
+        stale = (Job.status == "running") & (Job.heartbeat_at < now - timedelta(seconds=settings.JOB_STALE_SECONDS))
+        await db.execute(
+            update(Job)
+            .where(stale & (Job.attempts >= settings.JOB_MAX_ATTEMPTS))
+            .values(status="failed", error="Worker lost too many times", finished_at=now)
+        )
+        await db.execute(update(Job).where(stale).values(status="queued", worker_id=None))
+
+    async def _execute(self, job_id: str, job_type: str, params: Dict[str, Any]) -> None:
+        async with AsyncSessionLocal() as db:
+            ctx = JobContext(job_id, db)
+            self._running[job_id] = (self._running[job_id][0], ctx)
+            try:
+                result = await JOB_HANDLERS[job_type](ctx, params)
+            except (JobCancelled, asyncio.CancelledError):
+                if ctx.cancel_requested:
+                    self.stats["cancelled"] += 1
+                    await self._finish(job_id, status="cancelled", progress=ctx.progress)
+                else:
+                    # Worker shutdown: let another worker pick the job up
+                    self.stats["requeued"] += 1
+                    await self._finish(job_id, status="queued", worker_id=None, finished_at=None)
+                    raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                await self._finish(job_id, status="failed", error=f"{e.__class__.__name__}: {e}", progress=ctx.progress)
+            else:
+                self.stats["succeeded"] += 1
+                await self._finish(job_id, status="succeeded", progress=1.0, **self._store_result(ctx, result))
+            finally:
+                self._running.pop(job_id, None)
+
+    def _store_result(self, ctx: JobContext, result: Any) -> Dict[str, Any]:
+        """Keep small results inline and write large ones to JOB_RESULT_DIR"""
+        payload = json.dumps(result, default=str)
+        if ctx.output_path:
+            return {
+                "result": json.loads(payload),
+                "result_path": ctx.output_path,
+                "result_bytes": os.path.getsize(ctx.output_path),
+            }
+        if len(payload) > settings.JOB_INLINE_RESULT_BYTES:
+            path = ctx.output_file("json")
+            with open(path, "w") as output:
+                output.write(payload)
+            return {"result": None, "result_path": path, "result_bytes": len(payload)}
+        return {"result": json.loads(payload), "result_bytes": len(payload)}
+
+    async def _finish(self, job_id: str, **values) -> None:
+        values.setdefault("finished_at", datetime.now(timezone.utc))
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(**values))
+            await db.commit()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            running = {job_id: entry for job_id, entry in self._running.items() if entry[1] is not None}
+            if not running:
+                continue
+            try:
+                async with AsyncSessionLocal() as db:
+                    now = datetime.now(timezone.utc)
+                    for job_id, (_, ctx) in running.items():
+                        await db.execute(
+                            update(Job)
+                            .where(Job.id == job_id)
+                            .values(heartbeat_at=now, progress=ctx.progress, progress_message=ctx.message)
+                        )
+                    result = await db.execute(
+                        select(Job.id).where(Job.id.in_(list(running))).where(Job.cancel_requested.is_(True))
+                    )
+                    cancelled = result.scalars().all()
+                    await db.commit()
+                for job_id in cancelled:
+                    task, ctx = running[job_id]
+                    ctx.cancel_requested = True
+                    task.cancel()
+            except Exception as e:
+                print(f"Error sending job heartbeat: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": list(self._running),
+            **self.stats,
+        }
+
+
+# Create singleton instances
+job_service = JobService()
+job_worker = JobWorker(settings.JOB_WORKER_CONCURRENCY)
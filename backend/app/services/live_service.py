@@ -0,0 +1,318 @@
+import asyncio
+import inspect
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Set, Tuple, Callable, Awaitable
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+
+UPDATES_CHANNEL = "live:updates"
+TOPICS_KEY = "live:topics"  # Sorted set of subscribed topics scored by last-seen time
+LAST_KEY = "live:last:{topic}"
+LOCK_KEY = "live:lock:{topic}"
+
+
+@dataclass
+class TopicSource:
+    """How to compute a topic family such as `price:{asin}` or `overview`"""
+    resolver: Callable[..., Awaitable[Any]]  # resolver(db, *args) from the topic's `:` separated args, after parse
+    parse: Optional[Callable[..., tuple]] = None  # parse(*args) -> resolver args, raising ValueError on bad ones
+    fields: Optional[Set[str]] = None  # Product fields whose change makes the topic stale
+    per_asin: bool = False  # Topic argument is the changed ASIN
+    periodic: bool = False  # Also refresh every LIVE_REFRESH_SECONDS for non-product data
+
+
+@dataclass(eq=False)
+class Subscriber:
+    queue: asyncio.Queue
+    topics: Set[str] = field(default_factory=set)
+    dropped: int = 0
+
+
+def _normalize(payload: Any) -> Any:
+    return json.loads(json.dumps(payload, default=str))
+
+
+def _delta(old: Any, new: Any) -> Optional[Dict[str, Any]]:
+    """Changed and removed keys between two dict payloads, or None if not diffable"""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None
+    return {
+        "changed": {key: value for key, value in new.items() if old.get(key) != value},
+        "removed": [key for key in old if key not in new],
+    }
+
+
+class LiveHub:
+    """Pushes topic updates to WebSocket/SSE subscribers
+
+    Product change events mark dependent topics stale; stale topics with
+    subscribers anywhere in the cluster are recomputed once, after a short
+    debounce, by the worker that saw the change. The result goes out over
+    Redis pub/sub and every worker forwards it to its own subscribers, as a
+    delta against the last value when possible. Without Redis, fan-out is
+    limited to this process.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.sources: Dict[str, TopicSource] = {}
+        self._subscribers: Set[Subscriber] = set()
+        self._local_topics: Dict[str, int] = {}
+        self._last: Dict[str, Any] = {}
+        self._seq: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: List[asyncio.Task] = []
+        self._redis = None
+        self.stats = {"recomputes": 0, "unchanged": 0, "published": 0, "delivered": 0, "dropped": 0}
+
+    def register(self, prefix: str, source: TopicSource) -> None:
+        self.sources[prefix] = source
+
+    def _source(self, topic: str) -> Tuple[TopicSource, tuple]:
+        """Source and resolver arguments for a topic, raising ValueError if it is invalid"""
+        prefix, _, args = topic.partition(":")
+        source = self.sources.get(prefix)
+        if source is None:
+            raise ValueError(f"Unknown topic: {topic}")
+        args = args.split(":") if args else []
+        try:
+            if source.parse is not None:
+                return source, tuple(source.parse(*args))
+            inspect.signature(source.resolver).bind(None, *args)
+        except TypeError as e:
+            raise ValueError(str(e))
+        return source, tuple(args)
+
+    async def start(self) -> None:
+        from app.services.product_sync import change_feed
+        change_feed.subscribe(self._on_change)
+
+        if settings.LIVE_REDIS_FANOUT:
+            try:
+                import redis.asyncio as redis
+                self._redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+                await self._redis.ping()
+                self._tasks.append(asyncio.create_task(self._listen()))
+            except Exception as e:
+                print(f"Live updates running without Redis fan-out: {e}")
+                self._redis = None
+        self._tasks.append(asyncio.create_task(self._refresh()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    # Subscriptions
+
+    def connect(self) -> Subscriber:
+        subscriber = Subscriber(asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE))
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber) -> None:
+        for topic in list(subscriber.topics):
+            self._release(topic)
+        subscriber.topics.clear()
+        self._subscribers.discard(subscriber)
+
+    async def subscribe(self, subscriber: Subscriber, topic: str) -> None:
+        """Subscribe to a topic, raising ValueError if it is invalid or its first value fails
+
+        Nothing stays registered, locally or in Redis, for a failed subscription.
+        """
+        self._source(topic)
+        if topic in subscriber.topics:
+            return
+        subscriber.topics.add(topic)
+        self._local_topics[topic] = self._local_topics.get(topic, 0) + 1
+
+        # New subscribers start from a full snapshot, computed only if nobody has one
+        try:
+            if topic not in self._last and self._redis is not None:
+                cached = await self._redis.get(LAST_KEY.format(topic=topic))
+                if cached is not None:
+                    self._last[topic] = json.loads(cached)
+            # The first value reaches this subscriber through the normal fan-out
+            computed = topic not in self._last
+            if computed:
+                await self._recompute(topic)
+            if self._redis is not None:
+                await self._redis.zadd(TOPICS_KEY, {topic: time.time()})
+        except Exception as e:
+            self.unsubscribe(subscriber, topic)
+            raise ValueError(f"Could not compute {topic}: {e}")
+        if computed:
+            return
+        self._send(subscriber, {
+            "topic": topic, "seq": self._seq.get(topic, 0), "type": "snapshot", "data": self._last[topic]
+        })
+
+    def unsubscribe(self, subscriber: Subscriber, topic: str) -> None:
+        if topic in subscriber.topics:
+            subscriber.topics.discard(topic)
+            self._release(topic)
+
+    def _release(self, topic: str) -> None:
+        self._local_topics[topic] -= 1
+        if not self._local_topics[topic]:
+            del self._local_topics[topic]
+
+    async def _active_topics(self) -> Set[str]:
+        """Topics with a subscriber on any worker"""
+        topics = set(self._local_topics)
+        if self._redis is not None:
+            seen_since = time.time() - 3 * settings.LIVE_REFRESH_SECONDS
+            await self._redis.zremrangebyscore(TOPICS_KEY, 0, seen_since)
+            topics.update(await self._redis.zrange(TOPICS_KEY, 0, -1))
+        return topics
+
+    # Change handling
+
+    def _on_change(self, event) -> None:
+        for prefix, source in self.sources.items():
+            if source.fields is None:
+                continue
+            if event.op != "insert" and not source.fields & event.fields.keys():
+                continue
+            if source.per_asin:
+                self._dirty.add(f"{prefix}:{event.asin}")
+            else:
+                self._dirty.add(prefix)
+        if self._dirty and self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(settings.LIVE_DEBOUNCE_MS / 1000, self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        self._timer = None
+        dirty, self._dirty = self._dirty, set()
+        asyncio.ensure_future(self._flush(dirty))
+
+    async def _flush(self, dirty: Set[str]) -> None:
+        """Recompute stale topics that someone is subscribed to"""
+        try:
+            topics = await self._active_topics()
+        except Exception as e:
+            print(f"Error pushing live updates: {e}")
+            return
+        for topic in topics:
+            # Family-wide entries like "top-products" cover every window of that family
+            if topic not in dirty and topic.partition(":")[0] not in dirty:
+                continue
+            try:
+                await self._recompute(topic)
+            except Exception as e:
+                print(f"Error pushing live update for {topic}: {e}")
+
+    async def _refresh(self) -> None:
+        """Periodically refresh topics backed by data without change events"""
+        while True:
+            await asyncio.sleep(settings.LIVE_REFRESH_SECONDS)
+            try:
+                if self._redis is not None and self._local_topics:
+                    await self._redis.zadd(TOPICS_KEY, {topic: time.time() for topic in self._local_topics})
+                topics = await self._active_topics()
+            except Exception as e:
+                print(f"Error refreshing live topics: {e}")
+                continue
+            for topic in topics:
+                try:
+                    source, _ = self._source(topic)
+                    if not source.periodic:
+                        continue
+                    if self._redis is not None:
+                        # One worker per interval refreshes each topic
+                        locked = await self._redis.set(
+                            LOCK_KEY.format(topic=topic), self.worker_id,
+                            nx=True, ex=max(int(settings.LIVE_REFRESH_SECONDS) - 1, 1)
+                        )
+                        if not locked:
+                            continue
+                    await self._recompute(topic)
+                except Exception as e:
+                    print(f"Error refreshing live topic {topic}: {e}")
+
+    async def _recompute(self, topic: str) -> None:
+        source, args = self._source(topic)
+        async with AsyncSessionLocal() as db:
+            payload = _normalize(await source.resolver(db, *args))
+        self.stats["recomputes"] += 1
+        if payload == self._last.get(topic):
+            self.stats["unchanged"] += 1
+            return
+
+        self.stats["published"] += 1
+        if self._redis is None:
+            self._deliver(topic, payload)
+            return
+        message = json.dumps({"topic": topic, "data": payload})
+        await self._redis.set(LAST_KEY.format(topic=topic), json.dumps(payload), ex=settings.LIVE_SNAPSHOT_TTL_SECONDS)
+        await self._redis.publish(UPDATES_CHANNEL, message)
+
+    async def _listen(self) -> None:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(UPDATES_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                update = json.loads(message["data"])
+                self._deliver(update["topic"], update["data"])
+        finally:
+            await pubsub.close()
+
+    # Fan-out
+
+    def _deliver(self, topic: str, payload: Any) -> None:
+        previous = self._last.get(topic)
+        if payload == previous:
+            return
+        self._last[topic] = payload
+        self._seq[topic] = self._seq.get(topic, 0) + 1
+        delta = _delta(previous, payload)
+        message = {"topic": topic, "seq": self._seq[topic]}
+        if delta is None:
+            message.update(type="snapshot", data=payload)
+        else:
+            message.update(type="delta", data=delta)
+
+        for subscriber in self._subscribers:
+            if topic in subscriber.topics:
+                self._send(subscriber, message)
+
+    def _send(self, subscriber: Subscriber, message: Dict[str, Any]) -> None:
+        try:
+            subscriber.queue.put_nowait(message)
+            self.stats["delivered"] += 1
+        except asyncio.QueueFull:
+            # A slow client gets fresh snapshots of its topics instead of a backlog
+            subscriber.dropped += 1
+            self.stats["dropped"] += 1
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            for topic in list(subscriber.topics)[:subscriber.queue.maxsize]:
+                if topic in self._last:
+                    subscriber.queue.put_nowait({
+                        "topic": topic, "seq": self._seq.get(topic, 0), "type": "snapshot", "data": self._last[topic]
+                    })
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "redis_fanout": self._redis is not None,
+            "connections": len(self._subscribers),
+            "topics": dict(self._local_topics),
+            **self.stats,
+        }
+
+
+# Create a singleton instance
+live_hub = LiveHub()
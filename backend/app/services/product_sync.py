@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+from collections import deque
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.models.product import Product, PriceHistory
+
+SYNC_FIELDS = (
+    "title", "price", "currency", "rating", "review_count", "category", "brand",
+    "availability", "image_url", "product_url", "description", "features", "dimensions", "weight"
+)
+FLOAT_PRECISION = {"price": 2, "rating": 2, "weight": 3}
+
+
+@dataclass
+class ChangeEvent:
+    seq: int
+    asin: str
+    op: str  # insert, update
+    fields: Dict[str, Any]  # Changed fields with their new values
+    at: datetime
+    previous: Dict[str, Any] = field(default_factory=dict)  # Old values of the changed fields, for updates
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ChangeFeed:
+    """In-process stream of product change events
+
+    Subscribers are called with every event after the write is committed;
+    a bounded buffer lets pollers catch up by sequence number.
+    """
+
+    def __init__(self, buffer_size: int):
+        self._events: deque = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._subscribers: List[Callable[[ChangeEvent], Any]] = []
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def subscribe(self, callback: Callable[[ChangeEvent], Any]) -> None:
+        """Register a sync or async callback for every future event"""
+        self._subscribers.append(callback)
+
+    async def publish(
+        self, asin: str, op: str, fields: Dict[str, Any], previous: Optional[Dict[str, Any]] = None
+    ) -> ChangeEvent:
+        self._seq += 1
+        event = ChangeEvent(self._seq, asin, op, fields, datetime.now(timezone.utc), previous or {})
+        self._events.append(event)
+        for callback in self._subscribers:
+            try:
+                result = callback(event)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"Error in change feed subscriber: {e}")
+        return event
+
+    def since(self, seq: int, limit: int = 1000) -> List[ChangeEvent]:
+        """Buffered events with a sequence number greater than seq"""
+        return [event for event in self._events if event.seq > seq][:limit]
+
+
+class ProductSyncService:
+    """Writes synced product data only when it differs from what is stored"""
+
+    def __init__(self, feed: ChangeFeed, price_heartbeat: timedelta):
+        self.feed = feed
+        self.price_heartbeat = price_heartbeat
+        self.stats = {"syncs": 0, "inserts": 0, "updates": 0, "noops": 0, "price_points": 0, "heartbeats": 0, "hash_backfills": 0}
+
+    def normalize(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep known, non-None product fields with stable float precision"""
+        normalized = {}
+        for field in SYNC_FIELDS:
+            value = data.get(field)
+            if value is None:
+                continue
+            if field in FLOAT_PRECISION:
+                value = round(float(value), FLOAT_PRECISION[field])
+            elif isinstance(value, str):
+                value = value.strip()
+            normalized[field] = value
+        return normalized
+
+    def content_hash(self, normalized: Dict[str, Any]) -> str:
+        payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def diff(self, product: Product, normalized: Dict[str, Any]) -> Dict[str, Any]:
+        """Fields whose incoming value differs from the stored one"""
+        return {
+            field: value
+            for field, value in normalized.items()
+            if getattr(product, field) != value
+        }
+
+    async def _price_point_due(self, db: AsyncSession, asin: str, now: datetime) -> bool:
+        result = await db.execute(
+            select(func.max(PriceHistory.timestamp)).where(PriceHistory.asin == asin)
+        )
+        last_recorded = result.scalar()
+        return last_recorded is None or now - last_recorded >= self.price_heartbeat
+
+    async def upsert(
+        self, db: AsyncSession, asin: str, data: Dict[str, Any], product: Optional[Product] = None
+    ) -> Tuple[Product, Optional[ChangeEvent]]:
+        """Insert or update a product from synced data, skipping no-op writes
+
+        A price point is recorded when the price changes, or as a heartbeat
+        when the last recorded point is older than the heartbeat interval.
+        A missing or stale content hash is rewritten even when no field
+        changed, without publishing an event. Returns the product and the
+        published change event, if any.
+        """
+        self.stats["syncs"] += 1
+        now = datetime.now(timezone.utc)
+        normalized = self.normalize(data)
+        digest = self.content_hash(normalized)
+
+        if product is None:
+            result = await db.execute(select(Product).where(Product.asin == asin))
+            product = result.scalar_one_or_none()
+
+        previous: Dict[str, Any] = {}
+        rehashed = False
+        if product is None:
+            op = "insert"
+            changes = normalized
+            product = Product(asin=asin, **normalized, content_hash=digest, created_at=now, updated_at=now)
+            db.add(product)
+        else:
+            op = "update"
+            changes = {} if product.content_hash == digest else self.diff(product, normalized)
+            for field, value in changes.items():
+                previous[field] = getattr(product, field)
+                setattr(product, field, value)
+            if changes:
+                product.updated_at = now
+            if product.content_hash != digest:
+                # Also backfills missing or stale hashes when the fields already match
+                rehashed = not changes
+                product.content_hash = digest
+
+        price = normalized.get("price") or 0
+        record_price = False
+        if price > 0:
+            if op == "insert" or "price" in changes:
+                record_price = True
+            elif await self._price_point_due(db, asin, now):
+                record_price = True
+                self.stats["heartbeats"] += 1
+        if record_price:
+            db.add(PriceHistory(
+                asin=asin,
+                price=price,
+                currency=normalized.get("currency", "USD"),
+                timestamp=now
+            ))
+            self.stats["price_points"] += 1
+
+        if not changes and not record_price and not rehashed:
+            self.stats["noops"] += 1
+            return product, None
+
+        await db.commit()
+        await db.refresh(product)
+        if record_price:
+            await query_cache.invalidate("price_history", [asin])
+
+        if not changes:
+            self.stats["hash_backfills" if rehashed else "noops"] += 1
+            return product, None
+
+        self.stats["inserts" if op == "insert" else "updates"] += 1
+        event = await self.feed.publish(asin, op, changes, previous)
+        return product, event
+
+
+change_feed = ChangeFeed(settings.CHANGE_FEED_BUFFER_SIZE)
+
+# Create a singleton instance
+product_sync_service = ProductSyncService(change_feed, timedelta(hours=settings.PRICE_HEARTBEAT_HOURS))
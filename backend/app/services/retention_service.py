@@ -0,0 +1,306 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, text, union_all, func, any_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.core.cache import query_cache
+from app.core.config import settings
+from app.core.locks import RETENTION_LOCK_KEY
+from app.db.database import AsyncSessionLocal
+from app.models.product import PriceHistory, ProductAnalytics
+from app.models.retention import PriceHistoryHourly, PriceHistoryDaily, ProductAnalyticsDaily, RetentionWatermark
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _aware(moment: datetime) -> datetime:
+    """Treat naive datetimes as UTC so they compare with stored watermarks"""
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+# Each step folds rows of `source` older than the cutoff into `target`, then
+# drops them from `source`. Cutoffs are aligned to whole days.
+DOWNSAMPLE_PRICE_HOURLY = """
+    INSERT INTO price_history_hourly (asin, bucket, open, high, low, close, avg, samples, currency)
+    SELECT asin, date_trunc('hour', "timestamp"),
+           (array_agg(price ORDER BY "timestamp"))[1], max(price), min(price),
+           (array_agg(price ORDER BY "timestamp" DESC))[1], avg(price), count(*), max(currency)
+    FROM price_history
+    WHERE "timestamp" >= :start AND "timestamp" < :end
+    GROUP BY asin, date_trunc('hour', "timestamp")
+    ON CONFLICT (asin, bucket) DO UPDATE SET
+        open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low, close = EXCLUDED.close,
+        avg = EXCLUDED.avg, samples = EXCLUDED.samples, currency = EXCLUDED.currency
+"""
+
+DOWNSAMPLE_PRICE_DAILY = """
+    INSERT INTO price_history_daily (asin, bucket, open, high, low, close, avg, samples, currency)
+    SELECT asin, date_trunc('day', bucket),
+           (array_agg(open ORDER BY bucket))[1], max(high), min(low),
+           (array_agg(close ORDER BY bucket DESC))[1], sum(avg * samples) / sum(samples),
+           sum(samples), max(currency)
+    FROM price_history_hourly
+    WHERE bucket >= :start AND bucket < :end
+    GROUP BY asin, date_trunc('day', bucket)
+    ON CONFLICT (asin, bucket) DO UPDATE SET
+        open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low, close = EXCLUDED.close,
+        avg = EXCLUDED.avg, samples = EXCLUDED.samples, currency = EXCLUDED.currency
+"""
+
+DOWNSAMPLE_ANALYTICS_DAILY = """
+    INSERT INTO product_analytics_daily
+        (asin, "date", views, conversions, revenue, bounce_rate, avg_session_duration, samples)
+    SELECT asin, date_trunc('day', "date"),
+           coalesce(sum(views), 0), coalesce(sum(conversions), 0), coalesce(sum(revenue), 0),
+           coalesce(sum(bounce_rate * views) / nullif(sum(views), 0), avg(bounce_rate), 0),
+           coalesce(sum(avg_session_duration * views) / nullif(sum(views), 0), avg(avg_session_duration), 0),
+           count(*)
+    FROM product_analytics
+    WHERE "date" >= :start AND "date" < :end
+    GROUP BY asin, date_trunc('day', "date")
+    ON CONFLICT (asin, "date") DO UPDATE SET
+        views = EXCLUDED.views, conversions = EXCLUDED.conversions, revenue = EXCLUDED.revenue,
+        bounce_rate = EXCLUDED.bounce_rate, avg_session_duration = EXCLUDED.avg_session_duration,
+        samples = EXCLUDED.samples
+"""
+
+STEPS = [
+    # (source table, time column, downsample SQL, retention setting)
+    ("price_history", "timestamp", DOWNSAMPLE_PRICE_HOURLY, "PRICE_RAW_RETENTION_DAYS"),
+    ("price_history_hourly", "bucket", DOWNSAMPLE_PRICE_DAILY, "PRICE_HOURLY_RETENTION_DAYS"),
+    ("product_analytics", "date", DOWNSAMPLE_ANALYTICS_DAILY, "ANALYTICS_RAW_RETENTION_DAYS"),
+]
+
+TABLES = [
+    "price_history", "price_history_hourly", "price_history_daily",
+    "product_analytics", "product_analytics_daily",
+]
+
+
+class RetentionService:
+    """Downsamples and expires old history and compresses old TimescaleDB chunks"""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _hypertables(self, db: AsyncSession) -> Dict[str, bool]:
+        """Map of hypertable name to whether compression is enabled"""
+        has_timescale = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'"))
+        if has_timescale.scalar() is None:
+            return {}
+        result = await db.execute(text(
+            "SELECT hypertable_name, compression_enabled FROM timescaledb_information.hypertables"
+        ))
+        return {row.hypertable_name: row.compression_enabled for row in result.all()}
+
+    async def get_watermarks(self, db: AsyncSession) -> Dict[str, datetime]:
+        result = await db.execute(select(RetentionWatermark))
+        return {row.table_name: row.through for row in result.scalars().all()}
+
+    async def _set_watermark(self, db: AsyncSession, table_name: str, through: datetime) -> None:
+        statement = insert(RetentionWatermark).values(table_name=table_name, through=through)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[RetentionWatermark.table_name],
+            set_={"through": statement.excluded.through}
+        ))
+
+    async def run(self, db: AsyncSession) -> Dict[str, Any]:
+        """Run every downsampling step and compress old chunks in one transaction"""
+        locked = await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": RETENTION_LOCK_KEY})
+        if not locked.scalar():
+            return {"skipped": "another worker is running retention"}
+
+        started = time.perf_counter()
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        hypertables = await self._hypertables(db)
+        watermarks = await self.get_watermarks(db)
+        report: Dict[str, Any] = {"started_at": datetime.now(timezone.utc), "steps": {}}
+
+        try:
+            for table, column, downsample_sql, retention_setting in STEPS:
+                step_started = time.perf_counter()
+                cutoff = today - timedelta(days=getattr(settings, retention_setting))
+                start = watermarks.get(table, EPOCH)
+                if cutoff <= start:
+                    continue
+
+                downsampled = await db.execute(text(downsample_sql), {"start": start, "end": cutoff})
+                if table in hypertables:
+                    # Whole chunks only; leftovers below the watermark are ignored by readers
+                    dropped = await db.execute(
+                        text("SELECT count(*) FROM drop_chunks(CAST(:table AS regclass), older_than => :cutoff)"),
+                        {"table": table, "cutoff": cutoff}
+                    )
+                    removed = {"chunks_dropped": dropped.scalar()}
+                else:
+                    deleted = await db.execute(
+                        text(f'DELETE FROM {table} WHERE "{column}" < :cutoff'), {"cutoff": cutoff}
+                    )
+                    removed = {"rows_deleted": deleted.rowcount}
+                await self._set_watermark(db, table, cutoff)
+
+                report["steps"][table] = {
+                    "through": cutoff,
+                    "buckets_written": downsampled.rowcount,
+                    **removed,
+                    "elapsed_ms": round((time.perf_counter() - step_started) * 1000, 1),
+                }
+
+            compress_before = today - timedelta(days=settings.RETENTION_COMPRESS_AFTER_DAYS)
+            compressed = {}
+            for table, compression_enabled in hypertables.items():
+                if table in TABLES and compression_enabled:
+                    result = await db.execute(
+                        text(
+                            "SELECT count(compress_chunk(c, if_not_compressed => true)) "
+                            "FROM show_chunks(CAST(:table AS regclass), older_than => :cutoff) c"
+                        ),
+                        {"table": table, "cutoff": compress_before}
+                    )
+                    compressed[table] = result.scalar()
+            report["chunks_compressed"] = compressed
+
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            self.failures += 1
+            raise
+
+        if report["steps"]:
+            # Rows moved between tiers; readers' results may have changed shape
+            await query_cache.invalidate("price_history")
+            await query_cache.invalidate("product_analytics")
+
+        report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self.runs += 1
+        self.last_run = report
+        return report
+
+    async def table_sizes(self, db: AsyncSession) -> Dict[str, int]:
+        """Total on-disk bytes per history table, including indexes and chunks"""
+        hypertables = await self._hypertables(db)
+        sizes = {}
+        for table in TABLES:
+            size_fn = "hypertable_size" if table in hypertables else "pg_total_relation_size"
+            result = await db.execute(text(f"SELECT {size_fn}(CAST(:table AS regclass))"), {"table": table})
+            sizes[table] = result.scalar()
+        return sizes
+
+    async def price_history(self, db: AsyncSession, asin: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Newest price points across raw, hourly and daily tiers, newest first"""
+        return (await self.price_history_many(db, [asin], limit))[asin]
+
+    async def _latest_per_asin(self, db: AsyncSession, model, time_column, asins: List[str], limit: int, before=None, since=None):
+        """Newest `limit` rows of a history table for each ASIN, in one query"""
+        rank = func.row_number().over(partition_by=model.asin, order_by=time_column.desc()).label("rank")
+        query = select(model, rank).where(model.asin == any_(asins))
+        if before:
+            query = query.where(time_column < before)
+        if since:
+            query = query.where(time_column >= since)
+        ranked = query.subquery()
+        row = aliased(model, ranked)
+        result = await db.execute(
+            select(row).where(ranked.c.rank <= limit).order_by(ranked.c.asin, ranked.c[time_column.key].desc())
+        )
+        return result.scalars().all()
+
+    async def price_history_many(self, db: AsyncSession, asins: List[str], limit: int = 100) -> Dict[str, List[Dict[str, Any]]]:
+        """Newest price points per ASIN across all tiers, one query per tier"""
+        watermarks = await self.get_watermarks(db)
+        raw_from = watermarks.get("price_history")
+        hourly_from = watermarks.get("price_history_hourly")
+        points: Dict[str, List[Dict[str, Any]]] = {asin: [] for asin in asins}
+
+        for row in await self._latest_per_asin(db, PriceHistory, PriceHistory.timestamp, asins, limit, since=raw_from):
+            points[row.asin].append({
+                "id": row.id, "asin": row.asin, "price": row.price, "currency": row.currency,
+                "timestamp": row.timestamp, "resolution": "raw"
+            })
+
+        tiers = [(PriceHistoryHourly, "hour", raw_from, hourly_from), (PriceHistoryDaily, "day", hourly_from, None)]
+        for model, resolution, before, since in tiers:
+            short = [asin for asin in asins if len(points[asin]) < limit]
+            if not short or before is None:
+                break
+            for row in await self._latest_per_asin(db, model, model.bucket, short, limit, before, since):
+                if len(points[row.asin]) < limit:
+                    points[row.asin].append({
+                        "id": None, "asin": row.asin, "price": row.close, "currency": row.currency,
+                        "timestamp": row.bucket, "resolution": resolution,
+                        "open": row.open, "high": row.high, "low": row.low
+                    })
+
+        return points
+
+    async def analytics_rows(self, db: AsyncSession, since: datetime):
+        """Subquery over product_analytics since a date, reading the daily tier below its watermark"""
+        since = _aware(since)
+        columns = ("asin", "date", "views", "conversions", "revenue", "bounce_rate")
+        raw = select(*[getattr(ProductAnalytics, c) for c in columns]).where(ProductAnalytics.date >= since)
+
+        watermarks = await self.get_watermarks(db)
+        raw_from = watermarks.get("product_analytics")
+        if not raw_from or raw_from <= since:
+            return raw.subquery()
+
+        daily = (
+            select(*[getattr(ProductAnalyticsDaily, c) for c in columns])
+            .where(ProductAnalyticsDaily.date >= since)
+            .where(ProductAnalyticsDaily.date < raw_from)
+        )
+        return union_all(raw.where(ProductAnalytics.date >= raw_from), daily).subquery()
+
+    async def daily_prices(self, db: AsyncSession, since: datetime):
+        """Subquery of average price per ASIN and day since a date, across all price tiers
+
+        Watermarks are day-aligned, so every day is read from exactly one tier.
+        """
+        since = _aware(since)
+        watermarks = await self.get_watermarks(db)
+        raw_from = watermarks.get("price_history")
+        hourly_from = watermarks.get("price_history_hourly")
+
+        def per_day(model, time_column, price_column, start, end):
+            day = func.date_trunc("day", time_column)
+            query = (
+                select(model.asin, day.label("day"), func.avg(price_column).label("price"))
+                .where(time_column >= max(start, since) if start else time_column >= since)
+                .group_by(model.asin, day)
+            )
+            return query.where(time_column < end) if end else query
+
+        tiers = [per_day(PriceHistory, PriceHistory.timestamp, PriceHistory.price, raw_from, None)]
+        if raw_from and raw_from > since:
+            tiers.append(per_day(PriceHistoryHourly, PriceHistoryHourly.bucket, PriceHistoryHourly.avg, hourly_from, raw_from))
+        if hourly_from and hourly_from > since:
+            tiers.append(per_day(PriceHistoryDaily, PriceHistoryDaily.bucket, PriceHistoryDaily.avg, None, hourly_from))
+        return union_all(*tiers).subquery() if len(tiers) > 1 else tiers[0].subquery()
+
+    def start_scheduler(self) -> None:
+        """Run retention every RETENTION_INTERVAL_MINUTES in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._schedule())
+
+    async def stop_scheduler(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _schedule(self) -> None:
+        while True:
+            await asyncio.sleep(settings.RETENTION_INTERVAL_MINUTES * 60)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.run(db)
+            except Exception as e:
+                print(f"Error running retention: {e}")
+
+
+# Create a singleton instance
+retention_service = RetentionService()
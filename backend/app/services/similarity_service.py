@@ -0,0 +1,391 @@
+import asyncio
+import os
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+import numpy as np
+from sqlalchemy import select, func, any_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.product import Product
+from app.core.arrays import GrowableArray
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+EMBEDDED_FIELDS = {"title", "features", "category", "brand"}
+# Field weights: category and brand agreement matters more than any one title word
+FIELD_WEIGHTS = {"title": 1.0, "features": 0.5, "category": 2.0, "brand": 1.5}
+
+
+def _feature_text(features: Any) -> str:
+    if isinstance(features, dict):
+        return " ".join(f"{key} {value}" for key, value in features.items())
+    if isinstance(features, list):
+        return " ".join(str(value) for value in features)
+    return str(features or "")
+
+
+class HashingEmbedder:
+    """Offline TF-IDF over the hashing trick
+
+    Title and feature words and bigrams, plus whole category and brand
+    values, are hashed into `dim` signed buckets with sublinear term
+    frequency. IDF weights are fitted when the index is built and frozen
+    until the next rebuild, so incremental updates stay comparable.
+    """
+
+    name = "hashing-tfidf"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def _terms(self, product: Dict[str, Any]) -> Dict[str, float]:
+        terms: Dict[str, float] = {}
+        for field in ("title", "features"):
+            text = product.get(field)
+            if field == "features":
+                text = _feature_text(text)
+            words = TOKEN_PATTERN.findall((text or "").lower())
+            for term in words + [f"{a}_{b}" for a, b in zip(words, words[1:])]:
+                key = f"{field}:{term}"
+                terms[key] = terms.get(key, 0.0) + FIELD_WEIGHTS[field]
+        for field in ("category", "brand"):
+            value = (product.get(field) or "").strip().lower()
+            if value:
+                terms[f"{field}={value}"] = FIELD_WEIGHTS[field]
+        return terms
+
+    def _hashed(self, product: Dict[str, Any]) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for term, weight in self._terms(product).items():
+            digest = zlib.crc32(term.encode())
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dim] += sign * (1.0 + np.log(weight))
+        return vector
+
+    def _hashed_matrix(self, products: List[Dict[str, Any]]) -> np.ndarray:
+        if not products:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._hashed(p) for p in products])
+
+    def fit_transform(self, products: List[Dict[str, Any]]) -> np.ndarray:
+        """Fit IDF weights on the whole catalog and embed it"""
+        vectors = self._hashed_matrix(products)
+        document_frequency = np.count_nonzero(vectors, axis=0)
+        self.idf = (np.log((len(products) + 1) / (document_frequency + 1)) + 1.0).astype(np.float32)
+        return vectors * self.idf
+
+    def embed(self, products: List[Dict[str, Any]]) -> np.ndarray:
+        return self._hashed_matrix(products) * self.idf
+
+
+class ModelEmbedder:
+    """Local sentence-embedding model, used when sentence-transformers is installed"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def fit_transform(self, products: List[Dict[str, Any]]) -> np.ndarray:
+        return self.embed(products)
+
+    def embed(self, products: List[Dict[str, Any]]) -> np.ndarray:
+        texts = [
+            " | ".join(filter(None, [p.get("title"), p.get("brand"), p.get("category"), _feature_text(p.get("features"))]))
+            for p in products
+        ]
+        return self.model.encode(texts, convert_to_numpy=True).astype(np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class SimilarityIndex:
+    """Cosine nearest-neighbour index over a float32 product vector matrix
+
+    Vectors are L2-normalized rows of one growable matrix. Above
+    SIMILARITY_IVF_MIN_ROWS an inverted-file index partitions rows by their
+    nearest k-means centroid and a query scans only the `nprobe` closest
+    partitions. Re-embedded products get a new row and the old one is
+    tombstoned until the next rebuild.
+    """
+
+    def __init__(self, embedder, nprobe: int):
+        self.embedder = embedder
+        self.nprobe = nprobe
+        self.vectors = GrowableArray(np.float32, row_shape=(embedder.dim,))
+        self.live = GrowableArray(np.bool_)
+        self.row_asins: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[GrowableArray] = []
+        self.synced_through: Optional[datetime] = None  # Newest product change embedded
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.live.nbytes + sum(lst.nbytes for lst in self.lists)
+
+    def add(self, asins: List[str], vectors: np.ndarray) -> None:
+        vectors = _normalize(vectors)
+        start = len(self.row_asins)
+        for offset, asin in enumerate(asins):
+            previous = self.rows.get(asin)
+            if previous is not None:
+                self.live.values[previous] = False
+            self.rows[asin] = start + offset
+        self.row_asins.extend(asins)
+        self.vectors.extend(vectors)
+        self.live.extend(np.ones(len(asins), dtype=np.bool_))
+        if self.centroids is not None:
+            self._assign(np.arange(start, start + len(asins)), vectors)
+
+    def train(self, iterations: int = 10, sample_size: int = 50000) -> None:
+        """Fit k-means centroids on a sample and partition every live row"""
+        live_rows = np.flatnonzero(self.live.values)
+        if len(live_rows) < settings.SIMILARITY_IVF_MIN_ROWS:
+            self.centroids = None
+            self.lists = []
+            return
+        lists = int(np.sqrt(len(live_rows)))
+        rng = np.random.default_rng(0)
+        sample = self.vectors.values[rng.choice(live_rows, min(sample_size, len(live_rows)), replace=False)]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids
+        self.lists = [GrowableArray(np.int32, capacity=16) for _ in range(lists)]
+        for start in range(0, len(live_rows), 100000):
+            chunk = live_rows[start:start + 100000]
+            self._assign(chunk, self.vectors.values[chunk])
+
+    def _assign(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        boundaries = np.flatnonzero(np.diff(assignment[order])) + 1
+        for group in np.split(order, boundaries):
+            if len(group):
+                self.lists[assignment[group[0]]].extend(rows[group])
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.flatnonzero(self.live.values)
+        probes = np.argpartition(-(self.centroids @ query), min(self.nprobe, len(self.lists)) - 1)[:self.nprobe]
+        rows = np.concatenate([self.lists[probe].values for probe in probes])
+        return rows[self.live.values[rows]]
+
+    def search(self, asin: str, k: int) -> List[Dict[str, Any]]:
+        row = self.rows.get(asin)
+        if row is None:
+            return []
+        query = self.vectors.values[row]
+        candidates = self._candidates(query)
+        candidates = candidates[candidates != row]
+        if not len(candidates):
+            return []
+        scores = self.vectors.values[candidates] @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"asin": self.row_asins[candidates[i]], "score": round(float(scores[i]), 4)}
+            for i in top
+        ]
+
+    def save(self, path: str) -> None:
+        live_rows = np.flatnonzero(self.live.values)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Written aside and renamed over the old file, so a crash mid-save never leaves a torn index
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez(
+                f,
+                vectors=self.vectors.values[live_rows],
+                asins=np.array([self.row_asins[row] for row in live_rows]),
+                idf=getattr(self.embedder, "idf", np.ones(self.embedder.dim, dtype=np.float32)),
+                embedder=np.array(self.embedder.name),
+                synced_through=np.array(self.synced_through.timestamp() if self.synced_through else 0.0),
+            )
+        os.replace(temporary, path)
+
+    def load(self, path: str) -> bool:
+        """Load a saved index built with the same embedder; True when loaded
+
+        An unreadable file counts as no index, so the caller rebuilds it.
+        """
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as saved:
+                if str(saved["embedder"]) != self.embedder.name or saved["vectors"].shape[1] != self.embedder.dim:
+                    return False
+                asins, vectors, idf = saved["asins"].tolist(), saved["vectors"], saved["idf"]
+                synced_through = float(saved["synced_through"])
+        except Exception as e:
+            print(f"Ignoring unreadable similarity index {path}: {e}")
+            return False
+        if hasattr(self.embedder, "idf"):
+            self.embedder.idf = idf
+        self.add(asins, vectors)
+        self.synced_through = datetime.fromtimestamp(synced_through, timezone.utc) if synced_through else None
+        self.train()
+        return True
+
+
+class SimilarityService:
+    """Builds, incrementally updates and queries the similar-products index
+
+    Products changed through this process's change feed are re-embedded on
+    the next query; changes made by other workers are caught up every
+    SIMILARITY_REFRESH_SECONDS from products' updated_at. Embedding,
+    k-means training and index file I/O run in worker threads so they
+    don't stall the event loop.
+    """
+
+    def __init__(self):
+        self.index: Optional[SimilarityIndex] = None
+        self._pending: set = set()
+        self._last_catch_up = 0.0
+        self._lock = asyncio.Lock()
+        self.stats = {
+            "searches": 0, "incremental_updates": 0, "last_search_ms": None,
+            "build_seconds": None, "load_seconds": None, "last_catch_up_ms": None
+        }
+
+    def _embedder(self):
+        if settings.SIMILARITY_EMBEDDING_MODEL:
+            try:
+                return ModelEmbedder(settings.SIMILARITY_EMBEDDING_MODEL)
+            except Exception as e:
+                print(f"Falling back to hashing embeddings: {e}")
+        return HashingEmbedder(settings.SIMILARITY_DIM)
+
+    def on_change(self, event) -> None:
+        """Change feed subscriber: queue products whose text fields changed"""
+        if event.op == "insert" or EMBEDDED_FIELDS & event.fields.keys():
+            self._pending.add(event.asin)
+
+    async def _load_products(self, db: AsyncSession, query, batch_size: int = 5000):
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield [row._asdict() for row in rows]
+
+    def _product_query(self):
+        changed_at = func.coalesce(Product.updated_at, Product.created_at)
+        return select(
+            Product.asin, Product.title, Product.features, Product.category, Product.brand,
+            changed_at.label("changed_at")
+        )
+
+    def _build_index(self, products: List[Dict[str, Any]]) -> SimilarityIndex:
+        embedder = self._embedder()
+        vectors = embedder.fit_transform(products)
+        index = SimilarityIndex(embedder, settings.SIMILARITY_NPROBE)
+        index.add([p["asin"] for p in products], vectors)
+        index.synced_through = max((p["changed_at"] for p in products if p["changed_at"]), default=None)
+        index.train()
+        return index
+
+    async def build(self, db: AsyncSession) -> SimilarityIndex:
+        """Embed every product and train the partitioned index"""
+        started = time.perf_counter()
+        products = [p async for batch in self._load_products(db, self._product_query()) for p in batch]
+        index = await asyncio.to_thread(self._build_index, products)
+        self.stats["build_seconds"] = round(time.perf_counter() - started, 2)
+        return index
+
+    async def _load(self) -> Optional[SimilarityIndex]:
+        started = time.perf_counter()
+        index = SimilarityIndex(await asyncio.to_thread(self._embedder), settings.SIMILARITY_NPROBE)
+        if not await asyncio.to_thread(index.load, settings.SIMILARITY_INDEX_PATH):
+            return None
+        self.stats["load_seconds"] = round(time.perf_counter() - started, 2)
+        return index
+
+    async def _update(self, db: AsyncSession, query) -> None:
+        started = time.perf_counter()
+        async for batch in self._load_products(db, query):
+            # Only embedding runs off the loop; adding rows stays on it so searches never see a half-added batch
+            vectors = await asyncio.to_thread(self.index.embedder.embed, batch)
+            self.index.add([p["asin"] for p in batch], vectors)
+            self.stats["incremental_updates"] += len(batch)
+            changed = [p["changed_at"] for p in batch if p["changed_at"]]
+            if changed and (self.index.synced_through is None or max(changed) > self.index.synced_through):
+                self.index.synced_through = max(changed)
+        self.stats["last_catch_up_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    async def ensure_index(self, db: AsyncSession) -> SimilarityIndex:
+        """Load the saved index, or build and save one, then apply product changes"""
+        if self.index is None:
+            async with self._lock:
+                if self.index is None:
+                    index = await self._load()
+                    if index is None:
+                        index = await self.build(db)
+                        await asyncio.to_thread(index.save, settings.SIMILARITY_INDEX_PATH)
+                    from app.services.product_sync import change_feed
+                    change_feed.subscribe(self.on_change)
+                    self.index = index
+
+        query = self._product_query()
+        if time.monotonic() - self._last_catch_up >= settings.SIMILARITY_REFRESH_SECONDS:
+            self._last_catch_up = time.monotonic()
+            self._pending.clear()
+            if self.index.synced_through is not None:
+                changed_at = func.coalesce(Product.updated_at, Product.created_at)
+                await self._update(db, query.where(changed_at > self.index.synced_through))
+        elif self._pending:
+            pending, self._pending = list(self._pending), set()
+            await self._update(db, query.where(Product.asin == any_(pending)))
+        return self.index
+
+    def search(self, index: SimilarityIndex, asin: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Most similar products to an ASIN in a ready index, or None when it is not indexed"""
+        if asin not in index.rows:
+            return None
+        started = time.perf_counter()
+        results = index.search(asin, limit)
+        self.stats["searches"] += 1
+        self.stats["last_search_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return results
+
+    async def similar(self, db: AsyncSession, asin: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Most similar products to an ASIN, or None when it is not indexed"""
+        return self.search(await self.ensure_index(db), asin, limit)
+
+    def snapshot(self) -> Dict[str, Any]:
+        index = self.index
+        return {
+            "loaded": index is not None,
+            "embedder": index.embedder.name if index else None,
+            "dim": index.embedder.dim if index else None,
+            "products": len(index) if index else 0,
+            "rows": len(index.row_asins) if index else 0,
+            "partitions": len(index.lists) if index else 0,
+            "nprobe": index.nprobe if index else None,
+            "memory_bytes": index.nbytes if index else 0,
+            "synced_through": index.synced_through if index else None,
+            "pending_updates": len(self._pending),
+            **self.stats,
+        }
+
+
+# Create a singleton instance
+similarity_service = SimilarityService()
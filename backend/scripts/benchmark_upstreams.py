@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Record Rainforest and AI calls to cassettes, or replay them to benchmark API paths offline.
+
+Recording runs searches and, for the products found, product detail and
+review lookups through AmazonDataService against the configured
+RAINFOREST_BASE_URL (a real key, or scripts/fake_upstream.py). Replaying
+drives the API in-process over the recorded requests. Each upstream
+answer comes from the cassette after its recorded latency, so the
+numbers measure our own overhead and concurrency behaviour without the
+network. The sync path also writes to the configured database.
+tests/test_upstream_replay.py runs the replay against tests/cassettes.
+
+Usage:
+    cd backend && python scripts/benchmark_upstreams.py --record --queries laptop,headphones
+    cd backend && python scripts/benchmark_upstreams.py --paths search,reviews,sync --requests 500
+    cd backend && python scripts/benchmark_upstreams.py --latency none --save baseline.json
+    cd backend && python scripts/benchmark_upstreams.py --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PATHS = ("search", "reviews", "sync")
+
+
+async def record(queries, asins_per_query: int):
+    from app.core.recording import upstream_recorder
+    from app.core.resilience import UpstreamError
+    from app.services.amazon_service import amazon_service
+
+    if not amazon_service.api_key:
+        sys.exit("Set RAINFOREST_API_KEY (any value works against scripts/fake_upstream.py)")
+
+    for query in queries:
+        try:
+            products = await amazon_service.search_products(query)
+        except UpstreamError as e:
+            print(f"Search {query!r} failed (recorded): {e}")
+            continue
+        asins = [product["asin"] for product in products if product.get("asin")][:asins_per_query]
+        print(f"Search {query!r}: {len(products)} products, recording {len(asins)}")
+        for asin in asins:
+            for lookup in (amazon_service.get_product_details, amazon_service.get_product_reviews):
+                try:
+                    await lookup(asin)
+                except UpstreamError as e:
+                    print(f"{lookup.__name__}({asin}) failed (recorded): {e}")
+
+    print(json.dumps(upstream_recorder.snapshot(), indent=2))
+    print(f"Latency: {upstream_recorder.latency_percentiles('rainforest')}")
+
+
+def recorded_requests(directory: str):
+    """Search terms and ASINs present in the Rainforest cassette"""
+    requests = {"search": [], "product": [], "reviews": []}
+    path = os.path.join(directory, "rainforest.ndjson")
+    if not os.path.exists(path):
+        sys.exit(f"No cassette at {path}; run with --record first")
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            value = entry["request"].get("search_term" if entry["kind"] == "search" else "asin")
+            if entry["kind"] in requests and value:
+                requests[entry["kind"]].append(value)
+    return {kind: sorted(set(values)) for kind, values in requests.items()}
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return round(values[min(int(q * len(values)), len(values) - 1)], 2) if values else None
+
+
+async def replay(paths, total: int, concurrency: int):
+    import httpx
+    from app.core.config import settings
+    from app.core.recording import upstream_recorder
+    from app.main import app
+
+    requests = recorded_requests(settings.UPSTREAM_CASSETTE_DIR)
+    targets = {
+        "search": [("GET", "/api/v1/products/search/amazon", {"query": term}) for term in requests["search"]],
+        "reviews": [("GET", f"/api/v1/products/{asin}/reviews", None) for asin in requests["reviews"]],
+        "sync": [("POST", f"/api/v1/products/sync/{asin}", None) for asin in requests["product"]],
+    }
+    results = {}
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)  # Failures count as 500s
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for path in paths:
+            if not targets[path]:
+                print(f"{path}: nothing recorded, skipped")
+                continue
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies, statuses = [], {}
+
+            async def one(method, url, params):
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.request(method, url, params=params)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(*random.choice(targets[path])) for _ in range(total)))
+            elapsed = time.perf_counter() - started
+            results[path] = {
+                "requests": total,
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+                "throughput_rps": round(total / elapsed, 1),
+                "p50_ms": percentile(latencies, 0.5),
+                "p90_ms": percentile(latencies, 0.9),
+                "p99_ms": percentile(latencies, 0.99),
+            }
+            print(f"{path}: {results[path]}")
+
+    print(f"Recorder: {upstream_recorder.snapshot()['calls']}")
+    return results
+
+
+def compare(results, baseline_path: str, tolerance: float) -> bool:
+    """Print regressions against a saved run; True when within tolerance"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    ok = True
+    for path, current in results.items():
+        before = baseline.get(path)
+        if not before:
+            continue
+        slower = current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance)
+        laggier = current["p90_ms"] > before["p90_ms"] * (1 + tolerance)
+        status = "REGRESSION" if slower or laggier else "ok"
+        ok &= not (slower or laggier)
+        print(f"{path}: {before['throughput_rps']} -> {current['throughput_rps']} rps, "
+              f"p90 {before['p90_ms']} -> {current['p90_ms']} ms [{status}]")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--record", action="store_true", help="Record cassettes instead of replaying them")
+    parser.add_argument("--queries", default="laptop", help="Comma-separated search terms to record")
+    parser.add_argument("--asins-per-query", type=int, default=10)
+    parser.add_argument("--cassettes", help="Cassette directory (default UPSTREAM_CASSETTE_DIR)")
+    parser.add_argument("--paths", default="search,reviews", help=f"Comma-separated, from {','.join(PATHS)}")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per path")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", choices=("recorded", "sampled", "none"), default="recorded")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep per-client rate limits and fair queues on")
+    parser.add_argument("--save", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Compare with results saved by --save; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Settings are read at import, so configure them before importing the app
+    if args.cassettes:
+        os.environ["UPSTREAM_CASSETTE_DIR"] = args.cassettes
+    if args.record:
+        os.environ["UPSTREAM_RECORD_MODE"] = "record"
+        asyncio.run(record([q.strip() for q in args.queries.split(",") if q.strip()], args.asins_per_query))
+        return
+
+    os.environ["UPSTREAM_RECORD_MODE"] = "replay"
+    os.environ["UPSTREAM_REPLAY_LATENCY"] = args.latency
+    os.environ["RATE_LIMIT_ENABLED"] = str(args.rate_limit).lower()
+    os.environ["QUERY_CACHE_REDIS"] = "false"
+    paths = [path.strip() for path in args.paths.split(",") if path.strip()]
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        parser.error(f"Unknown paths: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(replay(paths, args.requests, args.concurrency))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Build the similar-products index from the products table and save it.
+
+API workers load the saved index at startup instead of embedding the whole
+catalog on the first /products/{asin}/similar request.
+
+Usage:
+    cd backend && python scripts/build_similarity_index.py
+
+    # Latency and recall against exact search on synthetic products
+    cd backend && python scripts/build_similarity_index.py --benchmark 1000000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.services.similarity_service import similarity_service, SimilarityIndex, HashingEmbedder
+
+
+async def build():
+    async with AsyncSessionLocal() as db:
+        index = await similarity_service.build(db)
+    index.save(settings.SIMILARITY_INDEX_PATH)
+    print(f"Indexed {len(index)} products in {similarity_service.stats['build_seconds']}s "
+          f"({len(index.lists)} partitions, {index.nbytes / 1e6:.1f} MB) -> {settings.SIMILARITY_INDEX_PATH}")
+
+
+def benchmark(size: int, queries: int, k: int):
+    """Clustered synthetic vectors stand in for embedded products"""
+    rng = np.random.default_rng(1)
+    dim = settings.SIMILARITY_DIM
+    centers = rng.standard_normal((max(size // 500, 1), dim)).astype(np.float32)
+    index = SimilarityIndex(HashingEmbedder(dim), settings.SIMILARITY_NPROBE)
+    for start in range(0, size, 100000):
+        count = min(100000, size - start)
+        vectors = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+        index.add([f"B{start + i:09d}" for i in range(count)], vectors)
+
+    started = time.perf_counter()
+    index.train()
+    print(f"{size} vectors x {dim} dims, {index.nbytes / 1e6:.0f} MB, "
+          f"{len(index.lists)} partitions trained in {time.perf_counter() - started:.1f}s")
+
+    asins = [f"B{i:09d}" for i in rng.integers(0, size, queries)]
+    latencies, recalls = [], []
+    all_vectors = index.vectors.values
+    for asin in asins:
+        started = time.perf_counter()
+        approximate = index.search(asin, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        row = index.rows[asin]
+        scores = all_vectors @ all_vectors[row]
+        scores[row] = -np.inf
+        exact = {index.row_asins[i] for i in np.argpartition(-scores, k)[:k]}
+        recalls.append(len(exact & {match["asin"] for match in approximate}) / k)
+
+    latencies.sort()
+    print(f"nprobe={index.nprobe}: p50 {latencies[len(latencies) // 2]:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms, recall@{k} {np.mean(recalls):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--benchmark", type=int, default=0, help="Benchmark this many synthetic products instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.queries, args.k)
+    else:
+        asyncio.run(build())
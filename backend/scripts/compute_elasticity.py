@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Recompute price elasticity for every ASIN with new analytics or price data.
+
+Usage:
+    cd backend && python scripts/compute_elasticity.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import AsyncSessionLocal
+from app.services.elasticity_service import elasticity_service
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        summary = await elasticity_service.run(db)
+
+    print(f"Stale ASINs: {summary['stale_asins']} in {summary['shards']} shards")
+    print(f"Estimated: {summary['estimated']}, insufficient data: {summary['insufficient_data']}")
+    print(f"Elapsed: {summary['elapsed_seconds']}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Fault-injecting fake Rainforest API for exercising the resilience layer.
+
+Serves canned search/product/reviews responses and injects throttling,
+server errors, latency and hangs at configurable rates. The test suite
+runs it in-process (tests/test_resilience.py).
+
+Usage:
+    # Standalone, then point the backend at it with
+    # RAINFOREST_BASE_URL=http://127.0.0.1:8099/request RAINFOREST_API_KEY=fake
+    cd backend && python scripts/fake_upstream.py --error-rate 0.2 --throttle-rate 0.1
+
+    # Drill: run calls through AmazonDataService and print upstream metrics
+    cd backend && python scripts/fake_upstream.py --drill 200 --slow-rate 0.05 --slow-ms 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def canned_response(params: dict) -> dict:
+    """Minimal Rainforest-shaped payload for the requested type"""
+    asin = params.get("asin", "B000FAKE01")
+    request_type = params.get("type", "product")
+    if request_type == "search":
+        return {"search_results": [
+            {
+                "asin": f"B000FAKE{i:02d}",
+                "title": f"Fake product {i}",
+                "price": {"value": 10.0 + i},
+                "rating": 4.2,
+                "ratings_total": 100 + i,
+                "link": f"https://example.com/dp/B000FAKE{i:02d}",
+            }
+            for i in range(10)
+        ]}
+    if request_type == "reviews":
+        return {"reviews": [{"rating": 5, "title": "Great"}, {"rating": 3, "title": "Okay"}]}
+    return {"product": {
+        "asin": asin,
+        "title": f"Fake product {asin}",
+        "buybox_winner": {"price": {"value": 19.99}},
+        "rating": 4.5,
+        "ratings_total": 321,
+        "category": {"name": "Electronics"},
+        "brand": "Fakebrand",
+        "feature_bullets": ["Works offline"],
+    }}
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients abandoning timed-out or hedged requests is expected here
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def make_handler(args):
+    class FaultInjectingHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            roll = random.random()
+            if roll < args.hang_rate:
+                time.sleep(args.hang_seconds)
+                return self._send(504, {"error": "hung"})
+            roll -= args.hang_rate
+            if roll < args.throttle_rate:
+                return self._send(429, {"error": "rate limited"})
+            roll -= args.throttle_rate
+            if roll < args.error_rate:
+                return self._send(random.choice([500, 502, 503]), {"error": "injected failure"})
+            roll -= args.error_rate
+
+            delay_ms = args.latency_ms
+            if roll < args.slow_rate:
+                delay_ms = args.slow_ms
+            time.sleep(delay_ms / 1000)
+
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            self._send(200, canned_response(params))
+
+        def _send(self, status: int, body: dict):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FaultInjectingHandler
+
+
+async def drill(calls: int, concurrency: int):
+    from app.core.resilience import UpstreamError, upstream_metrics
+    from app.services.amazon_service import amazon_service
+
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {"ok": 0, "failed": 0}
+
+    async def one(i: int):
+        async with semaphore:
+            try:
+                await amazon_service.get_product_details(f"B000FAKE{i % 100:02d}")
+                outcomes["ok"] += 1
+            except UpstreamError:
+                outcomes["failed"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{calls} calls in {elapsed:.2f}s: {outcomes['ok']} ok, {outcomes['failed']} failed")
+    print(json.dumps(upstream_metrics(), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of responses delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=1500)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 5xx responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction of requests that hang")
+    parser.add_argument("--hang-seconds", type=float, default=60)
+    parser.add_argument("--drill", type=int, default=0, help="Run this many calls through AmazonDataService")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    server = QuietServer(("127.0.0.1", args.port), make_handler(args))
+    url = f"http://127.0.0.1:{args.port}/request"
+
+    if not args.drill:
+        print(f"Fake Rainforest API listening on {url}")
+        server.serve_forever()
+        return
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["RAINFOREST_BASE_URL"] = url
+    os.environ["RAINFOREST_API_KEY"] = "fake"
+    try:
+        asyncio.run(drill(args.drill, args.concurrency))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Refit stale forecast models and fold new days into the rest.
+
+Usage:
+    cd backend && python scripts/fit_forecasts.py
+    cd backend && python scripts/fit_forecasts.py --benchmark 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.services.forecast_service import forecast_service, fit_shard, forecast, SEASON
+
+
+async def run():
+    async with AsyncSessionLocal() as db:
+        report = await forecast_service.run(db)
+
+    print(f"Data through: {report['data_through']}")
+    print(f"Refit: {report['refit']} series ({report['fit_series_per_sec']} series/sec), "
+          f"advanced: {report['advanced']}, insufficient data: {report['insufficient_data']}")
+    print(f"Elapsed: {report['elapsed_seconds']}s")
+
+
+def benchmark(series: int, days: int, holdout: int):
+    """Fit synthetic weekly-seasonal series and compare hold-out error with seasonal naive"""
+    rng = np.random.default_rng(0)
+    t = np.arange(days + holdout)
+    level = rng.uniform(50, 500, (series, 1))
+    slope = rng.normal(0, 0.2, (series, 1))
+    weekly = rng.uniform(0, 0.3, (series, 1)) * level * np.sin(2 * np.pi * (t + rng.integers(0, SEASON, (series, 1))) / SEASON)
+    Y = np.maximum(level + slope * t + weekly + rng.normal(0, 0.1, (series, 1)) * level * rng.standard_normal((series, len(t))), 0)
+    Y[rng.random(Y.shape) < 0.02] = np.nan  # Occasional missing days
+    train, actual = Y[:, :days], Y[:, days:]
+
+    shard_size = settings.FORECAST_SHARD_SIZE
+    shards = [train[i:i + shard_size] for i in range(0, series, shard_size)]
+
+    started = time.perf_counter()
+    fit_shard(shards[0], 0, settings.FORECAST_MIN_OBSERVATIONS)
+    single = len(shards[0]) / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=settings.FORECAST_WORKERS) as pool:
+        results = list(pool.map(fit_shard, shards, [0] * len(shards), [settings.FORECAST_MIN_OBSERVATIONS] * len(shards)))
+    elapsed = time.perf_counter() - started
+    models = [model for shard in results for model in shard]
+
+    # Synthetic series start on day number 0, so seasonal positions line up with real dates
+    data_through = datetime(1970, 1, 1) + timedelta(days=days - 1)
+    errors, naive_errors, methods = [], [], {}
+    for i, model in enumerate(models):
+        if model is None:
+            continue
+        methods[model["method"]] = methods.get(model["method"], 0) + 1
+        points = forecast({**model, "metric": "revenue", "data_through": data_through}, holdout)
+        predicted = np.array([point["value"] for point in points])
+        naive = np.array([train[i, days - SEASON + (k % SEASON)] for k in range(holdout)])
+        mask = ~np.isnan(actual[i]) & ~np.isnan(naive)
+        errors.append(np.abs(predicted - actual[i])[mask].mean())
+        naive_errors.append(np.abs(naive - actual[i])[mask].mean())
+
+    print(f"{series} series x {days} days: {series / elapsed:,.0f} series/sec with a process pool "
+          f"({single:,.0f} series/sec in one process)")
+    print(f"Methods: {methods}")
+    print(f"Hold-out MAE over {holdout} days: {np.mean(errors):.2f} vs {np.mean(naive_errors):.2f} for seasonal naive")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--benchmark", type=int, default=0, help="Benchmark this many synthetic series instead")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--holdout", type=int, default=14)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.days, args.holdout)
+    else:
+        asyncio.run(run())
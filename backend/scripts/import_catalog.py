@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Bulk import products, price history or analytics from a file.
+
+Rows are validated in batches, COPYed into a staging table and merged
+into the target table. Invalid rows are reported and skipped without
+aborting the import. Import products before their price history and
+analytics, which must reference existing ASINs.
+
+Usage:
+    cd backend && python scripts/import_catalog.py products.csv
+    cd backend && python scripts/import_catalog.py prices.ndjson --kind price_history
+    cd backend && python scripts/import_catalog.py analytics.parquet --kind product_analytics
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import AsyncSessionLocal
+from app.services.import_service import import_service, IMPORT_KINDS, FORMATS
+
+
+def print_progress(report, fraction):
+    print(
+        f"{fraction:6.1%}  {report['rows']:>10,} rows  {report['rejected']:>8,} rejected  "
+        f"{report['rows_per_sec']:>10,.0f} rows/sec",
+        file=sys.stderr
+    )
+
+
+async def main(args):
+    async with AsyncSessionLocal() as db:
+        report = await import_service.import_file(db, args.path, args.kind, args.format, print_progress)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--kind", choices=list(IMPORT_KINDS), default="products")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), help="Defaults to the file extension")
+    asyncio.run(main(parser.parse_args()))
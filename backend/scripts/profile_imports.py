@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Profile the cold import time of the FastAPI app.
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters,
+summarizes the slowest modules and exits non-zero when the median cold
+startup exceeds STARTUP_IMPORT_BUDGET_MS (or --budget-ms).
+
+Usage:
+    cd backend && python scripts/profile_imports.py [--runs 5] [--top 20]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+MODULE = "app.main"
+TIMER = (
+    "import time; _t = time.perf_counter(); import {module}; "
+    "print(round((time.perf_counter() - _t) * 1000, 2))"
+)
+
+
+def run_once(module: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Import the module in a fresh interpreter and return (wall ms, importtime rows)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", TIMER.format(module=module)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    return float(result.stdout.strip().splitlines()[-1]), rows
+
+
+def summarize(rows: List[Tuple[str, int, int]], top: int) -> None:
+    """Print the slowest modules by cumulative and self time"""
+    by_name: Dict[str, Tuple[int, int]] = {name: (s, c) for name, s, c in rows}
+
+    print(f"\nTop {top} modules by cumulative import time:")
+    for name, (self_us, cumulative_us) in sorted(by_name.items(), key=lambda i: -i[1][1])[:top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+    print(f"\nTop {top} modules by self import time:")
+    for name, (self_us, cumulative_us) in sorted(by_name.items(), key=lambda i: -i[1][0])[:top]:
+        print(f"  {self_us / 1000:9.1f} ms  {name}")
+
+    packages: Dict[str, int] = {}
+    for name, self_us, _ in rows:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+
+    print(f"\nTop {top} top-level packages by total self time:")
+    for root, total_us in sorted(packages.items(), key=lambda i: -i[1])[:top]:
+        print(f"  {total_us / 1000:9.1f} ms  {root}")
+
+
+def main() -> int:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default=MODULE)
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold interpreter runs")
+    parser.add_argument("--top", type=int, default=20, help="Number of modules to list")
+    parser.add_argument("--budget-ms", type=float, default=settings.STARTUP_IMPORT_BUDGET_MS)
+    args = parser.parse_args()
+
+    # The first run also pays for writing .pyc files; discard it
+    run_once(args.module)
+
+    timings = []
+    last_rows: List[Tuple[str, int, int]] = []
+    for _ in range(args.runs):
+        elapsed_ms, last_rows = run_once(args.module)
+        timings.append(elapsed_ms)
+
+    summarize(last_rows, args.top)
+
+    median_ms = statistics.median(timings)
+    print(f"\nCold import of {args.module}: median {median_ms:.1f} ms, "
+          f"min {min(timings):.1f} ms, max {max(timings):.1f} ms over {args.runs} runs")
+    print(f"Budget: {args.budget_ms:.0f} ms")
+
+    if median_ms > args.budget_ms:
+        print(f"❌ Startup budget exceeded by {median_ms - args.budget_ms:.1f} ms")
+        return 1
+
+    print("✅ Startup within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
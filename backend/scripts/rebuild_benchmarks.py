@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""Rebuild category/brand distribution sketches from the products table.
+
+Live updates only fold in newly inserted products; changed prices,
+ratings and review counts are picked up by rebuilds, which the API runs
+every BENCHMARK_REBUILD_INTERVAL_MINUTES. Run this to rebuild now.
+
+Usage:
+    cd backend && python scripts/rebuild_benchmarks.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import AsyncSessionLocal
+from app.services.benchmark_service import benchmark_service
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        count = await benchmark_service.rebuild(db)
+
+    print(f"Rebuilt {count} distribution sketches")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
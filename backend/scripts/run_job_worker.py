@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Run a background job worker outside the API process.
+
+Claims queued jobs from the jobs table and runs up to
+JOB_WORKER_CONCURRENCY of them at once. Run as many workers as needed;
+per-type limits in JOB_TYPE_CONCURRENCY hold across all of them. On
+Ctrl+C or SIGTERM, running jobs are handed back to the queue.
+
+Usage:
+    cd backend && python scripts/run_job_worker.py [--concurrency 8]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.cache import query_cache
+from app.api.v1.endpoints import live  # Registers live topics
+from app.services.job_service import JobWorker
+from app.services.live_service import live_hub
+
+
+async def main(concurrency: int):
+    # Product changes made by jobs are pushed to live subscribers too, and
+    # invalidate cached API results
+    await query_cache.start()
+    await live_hub.start()
+    worker = JobWorker(concurrency)
+    runner = asyncio.ensure_future(worker.run_forever())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, runner.cancel)
+
+    print(f"Job worker {worker.worker_id} running {concurrency} slots")
+    try:
+        await runner
+    except asyncio.CancelledError:
+        pass
+    await live_hub.stop()
+    await query_cache.stop()
+    print(f"Job worker stopped: {worker.snapshot()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
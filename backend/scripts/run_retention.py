@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""Downsample and expire old price and analytics history.
+
+Raw price points older than PRICE_RAW_RETENTION_DAYS are folded into
+hourly OHLC rollups, hourly rollups older than PRICE_HOURLY_RETENTION_DAYS
+into daily ones, and raw analytics older than ANALYTICS_RAW_RETENTION_DAYS
+into daily totals. On TimescaleDB, expired chunks are dropped and chunks
+older than RETENTION_COMPRESS_AFTER_DAYS are compressed.
+
+Usage:
+    cd backend && python scripts/run_retention.py
+"""
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import AsyncSessionLocal
+from app.services.retention_service import retention_service
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        before = await retention_service.table_sizes(db)
+        report = await retention_service.run(db)
+        after = await retention_service.table_sizes(db)
+
+    print(json.dumps(report, indent=2, default=str))
+    for table, size in before.items():
+        print(f"{table}: {size / 1e6:.1f} MB -> {after[table] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
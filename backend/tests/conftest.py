@@ -0,0 +1,59 @@
+import argparse
+import importlib.util
+import os
+import threading
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASSETTE_DIR = os.path.join(BACKEND_DIR, "tests", "cassettes")
+
+
+def load_script(name: str):
+    """Import a module from scripts/, which is not a package"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(BACKEND_DIR, "scripts", f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def fake_upstream():
+    """Fault-injecting fake Rainforest API on a free port
+
+    Yields its options; tests change the fault rates on them while it runs.
+    """
+    fake = load_script("fake_upstream")
+    options = argparse.Namespace(
+        latency_ms=5, slow_rate=0.0, slow_ms=1500, error_rate=0.0,
+        throttle_rate=0.0, hang_rate=0.0, hang_seconds=60
+    )
+    server = fake.QuietServer(("127.0.0.1", 0), fake.make_handler(options))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    options.url = f"http://127.0.0.1:{server.server_address[1]}/request"
+    try:
+        yield options
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def replay_upstreams(monkeypatch):
+    """Answer upstream calls from the checked-in cassettes in tests/cassettes
+
+    Runs as with UPSTREAM_RECORD_MODE=replay and recorded latencies, with
+    rate limits off so only our own overhead is measured.
+    """
+    from app.core.config import settings
+    from app.core.recording import upstream_recorder
+
+    monkeypatch.setattr(settings, "UPSTREAM_RECORD_MODE", "replay")
+    monkeypatch.setattr(settings, "UPSTREAM_CASSETTE_DIR", CASSETTE_DIR)
+    monkeypatch.setattr(settings, "UPSTREAM_REPLAY_LATENCY", "recorded")
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    # The recorder read its mode and directory when the app was imported
+    monkeypatch.setattr(upstream_recorder, "mode", "replay")
+    monkeypatch.setattr(upstream_recorder, "directory", CASSETTE_DIR)
+    monkeypatch.setattr(upstream_recorder, "_cassettes", {})
+    monkeypatch.setattr(upstream_recorder, "stats", {})
+    yield upstream_recorder
@@ -0,0 +1,30 @@
+import os
+import numpy as np
+from app.services.anomaly_service import AnomalyState
+
+
+def make_state() -> AnomalyState:
+    state = AnomalyState(7, 86400)
+    codes = state.codes(["B0001", "B0002"])
+    state.level[codes] = 5.0
+    state.last_seen[codes] = 1700000000
+    return state
+
+
+def test_state_round_trips_and_leaves_no_temporary_files(tmp_path):
+    path = str(tmp_path / "state.npz")
+    make_state().save(path, cursor=42)
+    make_state().save(path, cursor=43)
+
+    state, cursor = AnomalyState.load(path, 7, 86400)
+    assert cursor == 43
+    assert state.asins == ["B0001", "B0002"]
+    assert np.all(state.level[:2] == 5.0)
+    assert os.listdir(tmp_path) == ["state.npz"]
+
+
+def test_unreadable_state_is_a_cold_start(tmp_path):
+    path = tmp_path / "state.npz"
+    path.write_bytes(b"PK\x03\x04 torn write")
+    assert AnomalyState.load(str(path), 7, 86400) is None
+    assert AnomalyState.load(str(tmp_path / "missing.npz"), 7, 86400) is None
@@ -0,0 +1,64 @@
+import asyncio
+from app.services.batch_loader import BatchLoader
+
+
+class FakeBatch:
+    """Batch function that records every call and fails on `bad` keys"""
+
+    def __init__(self, bad=()):
+        self.calls = []
+        self.bad = set(bad)
+
+    async def __call__(self, keys):
+        self.calls.append(sorted(keys))
+        if self.bad & set(keys):
+            raise RuntimeError("bad key")
+        return {key: key.upper() for key in keys if key != "missing"}
+
+
+def make_loader(batch_fn, window: float = 0.01, max_batch: int = 100) -> BatchLoader:
+    return BatchLoader("test", batch_fn, window, max_batch)
+
+
+async def test_loads_within_a_window_share_one_call():
+    batch_fn = FakeBatch()
+    loader = make_loader(batch_fn)
+    results = await asyncio.gather(*(loader.load(key) for key in ["a", "b", "c", "missing"]))
+
+    assert results == ["A", "B", "C", None]
+    assert batch_fn.calls == [["a", "b", "c", "missing"]]
+
+    # A later tick is a new batch
+    assert await loader.load("d") == "D"
+    assert batch_fn.calls[1:] == [["d"]]
+    assert loader.snapshot()["batches"] == 2
+
+
+async def test_duplicate_keys_are_loaded_once():
+    batch_fn = FakeBatch()
+    loader = make_loader(batch_fn)
+    results = await loader.load_many(["a", "b", "a", "a", "b"])
+
+    assert results == ["A", "B", "A", "A", "B"]
+    assert batch_fn.calls == [["a", "b"]]
+    assert loader.stats["deduplicated"] == 3
+
+
+async def test_full_batches_dispatch_without_waiting_for_the_window():
+    batch_fn = FakeBatch()
+    loader = make_loader(batch_fn, window=60, max_batch=2)
+    results = await asyncio.wait_for(loader.load_many(["a", "b", "c", "d"]), timeout=1)
+
+    assert results == ["A", "B", "C", "D"]
+    assert batch_fn.calls == [["a", "b"], ["c", "d"]]
+
+
+async def test_a_failing_key_does_not_fail_the_rest_of_its_batch():
+    batch_fn = FakeBatch(bad={"bad"})
+    loader = make_loader(batch_fn)
+    results = await asyncio.gather(*(loader.load(key) for key in ["a", "b", "bad", "c"]), return_exceptions=True)
+
+    assert results[:2] == ["A", "B"] and results[3] == "C"
+    assert isinstance(results[2], RuntimeError)
+    assert loader.stats["batches"] == 1 and loader.stats["splits"] > 0
+    assert ["bad"] in batch_fn.calls
@@ -0,0 +1,81 @@
+import bisect
+import json
+import random
+import pytest
+from app.services.benchmark_service import KLLSketch
+
+N = 50000
+# KLL rank error with k=200 is about 1% of n; allow some slack for the random compactions
+RANK_TOLERANCE = 0.02
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(0)
+
+
+def exact_rank(ordered, value) -> int:
+    return bisect.bisect_right(ordered, value)
+
+
+def assert_close_ranks(sketch: KLLSketch, values) -> None:
+    ordered = sorted(values)
+    for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        value = ordered[int(q * len(ordered))]
+        assert abs(sketch.rank(value) - exact_rank(ordered, value)) <= RANK_TOLERANCE * len(ordered)
+        estimate = sketch.quantile(q)
+        assert abs(exact_rank(ordered, estimate) - q * len(ordered)) <= RANK_TOLERANCE * len(ordered)
+
+
+def test_rank_and_quantile_error_is_bounded():
+    values = [random.lognormvariate(3, 1) for _ in range(N)]
+    sketch = KLLSketch(200)
+    for value in values:
+        sketch.update(value)
+
+    assert sketch.n == N
+    assert sum(len(items) for items in sketch.compactors) < 2000
+    assert_close_ranks(sketch, values)
+    assert sketch.rank(-1) == 0
+    assert sketch.rank(float("inf")) == N
+
+
+def test_merge_matches_the_combined_stream():
+    low = [random.uniform(0, 100) for _ in range(N // 2)]
+    high = [random.uniform(50, 200) for _ in range(N // 2)]
+    first, second = KLLSketch(200), KLLSketch(200)
+    for value in low:
+        first.update(value)
+    for value in high:
+        second.update(value)
+
+    first.merge(second)
+    assert first.n == N
+    assert all(len(items) < first._capacity(level) for level, items in enumerate(first.compactors))
+    assert_close_ranks(first, low + high)
+
+
+def test_removed_values_no_longer_count():
+    sketch = KLLSketch(200)
+    for value in range(1000):
+        sketch.update(value)
+    for value in range(500, 1000):
+        sketch.remove(value)
+
+    assert sketch.n == 500
+    assert sketch.rank(999) == 500
+    assert abs(sketch.quantile(0.5) - 250) <= 20
+
+
+def test_serialized_sketch_round_trips():
+    sketch = KLLSketch(50)
+    for value in range(5000):
+        sketch.update(value)
+    sketch.remove(10)
+
+    restored = KLLSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert restored.to_dict() == sketch.to_dict()
+    assert restored.n == 4999
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    assert restored.rank(2500) == sketch.rank(2500)
+    assert KLLSketch.from_dict(KLLSketch(50).to_dict()).quantile(0.5) is None
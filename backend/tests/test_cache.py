@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from app.core.cache import QueryCache, table_tags
+
+
+def make_cache() -> QueryCache:
+    return QueryCache(max_bytes=1024 * 1024, ttl=60)
+
+
+async def cached(cache: QueryCache, route: str, tags, value="v", calls=None):
+    async def compute():
+        if calls is not None:
+            calls.append(route)
+        return value
+
+    return await cache.get_or_compute(route, {}, tags, compute, 60)
+
+
+async def test_writes_fan_out_to_the_results_that_read_them():
+    cache = make_cache()
+    await cached(cache, "full", table_tags("products"))
+    await cached(cache, "row_a", table_tags("products", ["A"]))
+    await cached(cache, "row_b", table_tags("products", ["B"]))
+    await cached(cache, "other", table_tags("price_history"))
+
+    # A row write drops whole-table readers and that row's readers only
+    await cache.invalidate("products", ["A"])
+    assert {entry.route for entry in cache._entries.values()} == {"row_b", "other"}
+
+    # A whole-table write drops every reader of any row
+    await cached(cache, "row_a", table_tags("products", ["A"]))
+    await cache.invalidate("products")
+    assert {entry.route for entry in cache._entries.values()} == {"other"}
+    assert not any(tag.startswith("products") for tag in cache._tags)
+
+
+async def test_cached_results_are_served_until_invalidated():
+    cache = make_cache()
+    calls = []
+    for _ in range(3):
+        assert await cached(cache, "route", table_tags("products", ["A"]), calls=calls) == "v"
+    await cache.invalidate("products", ["B"])
+    await cached(cache, "route", table_tags("products", ["A"]), calls=calls)
+    await cache.invalidate("products", ["A"])
+    await cached(cache, "route", table_tags("products", ["A"]), calls=calls)
+
+    assert len(calls) == 2
+    stats = cache.snapshot()["routes"]["route"]
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (3, 2, 2)
+
+
+async def test_result_invalidated_while_computing_is_not_stored():
+    cache = make_cache()
+    tags = table_tags("products", ["A"])
+
+    async def compute():
+        await cache.invalidate("products", ["A"])
+        return "stale"
+
+    assert await cache.get_or_compute("route", {}, tags, compute, 60) == "stale"
+    assert not cache._entries
+    assert cache.snapshot()["routes"]["route"]["stale_skips"] == 1
+
+    # An invalidation of unrelated rows does not stop the result being stored
+    async def compute_other():
+        await cache.invalidate("products", ["B"])
+        return "fresh"
+
+    await cache.get_or_compute("route", {}, tags, compute_other, 60)
+    assert [entry.value for entry in cache._entries.values()] == ["fresh"]
+
+
+async def test_concurrent_misses_share_one_computation():
+    cache = make_cache()
+    calls = []
+    release = asyncio.Event()
+
+    async def compute():
+        calls.append(1)
+        await release.wait()
+        return {"value": 1}
+
+    lookups = [
+        asyncio.ensure_future(cache.get_or_compute("route", {"x": 1}, {"products"}, compute, 60))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*lookups) == [{"value": 1}] * 5
+    assert len(calls) == 1
+    stats = cache.snapshot()["routes"]["route"]
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 0)
+    assert not cache._inflight
+
+
+async def test_waiters_see_the_computation_fail_and_the_next_lookup_retries():
+    cache = make_cache()
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise RuntimeError("database down")
+
+    lookups = [
+        asyncio.ensure_future(cache.get_or_compute("route", {}, {"products"}, failing, 60))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*lookups, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not cache._entries and not cache._inflight
+
+    async def working():
+        return "ok"
+
+    assert await cache.get_or_compute("route", {}, {"products"}, working, 60) == "ok"
@@ -0,0 +1,66 @@
+import numpy as np
+from app.services.elasticity_service import SECONDS_PER_DAY, estimate_series
+
+DAYS = 60
+START = 1_704_067_200  # 2024-01-01 UTC
+
+
+def make_series(prices: np.ndarray, conversions: np.ndarray, price_offset: int = 3600):
+    """Daily analytics rows and one price point a few hours into each day"""
+    day_ts = START + np.arange(len(prices)) * SECONDS_PER_DAY
+    metrics = {"views": conversions * 20, "conversions": conversions, "revenue": conversions * prices}
+    return day_ts, metrics, day_ts + price_offset, prices
+
+
+def test_known_elasticity_is_recovered():
+    rng = np.random.default_rng(0)
+    prices = rng.uniform(10, 30, DAYS)
+    conversions = 5000 * prices ** -1.5 * rng.lognormal(0, 0.05, DAYS)
+
+    result = estimate_series(*make_series(prices, conversions), max_lag=3, min_observations=14)
+    assert abs(result["elasticity"] - (-1.5)) < 0.1
+    assert result["r_squared"] > 0.9
+    assert result["observations"] == DAYS
+    assert len(result["lagged_correlations"]["conversions"]) == 4
+    assert result["lagged_correlations"]["conversions"][0] < -0.8
+
+
+def test_constant_price_has_no_elasticity():
+    rng = np.random.default_rng(1)
+    prices = np.full(DAYS, 19.99)
+    conversions = rng.poisson(50, DAYS).astype(float)
+
+    result = estimate_series(*make_series(prices, conversions), max_lag=2, min_observations=14)
+    assert result["elasticity"] is None and result["r_squared"] is None
+    assert result["observations"] == DAYS
+    assert result["lagged_correlations"]["views"] == [None, None, None]
+
+
+def test_too_few_priced_days_are_not_estimated():
+    prices = np.linspace(10, 20, DAYS)
+    conversions = 1000 / prices
+    day_ts, metrics, price_ts, _ = make_series(prices, conversions)
+    # Prices only exist for the last 10 days; earlier analytics rows have no price to pair with
+    result = estimate_series(day_ts, metrics, price_ts[-10:], prices[-10:], max_lag=2, min_observations=14)
+    assert result == {"elasticity": None, "r_squared": None, "observations": 10, "lagged_correlations": None}
+
+
+def test_days_without_sales_do_not_count_towards_the_regression():
+    prices = np.linspace(10, 20, DAYS)
+    conversions = 1000 / prices
+    conversions[::2] = 0  # Half the days sell nothing, leaving 30 usable
+
+    result = estimate_series(*make_series(prices, conversions), max_lag=1, min_observations=31)
+    assert result["elasticity"] is None and result["observations"] == DAYS
+    assert result["lagged_correlations"] is not None
+
+    result = estimate_series(*make_series(prices, conversions), max_lag=1, min_observations=30)
+    assert abs(result["elasticity"] - (-1.0)) < 1e-6
+    assert result["r_squared"] == 1.0
+
+
+def test_a_price_recorded_later_the_same_day_applies_to_that_day():
+    prices = np.linspace(10, 20, DAYS)
+    conversions = 1000 / prices
+    late = estimate_series(*make_series(prices, conversions, price_offset=SECONDS_PER_DAY - 1), 1, 14)
+    assert late["observations"] == DAYS and abs(late["elasticity"] - (-1.0)) < 1e-6
@@ -0,0 +1,73 @@
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from app.services.forecast_service import (
+    GRID, advance, day_number, fill_gaps, fit_shard, forecast, holt_winters
+)
+
+START = date(2024, 1, 1)
+WEEKLY = np.array([10.0, -5.0, 0.0, 5.0, -10.0, 3.0, -3.0])
+
+
+def seasonal_series(days: int, seed: int = 0) -> np.ndarray:
+    """Linear trend plus a weekly pattern and unit noise, by day number"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(days)
+    return 100 + 0.5 * t + WEEKLY[(day_number(START) + t) % 7] + rng.normal(0, 1, days)
+
+
+def test_seasonal_series_is_forecast_within_bounds():
+    history, horizon = 120, 14
+    series = seasonal_series(history + horizon)
+    model = fit_shard(series[None, :history], day_number(START), min_observations=28)[0]
+
+    assert model["method"] == "holt_winters"
+    assert model["rmse"] < 3  # Noise has unit variance
+    model["data_through"] = datetime.combine(START + timedelta(days=history - 1), datetime.min.time(), timezone.utc)
+    predicted = np.array([point["value"] for point in forecast(model, horizon)])
+    actual = series[history:]
+    assert np.abs(predicted - actual).mean() / actual.mean() < 0.05
+    assert all(point["lower"] <= point["value"] <= point["upper"] for point in forecast(model, horizon))
+
+
+def test_grid_is_evaluated_for_every_series_at_once():
+    Y = np.stack([seasonal_series(60, seed) for seed in range(3)])
+    alpha, beta, gamma = (GRID[:, i:i + 1] for i in range(3))
+    level, trend, season, sse, counted = holt_winters(Y, alpha, beta, gamma, day_number(START))
+    assert level.shape == sse.shape == (len(GRID), 3)
+    assert season.shape == (len(GRID), 3, 7)
+    assert (counted == 59).all()  # Every day after the first is a one-step forecast
+
+
+def test_series_below_min_observations_get_no_model():
+    Y = np.full((3, 60), np.nan)
+    Y[0] = seasonal_series(60)
+    Y[1, -20:] = seasonal_series(20)  # Too little history
+    models = fit_shard(Y, day_number(START), min_observations=28)  # Row 2 never started
+    assert models[0] is not None and models[0]["observations"] == 60
+    assert models[1] is None and models[2] is None
+
+    assert fit_shard(Y[1:2], day_number(START), min_observations=20)[0] is not None
+
+
+def test_advancing_a_model_matches_fitting_all_days():
+    series = seasonal_series(90)
+    model = fit_shard(series[None, :60], day_number(START), min_observations=28)[0]
+    assert model["method"] == "holt_winters"
+    advance([model], series[None, 60:], day_number(START) + 60)
+
+    params = [np.array([model["params"][name]]) for name in ("alpha", "beta", "gamma")]
+    level, trend, season, _, _ = holt_winters(series[None], *params, day_number(START))
+    assert np.isclose(model["level"], level[0]) and np.isclose(model["trend"], trend[0])
+    assert np.allclose(model["season"], season[0])
+    assert model["observations"] == 90
+
+
+def test_fill_gaps_zeroes_counts_and_carries_prices():
+    nan = np.nan
+    counts = np.array([[nan, nan, 3.0, nan, 5.0]])
+    np.testing.assert_array_equal(fill_gaps(counts, "views"), [[nan, nan, 3.0, 0.0, 5.0]])
+    # A series already under way before the window has zeros from the first day
+    np.testing.assert_array_equal(fill_gaps(counts, "views", started=True), [[0.0, 0.0, 3.0, 0.0, 5.0]])
+
+    prices = np.array([[nan, 2.0, nan, nan, 4.0], [1.0, nan, nan, nan, nan]])
+    np.testing.assert_array_equal(fill_gaps(prices, "price"), [[nan, 2.0, 2.0, 2.0, 4.0], [1.0, 1.0, 1.0, 1.0, 1.0]])
@@ -0,0 +1,17 @@
+import numpy as np
+from app.services.import_service import ImportColumn, _convert
+
+
+def test_non_finite_numbers_are_rejected():
+    values = np.array(["1.5", "nan", "inf", "-Infinity", "", "abc"], dtype=object)
+    missing = values == ""
+    parsed, bad, message = _convert(ImportColumn("price", "float", min=0), values, missing)
+    assert parsed == [1.5, None, None, None, None, None]
+    assert bad.tolist() == [False, True, True, True, False, True]
+
+
+def test_non_finite_numbers_are_rejected_on_the_fast_path():
+    values = np.array([2.0, float("nan"), float("inf")])
+    parsed, bad, _ = _convert(ImportColumn("views", "int"), values, np.zeros(3, dtype=bool))
+    assert parsed == [2, None, None]
+    assert bad.tolist() == [False, True, True]
@@ -0,0 +1,89 @@
+import pytest
+from starlette.testclient import TestClient
+from fastapi import FastAPI
+from app.api.v1.endpoints import live
+from app.services.live_service import LiveHub, TopicSource
+
+
+def make_hub(fail: set = frozenset()) -> LiveHub:
+    async def value(db, name: str):
+        if name in fail:
+            raise RuntimeError(f"{name} is broken")
+        return {"name": name}
+
+    hub = LiveHub()
+    hub.register("value", TopicSource(value, fields={"price"}))
+    hub.register("trends", TopicSource(live._trends, parse=live._trend_args))
+    hub.register("top-products", TopicSource(live._top_products, parse=live._top_product_args))
+    return hub
+
+
+@pytest.mark.parametrize("topic", ["trends:abc", "trends:3", "top-products:revenue:30:999", "value", "value:a:b", "nope"])
+async def test_invalid_topics_register_nothing(topic):
+    hub = make_hub()
+    subscriber = hub.connect()
+    with pytest.raises(ValueError):
+        await hub.subscribe(subscriber, topic)
+    assert not subscriber.topics
+    assert not hub._local_topics
+
+
+async def test_failed_first_value_rolls_back_the_subscription():
+    hub = make_hub(fail={"broken"})
+    subscriber = hub.connect()
+    with pytest.raises(ValueError):
+        await hub.subscribe(subscriber, "value:broken")
+    assert not subscriber.topics
+    assert not hub._local_topics
+
+    await hub.subscribe(subscriber, "value:ok")
+    assert subscriber.queue.get_nowait() == {"topic": "value:ok", "seq": 1, "type": "snapshot", "data": {"name": "ok"}}
+    assert subscriber.queue.empty()
+
+
+async def test_one_failing_topic_does_not_block_the_others():
+    hub = make_hub()
+    subscriber = hub.connect()
+    for name in ("a", "b", "c"):
+        await hub.subscribe(subscriber, f"value:{name}")
+    while not subscriber.queue.empty():
+        subscriber.queue.get_nowait()
+
+    async def resolver(db, name: str):
+        if name == "a":
+            raise RuntimeError("a is broken")
+        return {"name": name, "changed": True}
+
+    hub.sources["value"].resolver = resolver
+    await hub._flush({"value"})
+    updated = {subscriber.queue.get_nowait()["topic"] for _ in range(subscriber.queue.qsize())}
+    assert updated == {"value:b", "value:c"}
+
+
+@pytest.mark.parametrize("message", [{"action": "subscribe"}, {"topics": []}, {"topics": "value:a"}, {"topics": [1]}, ["value:a"]])
+def test_websocket_reports_malformed_requests(monkeypatch, message):
+    monkeypatch.setattr(live, "live_hub", make_hub())
+    app = FastAPI()
+    app.include_router(live.router)
+    with TestClient(app).websocket_connect("/ws") as websocket:
+        websocket.send_json(message)
+        assert websocket.receive_json()["type"] == "error"
+        # The connection survives and still serves valid requests
+        websocket.send_json({"topics": ["value:a"]})
+        assert websocket.receive_json()["data"] == {"name": "a"}
+
+
+@pytest.mark.parametrize("frame", ["not json", "{\"topics\": [", "", b"\xff\xfe"])
+def test_websocket_survives_malformed_frames(monkeypatch, frame):
+    monkeypatch.setattr(live, "live_hub", make_hub())
+    app = FastAPI()
+    app.include_router(live.router)
+    with TestClient(app).websocket_connect("/ws") as websocket:
+        if isinstance(frame, bytes):
+            websocket.send_bytes(frame)
+        else:
+            websocket.send_text(frame)
+        error = websocket.receive_json()
+        assert error["type"] == "error" and error["detail"].startswith("Malformed JSON")
+        websocket.send_json({"topics": ["value:a"]})
+        assert websocket.receive_json()["data"] == {"name": "a"}
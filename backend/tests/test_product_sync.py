@@ -0,0 +1,50 @@
+from datetime import timedelta
+from app.models.product import Product
+from app.services.product_sync import ChangeFeed, ProductSyncService
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    def add(self, instance):
+        pass
+
+    async def commit(self):
+        self.commits += 1
+
+    async def refresh(self, instance):
+        pass
+
+
+def make_service() -> ProductSyncService:
+    return ProductSyncService(ChangeFeed(100), timedelta(hours=24))
+
+
+async def test_missing_hash_is_backfilled_without_an_event():
+    service = make_service()
+    data = {"title": "USB cable", "brand": "Acme"}
+    product = Product(asin="B0001", title="USB cable", brand="Acme", content_hash=None)
+    db = FakeSession()
+
+    _, event = await service.upsert(db, "B0001", data, product)
+    assert event is None
+    assert product.content_hash == service.content_hash(service.normalize(data))
+    assert db.commits == 1
+    assert service.stats["hash_backfills"] == 1
+
+    # With the hash in place the same data is a no-op write
+    _, event = await service.upsert(db, "B0001", data, product)
+    assert event is None and db.commits == 1
+    assert service.stats["noops"] == 1
+
+
+async def test_changed_fields_publish_their_previous_values():
+    service = make_service()
+    product = Product(asin="B0001", title="USB cable", brand="Acme", content_hash="stale")
+
+    _, event = await service.upsert(FakeSession(), "B0001", {"title": "USB-C cable", "brand": "Acme"}, product)
+    assert event.op == "update"
+    assert event.fields == {"title": "USB-C cable"}
+    assert event.previous == {"title": "USB cable"}
+    assert product.content_hash != "stale"
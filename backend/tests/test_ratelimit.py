@@ -0,0 +1,173 @@
+import asyncio
+import ipaddress
+import pytest
+from starlette.requests import Request
+from app.core import ratelimit
+from app.core.ratelimit import BUCKET_KEY, TOKEN_BUCKET, FairQueue, QueueFull, RateLimiter, rate_limiter
+
+
+def make_request(peer: str, headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": (peer, 12345),
+    })
+
+
+def test_real_ip_header_ignored_from_untrusted_peers(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "trusted_proxies", [])
+    clients = {
+        rate_limiter.client_id(make_request("203.0.113.7", {"X-Real-IP": f"10.0.0.{i}"}))
+        for i in range(20)
+    }
+    assert clients == {"ip:203.0.113.7"}
+
+
+def test_real_ip_header_used_from_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "trusted_proxies", [ipaddress.ip_network("172.28.0.10/32")])
+    request = make_request("172.28.0.10", {"X-Real-IP": "198.51.100.4"})
+    assert rate_limiter.client_id(request) == "ip:198.51.100.4"
+    # The gateway address docker uses for published ports is not the proxy
+    assert rate_limiter.client_id(make_request("172.28.0.1", {"X-Real-IP": "198.51.100.4"})) == "ip:172.28.0.1"
+
+
+class FakeRedis:
+    """Runs the token bucket Lua script in Lua 5.1 against in-memory hashes and a settable clock"""
+
+    def __init__(self):
+        lua51 = pytest.importorskip("lupa.lua51")
+        self.lua = lua51.LuaRuntime()
+        self.hashes = {}
+        self.expiries = {}
+        self.now = 1_700_000_000.0
+
+    def _call(self, command, key=None, *args):
+        if command == "TIME":
+            return self.lua.table(str(int(self.now)), str(int(self.now % 1 * 1_000_000)))
+        values = self.hashes.setdefault(key, {})
+        if command == "HMGET":
+            return self.lua.table(*(values.get(field, False) for field in args))
+        if command == "HSET":
+            for field, value in zip(args[::2], args[1::2]):
+                values[field] = str(value)
+        elif command == "HINCRBY":
+            values[args[0]] = str(int(values.get(args[0], 0)) + int(args[1]))
+        elif command == "HINCRBYFLOAT":
+            values[args[0]] = str(float(values.get(args[0], 0)) + float(args[1]))
+        elif command == "EXPIRE":
+            self.expiries[key] = args[0]
+        return 1
+
+    def register_script(self, source: str):
+        run = self.lua.eval(f"function(KEYS, ARGV, redis) {source} end")
+
+        async def script(keys, args):
+            redis = self.lua.table_from({"call": self._call})
+            result = run(self.lua.table(*keys), self.lua.table(*(str(arg) for arg in args)), redis)
+            # Redis converts Lua numbers in replies to integers
+            return [int(value) if isinstance(value, float) else value for value in result.values()]
+
+        return script
+
+    async def hgetall(self, key):
+        return {field.encode(): value.encode() for field, value in self.hashes.get(key, {}).items()}
+
+
+@pytest.fixture
+def redis_limiter():
+    fake = FakeRedis()
+    limiter = RateLimiter(rate=1, burst=10)
+    limiter._redis = fake
+    limiter._script = fake.register_script(TOKEN_BUCKET)
+    return limiter, fake
+
+
+async def test_lua_bucket_charges_each_request_its_cost(redis_limiter):
+    limiter, fake = redis_limiter
+    assert await limiter.take("ip:1.2.3.4", 4) == (True, 6.0, 0.0)
+    assert await limiter.take("ip:1.2.3.4", 4) == (True, 2.0, 0.0)
+    allowed, tokens, retry_after = await limiter.take("ip:1.2.3.4", 4)
+    assert not allowed and tokens == 2.0 and retry_after == pytest.approx(2.0)
+
+    # Tokens refill at the client's rate on Redis' clock
+    fake.now += 2
+    assert (await limiter.take("ip:1.2.3.4", 4))[0]
+    # Other clients have their own buckets
+    assert await limiter.take("ip:5.6.7.8", 10) == (True, 0.0, 0.0)
+
+    usage = (await limiter.snapshot())["usage_today"]
+    assert usage["ip:1.2.3.4"] == {"cost": 12.0, "throttled": 1}
+    assert usage["ip:5.6.7.8"] == {"cost": 10.0, "throttled": 0}
+
+
+async def test_lua_bucket_caps_cost_at_burst_and_expires_idle_buckets(redis_limiter):
+    limiter, fake = redis_limiter
+    # A cost above the burst could never be afforded, so it is charged as a full bucket
+    assert await limiter.take("ip:1.2.3.4", 50) == (True, 0.0, 0.0)
+    assert fake.expiries[BUCKET_KEY.format(client="ip:1.2.3.4")] == 11  # Time to refill, plus one second
+
+
+async def test_local_bucket_matches_the_lua_accounting(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: clock[0])
+    limiter = RateLimiter(rate=1, burst=10)
+    assert await limiter.take("ip:1.2.3.4", 4) == (True, 6.0, 0.0)
+    assert await limiter.take("ip:1.2.3.4", 4) == (True, 2.0, 0.0)
+    assert await limiter.take("ip:1.2.3.4", 4) == (False, 2.0, 2.0)
+    clock[0] += 2
+    assert await limiter.take("ip:1.2.3.4", 4) == (True, 0.0, 0.0)
+
+
+async def test_fair_queue_serves_waiting_clients_round_robin():
+    queue = FairQueue("upstream", concurrency=1, max_waiting_per_client=10)
+    await queue.acquire("a", timeout=1)
+    granted = []
+
+    async def request(client: str, number: int):
+        await queue.acquire(client, timeout=5)
+        granted.append(f"{client}{number}")
+
+    tasks = [asyncio.ensure_future(request(client, number)) for client, number in [("a", 1), ("a", 2), ("a", 3), ("b", 1), ("c", 1)]]
+    await asyncio.sleep(0)
+    assert queue.waiting == 5
+
+    for _ in tasks:
+        queue.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    # The client with three queued requests does not hold the others back
+    assert granted == ["a1", "b1", "c1", "a2", "a3"]
+
+    queue.release()
+    assert queue.active == 0 and queue.waiting == 0
+
+
+async def test_fair_queue_caps_waiting_requests_per_client():
+    queue = FairQueue("upstream", concurrency=1, max_waiting_per_client=2)
+    await queue.acquire("a", timeout=1)
+    waiting = [asyncio.ensure_future(queue.acquire("a", timeout=5)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(QueueFull):
+        await queue.acquire("a", timeout=5)
+    # Other clients can still queue
+    other = asyncio.ensure_future(queue.acquire("b", timeout=5))
+    await asyncio.sleep(0)
+    assert queue.waiting == 3 and queue.stats["rejected"] == 1
+
+    for _ in range(3):
+        queue.release()
+    await asyncio.gather(*waiting, other)
+
+
+async def test_fair_queue_timed_out_waiter_gives_up_its_place():
+    queue = FairQueue("upstream", concurrency=1, max_waiting_per_client=2)
+    await queue.acquire("a", timeout=1)
+    with pytest.raises(asyncio.TimeoutError):
+        await queue.acquire("b", timeout=0.01)
+    assert queue.waiting == 0 and queue.stats["timeouts"] == 1
+
+    queue.release()
+    assert queue.active == 0
@@ -0,0 +1,105 @@
+import asyncio
+import statistics
+import time
+import httpx
+import pytest
+from app.core.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, Upstream, UpstreamError
+
+
+def make_upstream(
+    timeout: float = 2.0,
+    max_attempts: int = 3,
+    failure_threshold: int = 100,
+    reset_timeout: float = 30.0,
+    hedge_delay: float = None
+) -> Upstream:
+    return Upstream(
+        "fake",
+        timeout=timeout,
+        deadline=10.0,
+        retry=RetryPolicy(max_attempts=max_attempts, base_delay=0.01, max_delay=0.05),
+        breaker=CircuitBreaker(failure_threshold, reset_timeout),
+        hedge_delay=hedge_delay
+    )
+
+
+async def test_server_errors_are_retried_until_attempts_run_out(fake_upstream):
+    fake_upstream.error_rate = 1.0
+    upstream = make_upstream(max_attempts=3)
+    async with httpx.AsyncClient() as client:
+        with pytest.raises(UpstreamError) as error:
+            await upstream.call(lambda: client.get(fake_upstream.url, params={"type": "product"}))
+
+    assert error.value.status_code in (500, 502, 503)
+    assert upstream.metrics.attempts == 3
+    assert upstream.metrics.retries == 2
+    assert upstream.metrics.failures == 1
+
+
+async def test_transient_failures_are_absorbed_by_retries(fake_upstream):
+    fake_upstream.error_rate = 0.3
+    fake_upstream.throttle_rate = 0.2
+    upstream = make_upstream(max_attempts=20)
+    async with httpx.AsyncClient() as client:
+        responses = await asyncio.gather(*(
+            upstream.call(lambda: client.get(fake_upstream.url, params={"type": "product"})) for _ in range(20)
+        ))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert upstream.metrics.successes == 20
+    assert upstream.metrics.retries > 0
+    assert 429 in upstream.metrics.status_codes
+
+
+async def test_hung_requests_time_out(fake_upstream):
+    fake_upstream.hang_rate = 1.0
+    fake_upstream.hang_seconds = 1.0
+    upstream = make_upstream(timeout=0.1, max_attempts=2)
+    async with httpx.AsyncClient() as client:
+        started = time.monotonic()
+        with pytest.raises(UpstreamError, match="timed out"):
+            await upstream.call(lambda: client.get(fake_upstream.url))
+
+    assert upstream.metrics.timeouts == 2
+    assert time.monotonic() - started < 1.0
+
+
+async def test_circuit_opens_fails_fast_and_recovers(fake_upstream):
+    fake_upstream.error_rate = 1.0
+    upstream = make_upstream(max_attempts=1, failure_threshold=3, reset_timeout=0.2)
+    async with httpx.AsyncClient() as client:
+        request = lambda: client.get(fake_upstream.url)
+        for _ in range(3):
+            with pytest.raises(UpstreamError):
+                await upstream.call(request)
+        assert upstream.breaker.state == CircuitBreaker.OPEN
+
+        attempts = upstream.metrics.attempts
+        with pytest.raises(CircuitOpenError):
+            await upstream.call(request)
+        assert upstream.metrics.attempts == attempts  # Nothing was sent
+        assert upstream.metrics.short_circuited == 1
+
+        # After the cool-down one probe goes through and closes the circuit
+        fake_upstream.error_rate = 0.0
+        await asyncio.sleep(0.25)
+        response = await upstream.call(request)
+        assert response.status_code == 200
+        assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_hedged_requests_cut_tail_latency(fake_upstream):
+    fake_upstream.slow_rate = 0.5
+    fake_upstream.slow_ms = 400
+    upstream = make_upstream(hedge_delay=0.05)
+    latencies = []
+    async with httpx.AsyncClient() as client:
+        for _ in range(20):
+            started = time.monotonic()
+            await upstream.call(lambda: client.get(fake_upstream.url))
+            latencies.append(time.monotonic() - started)
+
+    assert upstream.metrics.hedges > 0
+    assert upstream.metrics.hedge_wins > 0
+    # Without hedging half of the calls would take the full 400 ms
+    assert statistics.median(latencies) < 0.2
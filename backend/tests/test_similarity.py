@@ -0,0 +1,59 @@
+import os
+import numpy as np
+from app.services.similarity_service import HashingEmbedder, SimilarityIndex
+
+
+def make_index() -> SimilarityIndex:
+    return SimilarityIndex(HashingEmbedder(16), nprobe=4)
+
+
+def test_index_round_trips_and_leaves_no_temporary_files(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = make_index()
+    index.add(["B0001", "B0002"], np.eye(2, 16, dtype=np.float32))
+    index.save(path)
+    index.save(path)
+
+    loaded = make_index()
+    assert loaded.load(path)
+    assert loaded.row_asins == ["B0001", "B0002"]
+    assert os.listdir(tmp_path) == ["index.npz"]
+
+
+def test_unreadable_index_is_rebuilt(tmp_path):
+    path = tmp_path / "index.npz"
+    path.write_bytes(b"PK\x03\x04 torn write")
+    index = make_index()
+    assert not index.load(str(path))
+    assert len(index) == 0
+
+
+async def test_index_is_built_off_the_event_loop(monkeypatch, tmp_path):
+    import threading
+    from datetime import datetime, timezone
+    from app.core.config import settings
+    from app.services.similarity_service import SimilarityService
+
+    monkeypatch.setattr(settings, "SIMILARITY_INDEX_PATH", str(tmp_path / "index.npz"))
+    monkeypatch.setattr(settings, "SIMILARITY_EMBEDDING_MODEL", None)
+    products = [
+        {"asin": f"B{i:04d}", "title": f"usb cable {i % 3}", "features": None, "category": "cables",
+         "brand": "acme", "changed_at": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+        for i in range(20)
+    ]
+
+    async def load_products(db, query, batch_size=5000):
+        yield products
+
+    service = SimilarityService()
+    monkeypatch.setattr(service, "_load_products", load_products)
+    threads = []
+    build_index = service._build_index
+    monkeypatch.setattr(service, "_build_index", lambda p: threads.append(threading.current_thread()) or build_index(p))
+
+    index = await service.ensure_index(None)
+    assert threads and threads[0] is not threading.main_thread()
+    assert len(index) == 20 and os.path.exists(settings.SIMILARITY_INDEX_PATH)
+    assert service.stats["build_seconds"] is not None
+    assert service.stats["last_catch_up_ms"] is not None
+    assert [match["asin"] for match in service.search(index, "B0000", 2)] == ["B0003", "B0006"]
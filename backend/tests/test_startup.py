@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cold_import_within_budget():
+    """app.main imports within STARTUP_IMPORT_BUDGET_MS in fresh interpreters"""
+    result = subprocess.run(
+        [sys.executable, os.path.join("scripts", "profile_imports.py"), "--runs", "3", "--top", "5"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_heavy_dependencies_load_lazily():
+    """Importing the app does not pull in NumPy, Redis or the AI SDKs"""
+    probe = (
+        "import sys, app.main; "
+        "print(','.join(m for m in ('numpy', 'redis', 'openai', 'anthropic') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], cwd=BACKEND_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
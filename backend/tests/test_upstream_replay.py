@@ -0,0 +1,53 @@
+import pytest
+from tests.conftest import CASSETTE_DIR, load_script
+
+benchmark = load_script("benchmark_upstreams")
+
+REQUESTS = 200
+CONCURRENCY = 20
+# Minimum requests/sec and maximum p90 ms per path, replaying the checked-in
+# cassette with its recorded latencies (about 25 ms, one search at 205 ms)
+THRESHOLDS = {
+    "search": (60, 320),
+    "reviews": (250, 120),
+    "sync": (60, 450),
+}
+
+
+async def assert_within_thresholds(path: str):
+    results = (await benchmark.replay([path], REQUESTS, CONCURRENCY))[path]
+    min_rps, max_p90_ms = THRESHOLDS[path]
+    assert results["statuses"] == {"200": REQUESTS}
+    assert results["throughput_rps"] >= min_rps, results
+    assert results["p90_ms"] <= max_p90_ms, results
+
+
+async def test_cassette_covers_every_path(replay_upstreams):
+    recorded = benchmark.recorded_requests(CASSETTE_DIR)
+    assert recorded["search"] and recorded["product"] and recorded["reviews"]
+
+
+async def test_search_throughput_and_latency(replay_upstreams):
+    await assert_within_thresholds("search")
+    assert replay_upstreams.stats["rainforest"] == {"replayed": REQUESTS}
+
+
+async def test_reviews_throughput_and_latency(replay_upstreams):
+    await assert_within_thresholds("reviews")
+    assert replay_upstreams.stats["rainforest"] == {"replayed": REQUESTS}
+
+
+async def test_sync_throughput_and_latency(replay_upstreams):
+    from app.db.database import engine
+    try:
+        # Also makes the pool's first connection before the concurrent requests
+        async with engine.connect():
+            pass
+    except Exception as e:
+        await engine.dispose()
+        pytest.skip(f"Database unavailable: {e}")
+    try:
+        await assert_within_thresholds("sync")
+    finally:
+        # Pooled connections belong to this test's event loop
+        await engine.dispose()
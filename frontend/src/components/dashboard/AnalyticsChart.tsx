@@ -2,13 +2,13 @@
 
 import { useQuery } from 'react-query'
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts'
-import { fetchAnalyticsTrends } from '@/lib/api'
+import { fetchAnalyticsCube } from '@/lib/api'
 import { format, parseISO } from 'date-fns'
 
 export default function AnalyticsChart() {
   const { data: trends, isLoading } = useQuery(
     'analyticsTrends',
-    () => fetchAnalyticsTrends()
+    () => fetchAnalyticsCube({ bucket: 'day', metrics: ['revenue', 'views', 'conversions'], days: 30 })
   )
 
   const formatDate = (dateStr: string) => {
@@ -25,7 +25,7 @@ export default function AnalyticsChart() {
   }
 
   const chartData = trends?.map((item: any) => ({
-    date: formatDate(item.date),
+    date: formatDate(item.bucket),
     revenue: item.revenue,
     views: item.views,
     conversions: item.conversions,
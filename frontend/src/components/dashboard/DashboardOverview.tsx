@@ -2,6 +2,7 @@
 
 import { useQuery } from 'react-query'
 import { fetchAnalyticsOverview } from '@/lib/api'
+import { useLiveTopic } from '@/lib/live'
 import { 
   ShoppingBagIcon, 
   CurrencyDollarIcon, 
@@ -12,8 +13,10 @@ import {
 export default function DashboardOverview() {
   const { data: overview, isLoading } = useQuery(
     'analyticsOverview',
-    fetchAnalyticsOverview
+    fetchAnalyticsOverview,
+    { staleTime: Infinity }
   )
+  useLiveTopic('overview', 'analyticsOverview')
 
   const stats = [
     {
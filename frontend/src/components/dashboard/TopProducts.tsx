@@ -2,13 +2,16 @@
 
 import { useQuery } from 'react-query'
 import { fetchTopProducts } from '@/lib/api'
+import { useLiveTopic } from '@/lib/live'
 import { StarIcon } from '@heroicons/react/24/solid'
 
 export default function TopProducts() {
   const { data: topProducts, isLoading } = useQuery(
     'topProducts',
-    () => fetchTopProducts('revenue', 10)
+    () => fetchTopProducts('revenue', 10),
+    { staleTime: Infinity }
   )
+  useLiveTopic('top-products:revenue:30:10', 'topProducts')
 
   if (isLoading) {
     return (
@@ -1,6 +1,6 @@
 // API client for Amazon Analytics backend
 
-const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+export const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
 export interface Product {
   id: number;
@@ -36,6 +36,31 @@ export interface TrendData {
   metric: string;
 }
 
+export interface CubeQuery {
+  bucket?: 'hour' | 'day' | 'week' | 'month';
+  group_by?: ('category' | 'brand' | 'asin')[];
+  metrics?: ('revenue' | 'views' | 'conversions' | 'conversion_rate' | 'revenue_per_view')[];
+  days?: number;
+  start?: string;
+  end?: string;
+  asins?: string[];
+  categories?: string[];
+  brands?: string[];
+  limit?: number;
+}
+
+export interface CubeRow {
+  bucket: string;
+  category?: string;
+  brand?: string;
+  asin?: string;
+  revenue?: number;
+  views?: number;
+  conversions?: number;
+  conversion_rate?: number;
+  revenue_per_view?: number;
+}
+
 // Analytics API functions
 export async function fetchAnalyticsOverview(): Promise<AnalyticsOverview> {
   const response = await fetch(`${API_BASE_URL}/api/v1/analytics/overview`);
@@ -53,6 +78,20 @@ export async function fetchAnalyticsTrends(): Promise<TrendData[]> {
   return response.json();
 }
 
+export async function fetchAnalyticsCube(query: CubeQuery): Promise<CubeRow[]> {
+  const response = await fetch(`${API_BASE_URL}/api/v1/analytics/cube`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(query),
+  });
+  if (!response.ok) {
+    throw new Error('Failed to fetch analytics cube');
+  }
+  return response.json();
+}
+
 export async function fetchTopProducts(): Promise<Product[]> {
   const response = await fetch(`${API_BASE_URL}/api/v1/analytics/top-products`);
   if (!response.ok) {
@@ -78,6 +117,20 @@ export async function fetchProduct(asin: string): Promise<Product> {
   return response.json();
 }
 
+export async function fetchProductsBatch(asins: string[]): Promise<{ products: Product[]; missing: string[] }> {
+  const response = await fetch(`${API_BASE_URL}/api/v1/products/batch`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ asins }),
+  });
+  if (!response.ok) {
+    throw new Error('Failed to fetch products');
+  }
+  return response.json();
+}
+
 export async function createProduct(product: Partial<Product>): Promise<Product> {
   const response = await fetch(`${API_BASE_URL}/api/v1/products/`, {
     method: 'POST',
@@ -100,6 +153,21 @@ export async function fetchPriceHistory(asin: string): Promise<any[]> {
   return response.json();
 }
 
+export async function fetchPriceHistoryBatch(asins: string[]): Promise<Record<string, any[]>> {
+  const response = await fetch(`${API_BASE_URL}/api/v1/products/price-history/batch`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ asins }),
+  });
+  if (!response.ok) {
+    throw new Error('Failed to fetch price history');
+  }
+  const data = await response.json();
+  return data.price_history;
+}
+
 // AI API functions
 export async function analyzeProduct(asin: string, analysisType: string = 'comprehensive'): Promise<{ analysis: string }> {
   const response = await fetch(`${API_BASE_URL}/api/v1/ai/analyze-product`, {
@@ -0,0 +1,45 @@
+// Server-pushed topic updates, merged into the React Query cache
+
+import { useEffect } from 'react'
+import { useQueryClient, QueryKey } from 'react-query'
+import { API_BASE_URL } from './api'
+
+interface LiveMessage {
+  topic: string;
+  seq: number;
+  type: 'snapshot' | 'delta';
+  data: any;
+}
+
+function applyMessage(current: any, message: LiveMessage): any {
+  if (message.type === 'snapshot') {
+    return message.data;
+  }
+  if (current === undefined) {
+    return current;
+  }
+  const next = { ...current, ...message.data.changed };
+  for (const key of message.data.removed) {
+    delete next[key];
+  }
+  return next;
+}
+
+// Keeps `queryKey` up to date from a live topic, e.g. 'overview' or 'price:B08N5WRWNW'.
+// The EventSource reconnects on its own and every (re)subscription starts with a snapshot.
+export function useLiveTopic(topic: string, queryKey: QueryKey) {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    const source = new EventSource(
+      `${API_BASE_URL}/api/v1/live/sse?topic=${encodeURIComponent(topic)}`
+    );
+    const onMessage = (event: MessageEvent) => {
+      const message: LiveMessage = JSON.parse(event.data);
+      queryClient.setQueryData(queryKey, (current: any) => applyMessage(current, message));
+    };
+    source.addEventListener('snapshot', onMessage as EventListener);
+    source.addEventListener('delta', onMessage as EventListener);
+    return () => source.close();
+  }, [topic, queryKey, queryClient]);
+}